@@ -1,6 +1,12 @@
 # celery.py
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import (
+    celeryd_after_setup,
+    worker_process_init,
+    worker_process_shutdown,
+)
+from typing import Any
 import os
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "GraphaRNA.settings")
@@ -19,3 +25,30 @@ app.conf.beat_schedule = {
         ),  # Run the task every hour eg. 0.00, 1.00, ...
     },
 }
+
+
+# queues consumed by this worker, known before the pool processes are forked
+worker_queues: set[str] = set()
+
+
+@celeryd_after_setup.connect
+def remember_worker_queues(instance: Any, **kwargs: Any) -> None:
+    worker_queues.update(instance.app.amqp.queues.consume_from)
+
+
+@worker_process_init.connect
+def warm_up_worker_process(**kwargs: Any) -> None:
+    """Prepares the renderers in every new process of the grapharna workers (not email/maintenance)."""
+    from django.conf import settings
+    from webapp.warm_up import RENDERING_QUEUES, warm_up_renderers
+
+    if settings.WORKER_WARM_UP and worker_queues & RENDERING_QUEUES:
+        warm_up_renderers()
+
+
+@worker_process_shutdown.connect
+def flush_worker_metrics(**kwargs: Any) -> None:
+    """Writes the metric updates the exiting process still buffers."""
+    from webapp import metrics
+
+    metrics.flush()
@@ -34,6 +34,56 @@ ENGINE_TEST_URL = os.getenv("ENGINE_TEST_URL", "http://grapharna-engine:8080/tes
 ENGINE_URL = os.getenv("ENGINE_URL", "http://grapharna-engine:8080")
 ENGINE_TIMEOUT_SECONDS = int(os.getenv("ENGINE_TIMEOUT_SECONDS", 6000))
 ENGINE_POLL_INTERVAL_SECONDS = int(os.getenv("ENGINE_POLL_INTERVAL_SECONDS", 60))
+ENGINE_POLL_POLICY = os.getenv(
+    "ENGINE_POLL_POLICY", "webapp.poll_policies.ExponentialBackoffPolicy"
+)
+ENGINE_POLL_INITIAL_SECONDS = float(os.getenv("ENGINE_POLL_INITIAL_SECONDS", 0.5))
+ENGINE_POLL_BACKOFF_FACTOR = float(os.getenv("ENGINE_POLL_BACKOFF_FACTOR", 1.5))
+ENGINE_POLL_MAX_SECONDS = float(
+    os.getenv("ENGINE_POLL_MAX_SECONDS", ENGINE_POLL_INTERVAL_SECONDS)
+)
+ENGINE_POLL_JITTER = float(os.getenv("ENGINE_POLL_JITTER", 0.1))
+# "blocking" - run_grapharna_task polls the engine until every conformation is done
+# "callback" - separate submit/check/process tasks, woken up by the engine callback
+# "scheduled" - separate submit/check/process tasks, checks re-enqueued with ENGINE_POLL_POLICY countdowns
+# "async" - engine runs driven by the asyncio engine dispatcher (manage.py run_engine_dispatcher)
+ENGINE_DISPATCH_MODE = os.getenv("ENGINE_DISPATCH_MODE", "blocking")
+# max number of conformations of one job computed by the engine at the same time (1 - one after another)
+ENGINE_CONFORMATION_FANOUT = int(os.getenv("ENGINE_CONFORMATION_FANOUT", 1))
+ENGINE_CALLBACK_URL = os.getenv("ENGINE_CALLBACK_URL")
+ENGINE_CALLBACK_TOKEN = os.getenv("ENGINE_CALLBACK_TOKEN")
+ENGINE_CALLBACK_FALLBACK_SECONDS = int(
+    os.getenv("ENGINE_CALLBACK_FALLBACK_SECONDS", 300)
+)
+ENGINE_POOL_SIZE = int(os.getenv("ENGINE_POOL_SIZE", 10))
+ENGINE_CONNECT_TIMEOUT_SECONDS = float(os.getenv("ENGINE_CONNECT_TIMEOUT_SECONDS", 5))
+ENGINE_READ_TIMEOUT_SECONDS = float(os.getenv("ENGINE_READ_TIMEOUT_SECONDS", 60))
+ENGINE_BREAKER_FAILURE_THRESHOLD = int(os.getenv("ENGINE_BREAKER_FAILURE_THRESHOLD", 5))
+ENGINE_BREAKER_PROBE_INTERVAL_SECONDS = float(
+    os.getenv("ENGINE_BREAKER_PROBE_INTERVAL_SECONDS", 30)
+)
+ENGINE_BREAKER_CACHE_SECONDS = float(os.getenv("ENGINE_BREAKER_CACHE_SECONDS", 1))
+# while the engine is down: "hold" - jobs wait in the queue (status Q) until it recovers, "fail" - jobs fail at once
+ENGINE_BREAKER_OPEN_ACTION = os.getenv("ENGINE_BREAKER_OPEN_ACTION", "hold")
+ENGINE_DISPATCHER_CONCURRENCY = int(os.getenv("ENGINE_DISPATCHER_CONCURRENCY", 200))
+ENGINE_DISPATCHER_CLAIM_INTERVAL_SECONDS = float(
+    os.getenv("ENGINE_DISPATCHER_CLAIM_INTERVAL_SECONDS", 1)
+)
+# the dispatcher keeps as many runs in flight as the engine accepts ("capacity" in /health, or learned
+# from 429/503 answers), re-reading the capacity and probing for more every ENGINE_CAPACITY_REFRESH_SECONDS
+ENGINE_CAPACITY_REFRESH_SECONDS = float(
+    os.getenv("ENGINE_CAPACITY_REFRESH_SECONDS", 60)
+)
+# blocking mode: conformations are post-processed (arc diagram, F1/INF) by this many local processes
+# while the engine computes the next ones, 0 - post-processing runs in the task between engine runs.
+# Celery prefork children are daemonic and can't fork, there the pool is made of threads: post-processing
+# overlaps the engine runs but the CPU-bound stages of a worker don't run in parallel (GIL)
+ENGINE_POSTPROCESSING_WORKERS = int(os.getenv("ENGINE_POSTPROCESSING_WORKERS", 0))
+# /api/metrics/ answers only requests sending "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+# metric updates are buffered in each process and written to the database at most every
+# METRICS_FLUSH_SECONDS (0 - every update is written at once)
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", 10))
 
 EMAIL_HOST = os.getenv("EMAIL_HOST")
 EMAIL_PORT = os.getenv("EMAIL_PORT")
@@ -53,6 +103,31 @@ TITLE_JOB_NEAR_EXPIRATION = os.getenv("EMAIL_TITLE_JOB_NEAR_EXPIRATION")
 UUID_HASH_LENGTH = int(os.getenv("UUID_HASH_LENGTH", 5))
 
 MAX_RNA_LENGTH = int(os.getenv("MAX_RNA_LENGTH", 500))
+# limits of one request to the bulk endpoints (/api/validateRNABulk/, /api/postRequestDataBulk/), the size
+# limit is shared
+BULK_VALIDATION_MAX_RECORDS = int(os.getenv("BULK_VALIDATION_MAX_RECORDS", 1000))
+BULK_VALIDATION_MAX_BYTES = int(os.getenv("BULK_VALIDATION_MAX_BYTES", 10 * 2**20))
+BULK_SUBMISSION_MAX_RECORDS = int(os.getenv("BULK_SUBMISSION_MAX_RECORDS", 500))
+
+# secondary structures are drawn by one long-lived VARNA JVM per worker process (needs a JDK for the
+# source launcher), falling back to a VARNA process per diagram when it is off or unavailable
+VARNA_RENDER_SERVER = os.getenv("VARNA_RENDER_SERVER", "True") == "True"
+VARNA_RENDER_TIMEOUT_SECONDS = float(os.getenv("VARNA_RENDER_TIMEOUT_SECONDS", 60))
+# directory with the compiled webapp/VarnaRenderServer.java (built into the images), without it diagrams
+# are drawn with one VARNA start each
+VARNA_SERVER_CLASSES = os.getenv("VARNA_SERVER_CLASSES", "/opt/varna-server")
+# arc diagrams: "svg" - written directly as SVG (webapp/arc_diagram.py), "matplotlib" - the previous renderer
+ARC_DIAGRAM_RENDERER = os.getenv("ARC_DIAGRAM_RENDERER", "svg")
+# decimals kept in the coordinates of the VARNA and arc diagram SVGs (webapp/svg_optimizer.py)
+SVG_COORDINATE_PRECISION = int(os.getenv("SVG_COORDINATE_PRECISION", 2))
+# identical diagrams (same structures and render settings) are stored once under MEDIA_ROOT/render_cache
+# and shared by the results, see webapp/render_cache.py
+RENDER_CACHE = os.getenv("RENDER_CACHE", "True") == "True"
+# "eager" - diagrams are drawn by the worker before the job completes, "lazy" - only the PDB and dot-bracket
+# files are made by the worker, the diagrams are queued on the grapharna worker when the results are first viewed
+DIAGRAM_RENDERING = os.getenv("DIAGRAM_RENDERING", "eager")
+# the drawing is queued once per job, a request not drawn within this many seconds is queued again
+DIAGRAM_REQUEST_TIMEOUT = int(os.getenv("DIAGRAM_REQUEST_TIMEOUT", 300))
 
 EXAMPLE_JOB_NAME_PREFIX = os.getenv("EXAMPLE_JOB_NAME_PREFIX", "example_job_")
 EXAMPLE_JOB_SEED = int(os.getenv("EXAMPLE_JOB_SEED", 1))
@@ -205,6 +280,13 @@ CELERY_TASK_ACKS_LATE = True
 
 CELERY_TASK_PREFETCH_MULTIPLIER = 1
 
+# new processes of the grapharna workers draw a small structure before taking jobs (webapp/warm_up.py),
+# the VARNA and matplotlib start takes longer than the 4 s celery waits for a process by default
+WORKER_WARM_UP = os.getenv("WORKER_WARM_UP", "True") == "True"
+CELERY_WORKER_PROC_ALIVE_TIMEOUT = float(
+    os.getenv("CELERY_WORKER_PROC_ALIVE_TIMEOUT", 60)
+)
+
 
 # Safeguard against long jobs
 
@@ -218,6 +300,12 @@ ENGINE_REQUEST_RETRY_DELAY = 30
 # Module settings
 MODEL_NAME = os.getenv("MODEL_NAME")
 EPOCHS = int(os.getenv("MODEL_EPOCHS", 800))
+# conformations computed before for the same structure, seed and model are cloned into new jobs instead of
+# running the engine again (webapp/result_cache.py), jobs can opt out with use_result_cache=false.
+# Off by default: the PDB and dot-seq files of one user's job are hard-linked into another user's job, and
+# the key only covers the validated input, the seed and MODEL_NAME/MODEL_EPOCHS, not the engine version or
+# its weights - clear the cache keys (JobResults.cache_key) when the engine changes
+RESULT_CACHE = os.getenv("RESULT_CACHE", "False") == "True"
 
 # testy
 TEST_RUNNER = "django.test.runner.DiscoverRunner"
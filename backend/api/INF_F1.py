@@ -1,5 +1,5 @@
 import math
-from api.validation_tools import RnaValidator
+from api.pair_extraction import extractPairs
 from typing import Mapping, Union
 
 
@@ -25,10 +25,9 @@ def CalculateF1Inf(
 
 
 def dotbracketToPairs(input: str) -> dict[str, set[tuple[int, int]]]:
-    validator = RnaValidator(input)
-    result = validator.ValidateRna()
-    incorrectPairs = set(result["Incorrect Pairs"])
-    allPairs = set(result["allPairs"])
+    pairs = extractPairs(input)
+    incorrectPairs = pairs.pairSet(incorrect=True)
+    allPairs = pairs.pairSet()
     correctPairs = allPairs - incorrectPairs
 
     Pairs: dict[str, set[tuple[int, int]]] = {
@@ -32,6 +32,10 @@ process_request_data_schema = swagger_auto_schema(
                 type=openapi.TYPE_INTEGER,
                 description="Number of alternative conformations to calculate (with seed incrementation). Default is 1.",
             ),
+            "use_result_cache": openapi.Schema(
+                type=openapi.TYPE_BOOLEAN,
+                description="Reuse conformations computed before for the same structure and seed. Default is true, false runs the engine for every conformation.",
+            ),
         },
         example={
             "fasta_raw": "CGCGGAACG CGGGACGCG\n((((...(( ))...))))",
@@ -130,6 +134,153 @@ process_request_data_schema = swagger_auto_schema(
     },
 )
 
+process_request_data_bulk_schema = swagger_auto_schema(
+    method="post",
+    operation_description=(
+        "Creates a job for every record of a multi-record FASTA (text or file) or a JSON array of FASTA "
+        "records, records are split like in /validateRNABulk/. Jobs are created only when every record "
+        "passes validation (suggested fixes are applied), their names are the record headers. No "
+        "notification emails are sent."
+    ),
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            "fasta_raw": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                description="Multi-record FASTA as raw text input",
+            ),
+            "fasta_file": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                format="binary",
+                description="Multi-record FASTA file",
+            ),
+            "records": openapi.Schema(
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Items(type=openapi.TYPE_STRING),
+                description="FASTA records, each one the input of /postRequestData/",
+            ),
+            "seed": openapi.Schema(
+                type=openapi.TYPE_INTEGER,
+                description="Random seed (integer) of every job. If not provided, a random one is generated for each job.",
+            ),
+            "job_name": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                description="Job names of records without a header are <job_name>-<position>. If not provided, one will be auto-generated.",
+            ),
+            "alternative_conformations": openapi.Schema(
+                type=openapi.TYPE_INTEGER,
+                description="Number of alternative conformations of every job. Default is 1.",
+            ),
+            "use_result_cache": openapi.Schema(
+                type=openapi.TYPE_BOOLEAN,
+                description="Reuse conformations computed before for the same structure and seed. Default is true.",
+            ),
+        },
+        example={
+            "fasta_raw": ">design1\nGGGAAACCC\n(((...)))\n>design2\nGGGAAAUCC\n(((...)))",
+            "seed": 42,
+            "alternative_conformations": 1,
+        },
+    ),
+    responses={
+        200: openapi.Response(
+            description="All jobs created",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "success": openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                    "Jobs": openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Items(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                "Record": openapi.Schema(type=openapi.TYPE_INTEGER),
+                                "Job": openapi.Schema(type=openapi.TYPE_STRING),
+                                "uidh": openapi.Schema(type=openapi.TYPE_STRING),
+                            },
+                        ),
+                    ),
+                },
+            ),
+            examples={
+                "application/json": {
+                    "success": True,
+                    "Jobs": [
+                        {"Record": 0, "Job": "design1", "uidh": "Xk3_a"},
+                        {"Record": 1, "Job": "design2", "uidh": "b7QwE"},
+                    ],
+                }
+            },
+        ),
+        400: openapi.Response(
+            description="Bad request - missing data, more than one input, invalid seed or number of conformations",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "success": openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                    "error": openapi.Schema(type=openapi.TYPE_STRING),
+                },
+            ),
+            examples={
+                "application/json": {
+                    "success": False,
+                    "error": "Missing RNA data.",
+                },
+            },
+        ),
+        413: openapi.Response(
+            description=(
+                "More records (BULK_SUBMISSION_MAX_RECORDS) or bytes (BULK_VALIDATION_MAX_BYTES) "
+                "than allowed"
+            ),
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "success": openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                    "error": openapi.Schema(type=openapi.TYPE_STRING),
+                },
+            ),
+        ),
+        422: openapi.Response(
+            description="Some records failed validation, no job was created",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "success": openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                    "error": openapi.Schema(type=openapi.TYPE_STRING),
+                    "Invalid Records": openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Items(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                "Record": openapi.Schema(type=openapi.TYPE_INTEGER),
+                                "Name": openapi.Schema(type=openapi.TYPE_STRING),
+                                "Error List": openapi.Schema(
+                                    type=openapi.TYPE_ARRAY,
+                                    items=openapi.Items(type=openapi.TYPE_STRING),
+                                ),
+                            },
+                        ),
+                    ),
+                },
+            ),
+            examples={
+                "application/json": {
+                    "success": False,
+                    "error": "Some records failed validation, no jobs were created.",
+                    "Invalid Records": [
+                        {
+                            "Record": 1,
+                            "Name": "design2",
+                            "Error List": ["RNA contains invalid characters: X"],
+                        }
+                    ],
+                }
+            },
+        ),
+    },
+)
+
 setup_test_job_schema = swagger_auto_schema(
     method="post",
     request_body=openapi.Schema(
@@ -626,6 +777,88 @@ validate_rna_schema = swagger_auto_schema(
         ),
     },
 )
+
+
+validate_rna_bulk_schema = swagger_auto_schema(
+    method="post",
+    operation_description=(
+        "Validates many RNA structures in one request. Every record is validated like in /validateRNA/ "
+        "and its results are streamed as one NDJSON line, in the order of the records. In a multi-record "
+        "FASTA every '>' header starts a record (strands are joined with a strand separator), records "
+        "without headers are a sequence line followed by a dot-bracket line."
+    ),
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            "fasta_raw": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                description="Multi-record FASTA as raw text input",
+            ),
+            "fasta_file": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                format="binary",
+                description="Multi-record FASTA file",
+            ),
+            "records": openapi.Schema(
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Items(type=openapi.TYPE_STRING),
+                description="FASTA records, each one the input of /validateRNA/",
+            ),
+        },
+        example={
+            "fasta_raw": ">design1\nGGGAAACCC\n(((...)))\n>design2\nGGGAAAUCC\n(((...)))"
+        },
+    ),
+    responses={
+        200: openapi.Response(
+            description=(
+                "NDJSON (application/x-ndjson), one line per record: its position (Record), header "
+                "(Name, null without one) and the results of /validateRNA/"
+            ),
+            examples={
+                "application/x-ndjson": '{"Record": 0, "Name": "design1", "Validation Result": true, '
+                '"Error List": [], "Validated RNA": "GGGAAACCC\\n(((...)))", "Mismatching Brackets": [], '
+                '"Incorrect Pairs": [], "Fix Suggested": false, "allPairs": [[2, 6], [1, 7], [0, 8]], '
+                '"strandSeparator": "N"}\n'
+            },
+        ),
+        400: openapi.Response(
+            description="Bad request - missing data, more than one input or records that aren't strings",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "success": openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                    "error": openapi.Schema(type=openapi.TYPE_STRING),
+                },
+            ),
+            examples={
+                "application/json": {
+                    "success": False,
+                    "error": "Missing RNA data.",
+                },
+            },
+        ),
+        413: openapi.Response(
+            description=(
+                "More records (BULK_VALIDATION_MAX_RECORDS) or bytes (BULK_VALIDATION_MAX_BYTES) "
+                "than allowed"
+            ),
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "success": openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                    "error": openapi.Schema(type=openapi.TYPE_STRING),
+                },
+            ),
+            examples={
+                "application/json": {
+                    "success": False,
+                    "error": "Number of records exceeds the maximum of 1000.",
+                },
+            },
+        ),
+    },
+)
 get_results_schema = swagger_auto_schema(
     method="get",
     manual_parameters=[
@@ -689,6 +922,25 @@ get_results_schema = swagger_auto_schema(
                                     type=openapi.TYPE_STRING,
                                     description="Processing time for this result (timedelta, formatted as 'HH:MM:SS.ssssss')",
                                 ),
+                                "error": openapi.Schema(
+                                    type=openapi.TYPE_STRING,
+                                    description="Why the scoring of this result failed (f1 and inf are null then)",
+                                ),
+                            },
+                        ),
+                    ),
+                    "diagrams_pending": openapi.Schema(
+                        type=openapi.TYPE_BOOLEAN,
+                        description="Diagrams of the results are being drawn (DIAGRAM_RENDERING=lazy), they are empty until then",
+                    ),
+                    "failed_conformations": openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        description="Conformations left out of the results because their engine run or post-processing failed",
+                        items=openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                "seed": openapi.Schema(type=openapi.TYPE_INTEGER),
+                                "error": openapi.Schema(type=openapi.TYPE_STRING),
                             },
                         ),
                     ),
@@ -714,8 +966,11 @@ get_results_schema = swagger_auto_schema(
                             "inf": None,
                             "seed": 123456,
                             "processing_time": "4.530384",
+                            "error": None,
                         }
                     ],
+                    "failed_conformations": [],
+                    "diagrams_pending": False,
                 }
             },
         ),
@@ -734,6 +989,99 @@ get_results_schema = swagger_auto_schema(
         ),
     },
 )
+rescore_results_schema = swagger_auto_schema(
+    method="post",
+    operation_description="Scores all conformations of a completed job against its input structure in one batch "
+    "and stores the new F1 and INF values. Besides F1 and INF it returns the base pair counts (tp, fp, fn), MCC "
+    "and the same values for the pseudoknot pairs only (pk_ prefix).",
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        required=["uidh"],
+        properties={
+            "uidh": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                description="Job Hashed UID (uidh)",
+                example="a1b2c3d4e5",
+            ),
+        },
+    ),
+    responses={
+        200: openapi.Response(
+            description="Conformations rescored",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "success": openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                    "Results": openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                "seed": openapi.Schema(type=openapi.TYPE_INTEGER),
+                                "tp": openapi.Schema(type=openapi.TYPE_INTEGER),
+                                "fp": openapi.Schema(type=openapi.TYPE_INTEGER),
+                                "fn": openapi.Schema(type=openapi.TYPE_INTEGER),
+                                "f1": openapi.Schema(type=openapi.TYPE_NUMBER),
+                                "inf": openapi.Schema(type=openapi.TYPE_NUMBER),
+                                "mcc": openapi.Schema(type=openapi.TYPE_NUMBER),
+                                "pk_tp": openapi.Schema(type=openapi.TYPE_INTEGER),
+                                "pk_fp": openapi.Schema(type=openapi.TYPE_INTEGER),
+                                "pk_fn": openapi.Schema(type=openapi.TYPE_INTEGER),
+                                "pk_f1": openapi.Schema(type=openapi.TYPE_NUMBER),
+                                "pk_inf": openapi.Schema(type=openapi.TYPE_NUMBER),
+                                "pk_mcc": openapi.Schema(type=openapi.TYPE_NUMBER),
+                            },
+                        ),
+                    ),
+                },
+            ),
+            examples={
+                "application/json": {
+                    "success": True,
+                    "Results": [
+                        {
+                            "seed": 123456,
+                            "tp": 3,
+                            "fp": 0,
+                            "fn": 1,
+                            "f1": 0.857,
+                            "inf": 0.866,
+                            "mcc": 0.862,
+                            "pk_tp": 0,
+                            "pk_fp": 0,
+                            "pk_fn": 1,
+                            "pk_f1": 0.0,
+                            "pk_inf": 0.0,
+                            "pk_mcc": 0.0,
+                        }
+                    ],
+                }
+            },
+        ),
+        400: openapi.Response(
+            description="Missing UIDH, job not found or not completed",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "success": openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                    "error": openapi.Schema(type=openapi.TYPE_STRING),
+                },
+            ),
+            examples={
+                "application/json": {
+                    "success": False,
+                    "error": "Job is not completed.",
+                },
+            },
+        ),
+        404: openapi.Response(
+            description="Input or result files not found",
+            examples={
+                "application/json": {"success": False, "error": "File not found"},
+            },
+        ),
+    },
+)
 get_suggested_seed_and_job_name_schema = swagger_auto_schema(
     method="get",
     manual_parameters=[
@@ -813,6 +1161,13 @@ download_zip_file_schema = swagger_auto_schema(
             ),
             examples={"text/plain": "Job not found"},
         ),
+        409: openapi.Response(
+            description="The diagrams of the job are being drawn (DIAGRAM_RENDERING=lazy), retry after Retry-After seconds",
+            schema=openapi.Schema(
+                type=openapi.TYPE_STRING,
+            ),
+            examples={"text/plain": "Diagrams are being drawn, try again shortly"},
+        ),
     },
 )
 
@@ -947,3 +1302,103 @@ healthcheck_schema = swagger_auto_schema(
         )
     },
 )
+
+engine_callback_schema = swagger_auto_schema(
+    method="post",
+    manual_parameters=[
+        openapi.Parameter(
+            "X-Engine-Token",
+            openapi.IN_HEADER,
+            description="Shared secret configured as ENGINE_CALLBACK_TOKEN.",
+            type=openapi.TYPE_STRING,
+            required=True,
+        )
+    ],
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        required=["uuid", "seed"],
+        properties={
+            "uuid": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                description="UUID of the job the finished run belongs to.",
+            ),
+            "seed": openapi.Schema(
+                type=openapi.TYPE_INTEGER,
+                description="Seed of the finished run.",
+            ),
+        },
+        example={
+            "uuid": "0b4f3c1e-7d2a-4c3e-9a57-3c6f1d2b8e90",
+            "seed": 123456,
+        },
+    ),
+    responses={
+        202: openapi.Response(
+            description="Run status check scheduled",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "success": openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                },
+            ),
+            examples={"application/json": {"success": True}},
+        ),
+        400: openapi.Response(
+            description="Bad request - missing uuid or seed",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "success": openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                    "error": openapi.Schema(type=openapi.TYPE_STRING),
+                },
+            ),
+            examples={
+                "application/json": {
+                    "success": False,
+                    "error": "Missing uuid or seed.",
+                }
+            },
+        ),
+        403: openapi.Response(
+            description="Missing or invalid engine token",
+        ),
+        404: openapi.Response(
+            description="No submitted run matches the uuid and seed",
+        ),
+    },
+)
+
+
+metrics_schema = swagger_auto_schema(
+    method="get",
+    operation_description=(
+        "Backend metrics (engine circuit breaker state and transitions, counters) "
+        "in the Prometheus text exposition format."
+    ),
+    manual_parameters=[
+        openapi.Parameter(
+            "Authorization",
+            openapi.IN_HEADER,
+            description="Bearer followed by the secret configured as METRICS_TOKEN.",
+            type=openapi.TYPE_STRING,
+            required=True,
+        )
+    ],
+    responses={
+        200: openapi.Response(
+            description="Metrics in the Prometheus text format",
+            examples={
+                "text/plain": "# TYPE engine_circuit_open gauge\nengine_circuit_open 0.0\n"
+            },
+        ),
+        403: openapi.Response(
+            description="Missing or invalid metrics token",
+            examples={
+                "application/json": {
+                    "success": False,
+                    "error": "Invalid metrics token.",
+                }
+            },
+        ),
+    },
+)
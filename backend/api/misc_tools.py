@@ -1,13 +1,17 @@
+import random
+from celery import current_app
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
 from webapp.hashing_tools import hash_uuid
 from rest_framework.response import Response
 from rest_framework import status
-from typing import Optional
+from typing import Optional, cast
 from webapp.models import Job, ExampleStructures
 from webapp.tasks import run_grapharna_task, send_email_task
 from uuid import UUID, uuid4
 import os
-from api.validation_tools import RnaValidator
+from api.validation_tools import RnaValidator, fastaRecordName
 
 
 def CreateNewJob(
@@ -17,6 +21,7 @@ def CreateNewJob(
     alternative_conformations: int,
     email: Optional[str],
     example_number: Optional[int],
+    use_result_cache: bool = True,
 ) -> Response:
     validator: RnaValidator = RnaValidator(sequence_raw)
     validationResult = validator.ValidateRna()
@@ -50,6 +55,7 @@ def CreateNewJob(
             status="Q",
             alternative_conformations=alternative_conformations,
             strand_separator=validationResult["strandSeparator"],
+            use_result_cache=use_result_cache,
         )
         ExampleStructures.objects.create(id=example_number, job=job)
     else:  # normal job, store email
@@ -63,6 +69,7 @@ def CreateNewJob(
             status="Q",
             alternative_conformations=alternative_conformations,
             strand_separator=validationResult["strandSeparator"],
+            use_result_cache=use_result_cache,
         )
 
     run_grapharna_task.delay(job.uid, example_number=example_number)
@@ -95,3 +102,144 @@ def CreateNewJob(
             },
             status=status.HTTP_200_OK,
         )
+
+
+def publishJobs(jobs: list[Job]) -> None:
+    """
+    Queues the tasks of the jobs through one producer, so they share one broker connection and channel
+    instead of taking one from the pool per task. Each task is still its own message, the broker has no batch
+    publish for Celery tasks; chunks would be one message but run the jobs one after another in one task.
+    """
+    with current_app.producer_or_acquire() as producer:
+        for job in jobs:
+            run_grapharna_task.apply_async((job.uid,), producer=producer)
+
+
+def CreateNewJobs(
+    records: list[str],
+    job_name: str,
+    seed: Optional[int],
+    alternative_conformations: int,
+    use_result_cache: bool = True,
+) -> Response:
+    """
+    Creates a job for every record of a bulk submission, or none when any record fails validation.
+    Records are named by their headers, records without one {job_name}-{position}. Without a seed every
+    job gets a random one. All jobs are inserted in one transaction and their tasks are published as
+    one producer once it is committed (publishJobs). No emails are sent for bulk submissions.
+    bulk_create skips the model validators, the number of conformations and the job names are checked here.
+    """
+    try:
+        cast(
+            models.Field, Job._meta.get_field("alternative_conformations")
+        ).run_validators(alternative_conformations)
+    except ValidationError as e:
+        return Response(
+            {"success": False, "error": " ".join(e.messages)},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    maxNameLength: int = (
+        cast(models.Field, Job._meta.get_field("job_name")).max_length or 255
+    )
+
+    names: list[str] = [
+        fastaRecordName(record) or f"{job_name}-{index + 1}"
+        for index, record in enumerate(records)
+    ]
+    longNames: list[dict] = [
+        {"Record": index, "Name": name}
+        for index, name in enumerate(names)
+        if len(name) > maxNameLength
+    ]
+    if longNames:
+        return Response(
+            {
+                "success": False,
+                "error": f"Job names can't be longer than {maxNameLength} characters, no jobs were created.",
+                "Invalid Records": longNames,
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    validated: list[tuple[str, dict]] = []
+    invalidRecords: list[dict] = []
+    for index, (record, name) in enumerate(zip(records, names)):
+        validationResult = RnaValidator(record).ValidateRna()
+        if validationResult["Validation Result"]:
+            validated.append((name, validationResult))
+        else:
+            invalidRecords.append(
+                {
+                    "Record": index,
+                    "Name": name,
+                    "Error List": validationResult["Error List"],
+                }
+            )
+    if invalidRecords:
+        return Response(
+            {
+                "success": False,
+                "error": "Some records failed validation, no jobs were created.",
+                "Invalid Records": invalidRecords,
+            },
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+
+    # uids with hashes unique among the new and the existing jobs
+    uids: list[UUID] = []
+    hashes: set[str] = set()
+    while len(uids) < len(validated):
+        candidates = {hash_uuid(str(u)): u for u in (uuid4() for _ in validated)}
+        taken = set(
+            Job.objects.filter(hashed_uid__in=candidates.keys()).values_list(
+                "hashed_uid", flat=True
+            )
+        )
+        for hashed_uid, job_uuid in candidates.items():
+            if hashed_uid not in taken and hashed_uid not in hashes:
+                hashes.add(hashed_uid)
+                uids.append(job_uuid)
+    uids = uids[: len(validated)]
+
+    input_dir: str = os.path.join(settings.MEDIA_ROOT, "engine_inputs")
+    os.makedirs(input_dir, exist_ok=True)
+    jobs: list[Job] = []
+    for job_uuid, (name, validationResult) in zip(uids, validated):
+        input_filepath: str = os.path.join(input_dir, f"{str(job_uuid)}.dotseq")
+        with open(input_filepath, "w") as f:
+            f.write(f">{name}\n{validationResult['Validated RNA']}")
+        jobs.append(
+            Job(
+                uid=job_uuid,
+                hashed_uid=hash_uuid(str(job_uuid)),
+                input_structure=os.path.relpath(input_filepath, settings.MEDIA_ROOT),
+                seed=seed if seed is not None else random.randint(1, 1000000000),
+                job_name=name,
+                status="Q",
+                alternative_conformations=alternative_conformations,
+                strand_separator=validationResult["strandSeparator"],
+                use_result_cache=use_result_cache,
+            )
+        )
+
+    try:
+        with transaction.atomic():
+            Job.objects.bulk_create(jobs)
+            # workers must not get a task before its job is committed
+            transaction.on_commit(lambda: publishJobs(jobs))
+    except Exception:
+        for job in jobs:
+            if os.path.isfile(job.input_structure.path):
+                os.remove(job.input_structure.path)
+        raise
+
+    return Response(
+        {
+            "success": True,
+            "Jobs": [
+                {"Record": index, "Job": job.job_name, "uidh": job.hashed_uid}
+                for index, job in enumerate(jobs)
+            ],
+        },
+        status=status.HTTP_200_OK,
+    )
@@ -0,0 +1,138 @@
+from array import array
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+from django.conf import settings
+from api.validation_tools import RnaValidator, getValidationRules
+from webapp.models import SeparatorChoices
+
+if TYPE_CHECKING:
+    import numpy as np
+    import numpy.typing as npt
+
+SEPARATORS = frozenset(choice.value for choice in SeparatorChoices)
+
+
+@dataclass
+class StructurePairs:
+    """
+    Base pairs of a dot-seq per bracket type ("()", "[]", ...), 0-indexed like the "allPairs" of RnaValidator.
+    Each type is a flat array of positions: i0, j0, i1, j1, ... in the order the pairs are closed.
+    Correct pairs are the "allPairs" of RnaValidator, incorrect ones its "Incorrect Pairs".
+    """
+
+    correct: dict[str, array] = field(default_factory=dict)
+    incorrect: dict[str, array] = field(default_factory=dict)
+    # of the dot-bracket (with the strand breaks), 0 when it couldn't be read
+    length: int = 0
+
+    def pairSet(self, incorrect: bool = False) -> set[tuple[int, int]]:
+        pairs: set[tuple[int, int]] = set()
+        for positions in (self.incorrect if incorrect else self.correct).values():
+            pairs.update(zip(positions[::2], positions[1::2]))
+        return pairs
+
+    def numpy(self, incorrect: bool = False) -> "dict[str, npt.NDArray[np.int32]]":
+        """The pairs of every bracket type as a (pairs, 2) NumPy array."""
+        import numpy as np
+
+        return {
+            bracket: np.frombuffer(positions, dtype=np.int32).reshape(-1, 2)
+            for bracket, positions in (
+                self.incorrect if incorrect else self.correct
+            ).items()
+        }
+
+
+def extractPairs(dotseq: str) -> StructurePairs:
+    """
+    Pairs of a dot-seq, the same as RnaValidator(dotseq).ValidateRna() gives (no pairs when it fails
+    validation). A single structure without strand separators (what the engine writes and what
+    finalize_job makes of the inputs once the separators are removed) is read in one pass over the
+    dot-bracket. Anything else is left to RnaValidator.
+    """
+    lines: list[str] = [
+        item.strip()
+        for item in dotseq.split("\n")
+        if (item.strip() != "" and item[0] != "#")
+    ]  # the lines RnaValidator reads
+    if len(lines) == 3 and lines[0][0] == ">":
+        sequence, dotBracket = lines[1], lines[2]
+    elif len(lines) == 2 and lines[0][0] != ">":
+        sequence, dotBracket = lines
+    else:
+        return validatorPairs(dotseq)
+    if not SEPARATORS.isdisjoint(sequence) or not SEPARATORS.isdisjoint(dotBracket):
+        return validatorPairs(dotseq)
+
+    rules = getValidationRules()
+    pairs = StructurePairs(length=len(dotBracket))
+    rna = sequence.upper().replace("T", "U")
+    if (
+        len(rna) != len(dotBracket)
+        or len(rna) > settings.MAX_RNA_LENGTH
+        or rna.translate(rules.nucleotideFilter)
+        or dotBracket.translate(rules.bracketFilter)
+    ):  # fails validation, RnaValidator has no pairs either
+        return pairs
+
+    # one pass pairing the brackets, the nucleotides of the pairs are checked per bracket type after it
+    stacks: dict[str, list[int]] = {bracket: [] for bracket in rules.bracketPairs}
+    positions: dict[str, list[int]] = {bracket: [] for bracket in rules.bracketPairs}
+    openingStacks = {
+        char: stacks[bracket] for char, bracket in rules.openingLookup.items()
+    }
+    closingStacks = {
+        char: (stacks[bracket], positions[bracket])
+        for char, bracket in rules.closingLookup.items()
+    }
+    for j, char in enumerate(dotBracket):
+        stack = openingStacks.get(char)
+        if stack is not None:
+            stack.append(j)
+            continue
+        closing = closingStacks.get(char)
+        if closing is None or not closing[0]:  # dots and unpaired closing brackets
+            continue
+        closing[1].append(closing[0].pop())
+        closing[1].append(j)
+
+    pairMatrix = rules.pairMatrix
+    noPartners: frozenset[str] = frozenset()
+    for bracket, found in positions.items():
+        if not found:
+            continue
+        valid = [
+            rna[j] in pairMatrix.get(rna[i], noPartners)
+            for i, j in zip(found[::2], found[1::2])
+        ]
+        if all(valid):
+            pairs.correct[bracket] = array("i", found)
+            continue
+        for n, isValid in enumerate(valid):
+            target = pairs.correct if isValid else pairs.incorrect
+            if bracket not in target:
+                target[bracket] = array("i")
+            target[bracket].extend(found[2 * n : 2 * n + 2])
+    return pairs
+
+
+def validatorPairs(dotseq: str) -> StructurePairs:
+    """Pairs of RnaValidator grouped by bracket type, for the inputs extractPairs doesn't read itself."""
+    validator = RnaValidator(dotseq)
+    result = validator.ValidateRna()
+    pairs = StructurePairs()
+    if not result["Validation Result"]:
+        return pairs
+    dotBracket = validator.parsedStructure.split("\n")[1]
+    pairs.length = len(dotBracket)
+    rules = validator.rules
+    for target, found in (
+        (pairs.correct, result["allPairs"]),
+        (pairs.incorrect, result["Incorrect Pairs"]),
+    ):
+        for i, j in found:
+            bracket = rules.openingLookup[dotBracket[i]]
+            if bracket not in target:
+                target[bracket] = array("i")
+            target[bracket].extend((i, j))
+    return pairs
@@ -0,0 +1,174 @@
+from typing import Sequence
+import numpy as np
+import numpy.typing as npt
+from django.db.models.query import QuerySet
+from api.pair_extraction import StructurePairs, extractPairs
+from webapp.models import Job, JobResults
+
+# pairs of other bracket types are pseudoknots
+NESTED_BRACKETS = "()"
+# elements of the (references, models, positions) comparison computed at once, bounds its memory
+MAX_BATCH_ELEMENTS = 2**24
+
+
+def encodeStructures(
+    structures: Sequence[StructurePairs], length: int
+) -> tuple[npt.NDArray[np.int32], npt.NDArray[np.bool_]]:
+    """
+    Structures as a (structures, length) matrix with the partner of every opening position (the j of pair
+    (i, j) at i, -1 elsewhere) and the mask of the opening positions of pseudoknot pairs. A position is in
+    at most one pair, so two structures share a pair exactly where their partners are equal.
+    """
+    partners = np.full((len(structures), length), -1, dtype=np.int32)
+    pseudoknots = np.zeros((len(structures), length), dtype=np.bool_)
+    for row, structure in enumerate(structures):
+        for bracket, positions in structure.correct.items():
+            pairs = np.frombuffer(positions, dtype=np.int32).reshape(-1, 2)
+            partners[row, pairs[:, 0]] = pairs[:, 1]
+            if bracket != NESTED_BRACKETS:
+                pseudoknots[row, pairs[:, 0]] = True
+    return partners, pseudoknots
+
+
+def _rates(
+    tp: npt.NDArray[np.int64],
+    fp: npt.NDArray[np.int64],
+    fn: npt.NDArray[np.int64],
+    possible: npt.NDArray[np.int64],
+) -> dict[str, npt.NDArray]:
+    """F1, INF and MCC with the conventions of CalculateF1Inf for empty structures."""
+    tp_f, fp_f, fn_f = (a.astype(np.float64) for a in (tp, fp, fn))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ppv = np.where(tp + fp > 0, tp_f / (tp_f + fp_f), 0.0)
+        sty = np.where(tp + fn > 0, tp_f / (tp_f + fn_f), 1.0)
+        f1 = np.where(2 * tp + fp + fn > 0, 2 * tp_f / (2 * tp_f + fp_f + fn_f), 0.0)
+        # true negatives: the position pairs (i < j) paired in neither structure
+        tn_f = (possible - tp - fp - fn).astype(np.float64)
+        denominator = np.sqrt(
+            (tp_f + fp_f) * (tp_f + fn_f) * (tn_f + fp_f) * (tn_f + fn_f)
+        )
+        mcc = np.where(denominator > 0, (tp_f * tn_f - fp_f * fn_f) / denominator, 0.0)
+    return {
+        "tp": tp,
+        "fp": fp,
+        "fn": fn,
+        "f1": f1,
+        "inf": np.sqrt(ppv * sty),
+        "mcc": mcc,
+    }
+
+
+def scoreStructures(
+    references: Sequence[StructurePairs], models: Sequence[StructurePairs]
+) -> dict[str, npt.NDArray]:
+    """
+    Scores every model against every reference: (references, models) matrices of tp, fp, fn, F1, INF and
+    MCC of the correct pairs (what CalculateF1Inf gives for the pair sets), and the same of the pseudoknot
+    pairs only with a "pk_" prefix. MCC counts the pairs of positions (i < j) of the longer structure as
+    the negatives.
+    """
+    # positions of the pairs are within the dot-brackets
+    length = max([s.length for s in (*references, *models)] + [1])
+    referencePartners, referencePseudoknots = encodeStructures(references, length)
+    modelPartners, modelPseudoknots = encodeStructures(models, length)
+
+    shape = (len(references), len(models))
+    tp = np.zeros(shape, dtype=np.int64)
+    pk_tp = np.zeros(shape, dtype=np.int64)
+    rows = max(1, MAX_BATCH_ELEMENTS // max(len(models) * length, 1))
+    for start in range(0, len(references), rows):
+        chunk = slice(start, start + rows)
+        shared = (referencePartners[chunk, None, :] == modelPartners[None, :, :]) & (
+            referencePartners[chunk, None, :] >= 0
+        )
+        tp[chunk] = shared.sum(axis=2)
+        pk_tp[chunk] = (
+            shared & referencePseudoknots[chunk, None, :] & modelPseudoknots[None, :, :]
+        ).sum(axis=2)
+
+    referenceCount = (referencePartners >= 0).sum(axis=1)[:, None]
+    modelCount = (modelPartners >= 0).sum(axis=1)[None, :]
+    referencePkCount = referencePseudoknots.sum(axis=1)[:, None]
+    modelPkCount = modelPseudoknots.sum(axis=1)[None, :]
+    lengths = np.maximum(
+        np.array([max(s.length, 1) for s in references], dtype=np.int64)[:, None],
+        np.array([max(s.length, 1) for s in models], dtype=np.int64)[None, :],
+    )
+    possible = lengths * (lengths - 1) // 2
+
+    scores = _rates(tp, modelCount - tp, referenceCount - tp, possible)
+    pseudoknotScores = _rates(
+        pk_tp, modelPkCount - pk_tp, referencePkCount - pk_tp, possible
+    )
+    scores.update({f"pk_{name}": value for name, value in pseudoknotScores.items()})
+    return scores
+
+
+def scoreDotseqs(reference: str, models: Sequence[str]) -> list[dict[str, float]]:
+    """Scores of every model dot-seq against the reference dot-seq, one dict per model."""
+    scores = scoreStructures(
+        [extractPairs(reference)], [extractPairs(model) for model in models]
+    )
+    columns = {name: value[0].tolist() for name, value in scores.items()}
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def readDotseq(path: str) -> str:
+    """A dot-seq file without the strand breaks (spaces and dashes)."""
+    with open(path) as f:
+        return f.read().replace(" ", "").replace("-", "")
+
+
+def annotatedResults(job: Job) -> QuerySet:
+    """The conformations of a job that have a structure from the annotator, the others aren't scored."""
+    return (
+        JobResults.objects.filter(job=job)
+        .exclude(result_secondary_structure_dotseq__isnull=True)
+        .exclude(result_secondary_structure_dotseq="")
+        .order_by("seed", "completed_at")
+    )
+
+
+def jobDotseqs(job: Job, results: Sequence[JobResults]) -> tuple[str, list[str]]:
+    """The input dot-seq of a job and the dot-seqs of its results. Raises OSError when a file is missing."""
+    reference = readDotseq(job.input_structure.path)
+    models = [readDotseq(r.result_secondary_structure_dotseq.path) for r in results]
+    return reference, models
+
+
+def scoreJobResults(job: Job) -> None:
+    """
+    Stores the F1 and INF of the conformations of a job that aren't scored yet (results copied from the
+    result cache are), all in one scoreStructures batch. A conformation whose structure can't be read or
+    parsed is left unscored with the error on its row, all of them are when the input structure can't be.
+    """
+    results: list[JobResults] = list(
+        annotatedResults(job).filter(f1__isnull=True, error__isnull=True)
+    )
+    if not results:
+        return
+    try:
+        reference = extractPairs(readDotseq(job.input_structure.path))
+    except Exception as e:
+        for result in results:
+            result.error = f"Scoring failed: {e}"
+        JobResults.objects.bulk_update(results, ["error"])
+        return
+    scored: list[JobResults] = []
+    models: list[StructurePairs] = []
+    for result in results:
+        try:
+            path = result.result_secondary_structure_dotseq.path
+            models.append(extractPairs(readDotseq(path)))
+        except Exception as e:
+            result.error = f"Scoring failed: {e}"
+            continue
+        scored.append(result)
+    if models:
+        scores = scoreStructures([reference], models)
+        for result, f1, inf in zip(
+            scored, scores["f1"][0].tolist(), scores["inf"][0].tolist()
+        ):
+            result.f1 = f1
+            result.inf = inf
+    JobResults.objects.bulk_update(results, ["f1", "inf", "error"])
@@ -1,6 +1,6 @@
 from datetime import date, timedelta
-from unittest.mock import MagicMock, mock_open, patch
-from django.test import TestCase
+from unittest.mock import MagicMock, call, mock_open, patch
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.conf import settings
 from rest_framework.test import APIClient
 from rest_framework.response import Response
@@ -16,7 +16,10 @@ import os
 import zipfile
 import io
 import math
+import json
+import tempfile
 from api.INF_F1 import CalculateF1Inf, dotbracketToPairs
+from api.validation_tools import RnaValidator
 
 
 class ProcessExampleRequestDataTests(TestCase):
@@ -313,9 +316,10 @@ class GetResultsTests(TestCase):
         self.job.sum_processing_time = timedelta(minutes=5)
 
         self.job_results: list[MagicMock] = []
-        for _ in range(3):
+        for i in range(3):
             jr = MagicMock()
             jr.job = self.job
+            jr.seed = self.job.seed + i
             jr.completed_at = timezone.now()
             jr.result_tertiary_structure.read.return_value = b"HEADER RNA PDB"
             jr.result_secondary_structure_dotseq.read.return_value = b"..((..)).."
@@ -324,6 +328,7 @@ class GetResultsTests(TestCase):
             jr.f1 = 0.95
             jr.inf = 0.85
             jr.processing_time = timedelta(minutes=1)
+            jr.error = None
             self.job_results.append(jr)
 
     def test_valid_get_no_results(self) -> None:
@@ -399,6 +404,7 @@ class GetResultsTests(TestCase):
             )
             self.assertEqual(result_item["f1"], jr.f1)
             self.assertEqual(result_item["inf"], jr.inf)
+            self.assertEqual(result_item["seed"], jr.seed)
 
     def test_unfinished_job(self) -> None:
         self.job.status = "Q"
@@ -707,6 +713,238 @@ class PostRnaValidationTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
+class RnaValidatorTests(SimpleTestCase):
+    def test_rules_are_compiled_once_per_settings(self) -> None:
+        rules = RnaValidator("GGGAAACCC\n(((...)))").rules
+        self.assertIs(RnaValidator("GC\n()").rules, rules)
+        with override_settings(VALID_PAIRS="GCCG"):
+            self.assertIsNot(RnaValidator("GC\n()").rules, rules)
+            result = RnaValidator("GGU\n(.)").ValidateRna()
+        self.assertEqual(result["Incorrect Pairs"], [(0, 2)])
+        self.assertEqual(RnaValidator("GGU\n(.)").ValidateRna()["allPairs"], [(0, 2)])
+
+    def test_pseudoknot_with_incorrect_pair_and_unpaired_brackets(self) -> None:
+        result = RnaValidator(">knot\nGGAACCUUCA A\n([)(]).)[. )").ValidateRna()
+        self.assertEqual(
+            result,
+            {
+                "Validation Result": True,
+                "Error List": [],
+                "Validated RNA": "GGAACCUUCA A\n.[..]..... .",
+                "Mismatching Brackets": [7, 11, 8],
+                "Incorrect Pairs": [(0, 2), (3, 5)],
+                "Fix Suggested": True,
+                "allPairs": [(1, 4)],
+                "strandSeparator": " ",
+            },
+        )
+
+    def test_invalid_characters_are_reported_sorted(self) -> None:
+        result = RnaValidator("GXAZC\n(.*.)").ValidateRna()
+        self.assertFalse(result["Validation Result"])
+        self.assertEqual(
+            result["Error List"],
+            [
+                "RNA contains invalid characters: XZ",
+                "DotBracket contains invalid brackets: *",
+            ],
+        )
+
+
+class PostRnaValidationBulkTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.url = reverse("validateRNABulk")
+
+    def lines(self, response: Any) -> list[Dict[str, Any]]:
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        content = b"".join(response.streaming_content).decode("utf-8")
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_multi_record_fasta(self) -> None:
+        fasta = (
+            "GCXAAGC\n((...))\n"
+            ">design1\nAGC-UUU\n(..-..)\n\n# comment\n>design2\nAGGAAACCC\n(((...)))\n"
+        )
+        response = self.client.post(self.url, {"fasta_raw": fasta}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = self.lines(response)
+        self.assertEqual([line["Record"] for line in lines], [0, 1, 2])
+        self.assertEqual([line["Name"] for line in lines], [None, "design1", "design2"])
+        self.assertEqual(
+            [line["Validation Result"] for line in lines], [False, True, True]
+        )
+        single = self.client.post(
+            reverse("validateRNA"),
+            {"fasta_raw": ">design1\nAGC-UUU\n(..-..)"},
+            format="json",
+        )
+        self.assertEqual(lines[1]["Validated RNA"], single.data["Validated RNA"])
+        self.assertEqual(lines[2]["Incorrect Pairs"], [[0, 8]])
+
+    def test_json_records_and_file(self) -> None:
+        response = self.client.post(
+            self.url,
+            {"records": [">a\nAGC UUU\n(.. ..)\n>b\nAGC UUU\n(.. ..)", "GC\n()"]},
+            format="json",
+        )
+        lines = self.lines(response)
+        self.assertEqual(
+            [line["Validated RNA"] for line in lines],
+            ["AGC UUU AGC UUU\n(.. ..) (.. ..)", "GC\n()"],
+        )
+
+        fasta_file = SimpleUploadedFile(
+            "designs.fasta", b">a\nGC\n()\n>b\nGA\n()\n", content_type="text/plain"
+        )
+        response = self.client.post(
+            self.url, {"fasta_file": fasta_file}, format="multipart"
+        )
+        lines = self.lines(response)
+        self.assertEqual([line["Fix Suggested"] for line in lines], [False, True])
+
+    @override_settings(BULK_VALIDATION_MAX_RECORDS=2, BULK_VALIDATION_MAX_BYTES=40)
+    def test_limits(self) -> None:
+        response = self.client.post(
+            self.url, {"fasta_raw": "GC\n()\nGC\n()\nGC\n()"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertIn("records", response.data["error"])
+
+        response = self.client.post(
+            self.url, {"records": ["GGGGGAAAACCCCC\n(((((....)))))"] * 2}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertIn("40 bytes", response.data["error"])
+
+    def test_bad_requests(self) -> None:
+        for data in ({}, {"fasta_raw": "\n# nothing\n"}, {"records": [1]}):
+            response = self.client.post(self.url, data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertFalse(response.data["success"])
+
+
+class PostRequestDataBulkTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.url = reverse("postRequestDataBulk")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings_patcher = override_settings(MEDIA_ROOT=self.directory)
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+        app_patcher = patch("api.misc_tools.current_app")
+        self.app = app_patcher.start()
+        self.addCleanup(app_patcher.stop)
+        publish_patcher = patch("api.misc_tools.run_grapharna_task.apply_async")
+        self.publish = publish_patcher.start()
+        self.addCleanup(publish_patcher.stop)
+
+    def test_jobs_are_created_and_published_together(self) -> None:
+        fasta = (
+            "GGGAAACCC\n(((...)))\n>d1\nAGC-UUU\n(..-..)\n>d2\nAGGAAACCC\n(((...)))\n"
+        )
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.post(
+                self.url,
+                {"fasta_raw": fasta, "job_name": "screen", "seed": "7"},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(callbacks), 1)
+        jobs = {job.hashed_uid: job for job in Job.objects.all()}
+        self.assertEqual(
+            [(line["Job"], line["uidh"] in jobs) for line in response.data["Jobs"]],
+            [("screen-1", True), ("d1", True), ("d2", True)],
+        )
+        self.assertEqual({job.seed for job in jobs.values()}, {7})
+        self.assertEqual({job.status for job in jobs.values()}, {"Q"})
+        d1 = Job.objects.get(job_name="d1")
+        self.assertEqual(d1.strand_separator, "-")
+        with open(d1.input_structure.path) as f:
+            self.assertEqual(f.read(), ">d1\nAGC UUU\n(.. ..)")
+        with open(Job.objects.get(job_name="d2").input_structure.path) as f:
+            self.assertEqual(f.read(), ">d2\nAGGAAACCC\n.((...)).")  # fixed pair
+
+        # one producer (broker connection) for all of the tasks
+        self.app.producer_or_acquire.assert_called_once_with()
+        producer = self.app.producer_or_acquire.return_value.__enter__.return_value
+        self.assertEqual(
+            self.publish.call_args_list,
+            [
+                call((jobs[line["uidh"]].uid,), producer=producer)
+                for line in response.data["Jobs"]
+            ],
+        )
+
+    def test_invalid_record_creates_no_jobs(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                self.url,
+                {"records": [">ok\nGC\n()", ">bad\nGXC\n(.)"]},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(
+            response.data["Invalid Records"],
+            [
+                {
+                    "Record": 1,
+                    "Name": "bad",
+                    "Error List": ["RNA contains invalid characters: X"],
+                }
+            ],
+        )
+        self.assertFalse(Job.objects.exists())
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "engine_inputs")))
+        self.publish.assert_not_called()
+
+    def test_conformations_out_of_range_create_no_jobs(self) -> None:
+        for conformations in ("0", "6"):
+            response = self.client.post(
+                self.url,
+                {"records": ["GC\n()"], "alternative_conformations": conformations},
+                format="json",
+            )
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("alternative_conformations", response.data["error"])
+        self.assertFalse(Job.objects.exists())
+        self.publish.assert_not_called()
+
+    def test_long_record_names_create_no_jobs(self) -> None:
+        name = "n" * 256
+        response = self.client.post(
+            self.url,
+            {"records": [">ok\nGC\n()", f">{name}\nGC\n()"]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["Invalid Records"], [{"Record": 1, "Name": name}]
+        )
+        self.assertFalse(Job.objects.exists())
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "engine_inputs")))
+
+    @override_settings(BULK_SUBMISSION_MAX_RECORDS=1)
+    def test_bad_requests(self) -> None:
+        response = self.client.post(
+            self.url, {"records": ["GC\n()", "GC\n()"]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        response = self.client.post(
+            self.url, {"records": ["GC\n()"], "seed": "x"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Incorrect seed.")
+        self.assertFalse(Job.objects.exists())
+
+
 class DownloadZipFileTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -747,9 +985,11 @@ class DownloadZipFileTests(TestCase):
         self.addCleanup(patcher_job_get.stop)
 
         # Patch JobResults.objects.get
+        mock_results_qs = MagicMock()
+        mock_results_qs.order_by.return_value = [self.result, self.result2]
         patcher_results_filter = patch(
             "webapp.models.JobResults.objects.filter",
-            return_value=[self.result, self.result2],
+            return_value=mock_results_qs,
         )
         self.mock_results_get = patcher_results_filter.start()
         self.addCleanup(patcher_results_filter.stop)
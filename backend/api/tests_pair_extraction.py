@@ -0,0 +1,85 @@
+import random
+from unittest.mock import patch
+from django.test import SimpleTestCase, override_settings
+from api.INF_F1 import dotbracketToPairs
+from api.pair_extraction import extractPairs
+from api.validation_tools import RnaValidator
+
+NUCLEOTIDES = ["AUGC", "AUGCTaugct", "AUGCXN- "]
+BRACKETS = ["....(()[]<>AaBb", "(.)", "..((..))- ", "(<[{AaBbZ"]
+
+
+def random_dotseq(rng: random.Random) -> str:
+    """A dot-seq like the users and the engine write them, sometimes malformed."""
+    length = rng.randint(1, 60)
+    alphabet = rng.choice(NUCLEOTIDES)
+    sequence = "".join(rng.choice(alphabet) for _ in range(length))
+    brackets = rng.choice(BRACKETS)
+    structure = "".join(
+        rng.choice(brackets)
+        for _ in range(rng.choice([length, length, length, length - 1]))
+    )
+    return rng.choice(
+        [
+            f">x\n{sequence}\n{structure}\n",
+            f"{sequence}\n{structure}",
+            f"# comment\n\n>x\n {sequence} \n{structure}\n\n",
+            f">x\n{sequence}\n{structure}\n>y\n{sequence}\n{structure}",
+            f"{structure}\n{sequence}",
+        ]
+    )
+
+
+class ExtractPairsTests(SimpleTestCase):
+    def assertSamePairs(self, dotseq: str) -> None:
+        result = RnaValidator(dotseq).ValidateRna()
+        pairs = extractPairs(dotseq)
+        self.assertEqual(pairs.pairSet(), set(result["allPairs"]), dotseq)
+        self.assertEqual(
+            pairs.pairSet(incorrect=True), set(result["Incorrect Pairs"]), dotseq
+        )
+
+    def test_same_pairs_as_validator(self):
+        rng = random.Random(24)
+        for _ in range(3000):
+            self.assertSamePairs(random_dotseq(rng))
+
+    @override_settings(MAX_RNA_LENGTH=20, VALID_PAIRS="GCCG")
+    def test_same_pairs_with_other_settings(self):
+        rng = random.Random(25)
+        for _ in range(1000):
+            self.assertSamePairs(random_dotseq(rng))
+
+    def test_dotbracket_to_pairs_is_unchanged(self):
+        rng = random.Random(26)
+        for _ in range(500):
+            dotseq = random_dotseq(rng)
+            result = RnaValidator(dotseq).ValidateRna()
+            allPairs = set(result["allPairs"])
+            incorrectPairs = set(result["Incorrect Pairs"])
+            self.assertEqual(
+                dotbracketToPairs(dotseq),
+                {
+                    "correctPairs": allPairs - incorrectPairs,
+                    "incorrectPairs": incorrectPairs,
+                    "allPairs": allPairs,
+                },
+            )
+
+    def test_pairs_per_bracket_type(self):
+        with patch("api.pair_extraction.RnaValidator") as validator:
+            pairs = extractPairs(">knot\nGGGAAACCCCUUC\n(((.[..))).].")
+        validator.assert_not_called()  # one-structure dot-seqs aren't validated
+
+        self.assertEqual(set(pairs.correct), {"()", "[]"})
+        self.assertEqual(list(pairs.correct["()"]), [2, 7, 1, 8, 0, 9])
+        self.assertEqual(list(pairs.correct["[]"]), [4, 11])
+        numpy_pairs = pairs.numpy()
+        self.assertEqual(numpy_pairs["()"].shape, (3, 2))
+        self.assertEqual(numpy_pairs["[]"].tolist(), [[4, 11]])
+
+    def test_strands_are_left_to_the_validator(self):
+        pairs = extractPairs(">a\nGGG-CCC\n(((-)))")
+
+        self.assertEqual(pairs.pairSet(), {(2, 4), (1, 5), (0, 6)})
+        self.assertEqual(list(pairs.correct["()"]), [2, 4, 1, 5, 0, 6])
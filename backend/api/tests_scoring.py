@@ -0,0 +1,228 @@
+import math
+import os
+import random
+import tempfile
+from unittest.mock import patch
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from api.INF_F1 import CalculateF1Inf, dotbracketToPairs
+from api.pair_extraction import extractPairs
+from api.scoring import scoreDotseqs, scoreJobResults, scoreStructures
+from api.tests_pair_extraction import random_dotseq
+from webapp.hashing_tools import hash_uuid
+from webapp.models import Job, JobResults
+
+# a hairpin of 4 pairs and an H-type pseudoknot of 3 () and 3 [] pairs
+REFERENCE = (
+    ">ref\nGGGGAAAACCCCAAGGGAAGGGAAACCCAAACCC\n((((....))))..(((..[[[...)))...]]]"
+)
+
+
+class ScoreStructuresTests(SimpleTestCase):
+    def test_same_scores_as_set_based_path(self):
+        rng = random.Random(25)
+        for _ in range(2000):
+            target, model = random_dotseq(rng), random_dotseq(rng)
+            expected = CalculateF1Inf(
+                dotbracketToPairs(target)["correctPairs"],
+                dotbracketToPairs(model)["correctPairs"],
+            )
+            values = scoreDotseqs(target, [model])[0]
+            self.assertAlmostEqual(values["f1"], expected["f1"], msg=(target, model))
+            self.assertAlmostEqual(values["inf"], expected["inf"], msg=(target, model))
+
+    def test_matrix_of_references_and_models(self):
+        rng = random.Random(26)
+        references = [random_dotseq(rng) for _ in range(4)]
+        models = [random_dotseq(rng) for _ in range(7)]
+        scores = scoreStructures(
+            [extractPairs(reference) for reference in references],
+            [extractPairs(model) for model in models],
+        )
+
+        for name in ("tp", "fp", "fn", "f1", "inf", "mcc", "pk_f1", "pk_mcc"):
+            self.assertEqual(scores[name].shape, (4, 7))
+        for m, reference in enumerate(references):
+            for k, values in enumerate(scoreDotseqs(reference, models)):
+                for name, value in values.items():
+                    self.assertAlmostEqual(scores[name][m, k].item(), value)
+
+    def test_counts_and_mcc(self):
+        # a hairpin pair is missing and the pseudoknot pairs are shifted
+        model = (
+            ">m\nGGGGAAAACCCCAAGGGAAGGGAAACCCAAACCC\n.(((....)))...(((..[[....)))...]]."
+        )
+        values = scoreDotseqs(REFERENCE, [model])[0]
+
+        self.assertEqual((values["tp"], values["fp"], values["fn"]), (6, 2, 4))
+        self.assertAlmostEqual(values["f1"], 2 / 3)
+        self.assertAlmostEqual(values["inf"], math.sqrt(6 / 8 * 6 / 10))
+        tn = 34 * 33 // 2 - 6 - 2 - 4
+        self.assertAlmostEqual(
+            values["mcc"], (6 * tn - 2 * 4) / math.sqrt(8 * 10 * (tn + 2) * (tn + 4))
+        )
+        self.assertEqual((values["pk_tp"], values["pk_fp"], values["pk_fn"]), (0, 2, 3))
+        self.assertEqual(values["pk_f1"], 0.0)
+
+    def test_identical_and_empty_structures(self):
+        unpaired = ">u\nGGGGAAAACCCCAAGGGAAGGGAAACCCAAACCC\n" + "." * 34
+        same, empty = scoreDotseqs(REFERENCE, [REFERENCE, unpaired])
+
+        for prefix in ("", "pk_"):
+            self.assertEqual(same[f"{prefix}f1"], 1.0)
+            self.assertEqual(same[f"{prefix}inf"], 1.0)
+            self.assertAlmostEqual(same[f"{prefix}mcc"], 1.0)
+        self.assertEqual(same["pk_tp"], 3)
+        self.assertEqual((empty["tp"], empty["fp"], empty["fn"]), (0, 0, 10))
+        self.assertEqual((empty["f1"], empty["inf"], empty["mcc"]), (0.0, 0.0, 0.0))
+        self.assertEqual(scoreDotseqs(REFERENCE, []), [])
+
+
+class ScoredJobTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_patcher = override_settings(MEDIA_ROOT=directory.name)
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+
+        self.job = Job.objects.create(
+            input_structure=ContentFile(REFERENCE.encode(), name="input.fasta"),
+            seed=1,
+            job_name="rescore",
+            status="C",
+            alternative_conformations=2,
+        )
+        self.job.hashed_uid = hash_uuid(str(self.job.uid))
+        self.job.save()
+        self.models = [
+            ">m\nGGGGAAAACCCCAAGGGAAGGGAAACCCAAACCC\n.(((....)))...(((..[[....)))...]].",
+            REFERENCE,
+        ]
+        for seed, model in zip((3, 2), self.models):
+            JobResults.objects.create(
+                job=self.job,
+                seed=seed,
+                result_secondary_structure_dotseq=ContentFile(
+                    model.encode(), name=f"result_{seed}.dotseq"
+                ),
+            )
+        JobResults.objects.create(job=self.job, seed=4)  # not annotated
+
+
+class ScoreJobResultsTests(ScoredJobTestCase):
+    def test_conformations_are_scored_in_one_batch(self):
+        with patch("api.scoring.scoreStructures", wraps=scoreStructures) as batch:
+            scoreJobResults(self.job)
+
+        batch.assert_called_once()
+        expected = scoreDotseqs(REFERENCE, self.models[::-1])
+        for seed, values in zip((2, 3), expected):
+            stored = JobResults.objects.get(job=self.job, seed=seed)
+            self.assertAlmostEqual(stored.f1, values["f1"])
+            self.assertAlmostEqual(stored.inf, values["inf"])
+        self.assertIsNone(JobResults.objects.get(job=self.job, seed=4).f1)
+
+    def test_single_conformation_is_scored_in_a_batch(self):
+        JobResults.objects.filter(job=self.job, seed=2).update(f1=1.0, inf=1.0)
+        with patch("api.scoring.scoreStructures", wraps=scoreStructures) as batch:
+            scoreJobResults(self.job)
+
+        batch.assert_called_once()
+        stored = JobResults.objects.get(job=self.job, seed=3)
+        expected = CalculateF1Inf(
+            dotbracketToPairs(REFERENCE)["correctPairs"],
+            dotbracketToPairs(self.models[0])["correctPairs"],
+        )
+        self.assertAlmostEqual(stored.f1, expected["f1"])
+        self.assertAlmostEqual(stored.inf, expected["inf"])
+
+    def test_scored_conformations_are_not_read(self):
+        JobResults.objects.filter(job=self.job).update(f1=0.5, inf=0.5)
+        os.remove(self.job.input_structure.path)
+
+        scoreJobResults(self.job)
+
+        self.assertEqual(JobResults.objects.get(job=self.job, seed=3).f1, 0.5)
+
+    def test_failure_is_recorded_on_its_row(self):
+        os.remove(
+            JobResults.objects.get(
+                job=self.job, seed=2
+            ).result_secondary_structure_dotseq.path
+        )
+
+        scoreJobResults(self.job)
+
+        failed = JobResults.objects.get(job=self.job, seed=2)
+        self.assertIsNone(failed.f1)
+        self.assertTrue(failed.error.startswith("Scoring failed: "))
+        stored = JobResults.objects.get(job=self.job, seed=3)
+        self.assertAlmostEqual(stored.f1, 2 / 3)
+        self.assertIsNone(stored.error)
+
+    def test_unreadable_input_fails_every_row(self):
+        os.remove(self.job.input_structure.path)
+
+        scoreJobResults(self.job)
+
+        for seed in (2, 3):
+            result = JobResults.objects.get(job=self.job, seed=seed)
+            self.assertIsNone(result.f1)
+            self.assertTrue(result.error.startswith("Scoring failed: "))
+
+
+class RescoreResultsTests(ScoredJobTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.url = reverse("rescoreResults")
+
+    def test_results_are_rescored_and_stored(self):
+        response = self.client.post(
+            self.url, {"uidh": self.job.hashed_uid}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["success"])
+        results = response.data["Results"]
+        self.assertEqual([result["seed"] for result in results], [2, 3])
+        expected = scoreDotseqs(REFERENCE, self.models[::-1])
+        for result, values in zip(results, expected):
+            self.assertEqual(result, {"seed": result["seed"], **values})
+        stored = JobResults.objects.get(job=self.job, seed=3)
+        self.assertAlmostEqual(stored.f1, 2 / 3)
+        self.assertAlmostEqual(stored.inf, expected[1]["inf"])
+        self.assertIsNone(JobResults.objects.get(job=self.job, seed=4).f1)
+
+    def test_missing_uidh(self):
+        response = self.client.post(self.url, {}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Missing uidh parameter.")
+
+    def test_unknown_job(self):
+        response = self.client.post(self.url, {"uidh": "nojob"}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Job doesn't exist")
+
+    def test_job_not_completed(self):
+        Job.objects.filter(pk=self.job.pk).update(status="R")
+        response = self.client.post(
+            self.url, {"uidh": self.job.hashed_uid}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Job is not completed.")
+
+    def test_missing_files(self):
+        os.remove(self.job.input_structure.path)
+        response = self.client.post(
+            self.url, {"uidh": self.job.hashed_uid}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
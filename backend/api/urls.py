@@ -5,8 +5,15 @@ from GraphaRNA import settings
 
 urlpatterns = [
     path("validateRNA/", api.views.PostRnaValidation, name="validateRNA"),
+    path("validateRNABulk/", api.views.PostRnaValidationBulk, name="validateRNABulk"),
     path("postRequestData/", api.views.ProcessRequestData, name="postRequestData"),
+    path(
+        "postRequestDataBulk/",
+        api.views.ProcessRequestDataBulk,
+        name="postRequestDataBulk",
+    ),
     path("getResults/", api.views.GetResults, name="getResults"),
+    path("rescoreResults/", api.views.RescoreResults, name="rescoreResults"),
     path("healthcheck/", api.views.healthcheck, name="healthcheck"),
     path("getResults/", api.views.GetResults, name="getResults"),
     path("downloadZip/", api.views.DownloadZipFile, name="downloadZip"),
@@ -22,6 +29,8 @@ urlpatterns = [
         api.views.ProcessExampleRequestData,
         name="processExampleRequestData",
     ),
+    path("engineCallback/", api.views.EngineCallback, name="engineCallback"),
+    path("metrics/", api.views.Metrics, name="metrics"),
 ]
 
 if settings.DEBUG:
@@ -1,17 +1,105 @@
 from collections import deque
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from functools import lru_cache
 from django.conf import settings
 from webapp.models import SeparatorChoices
 
 
+@dataclass(frozen=True)
+class ValidationRules:
+    """
+    VALID_BRACKETS, VALID_NUCLEOTIDES and VALID_PAIRS compiled for the validator (the space separates strands
+    and is valid in both lines).
+    """
+
+    bracketChars: frozenset[str]
+    nucleotideChars: frozenset[str]
+    # str.translate tables removing the valid characters, whatever is left is invalid
+    bracketFilter: dict[int, None]
+    nucleotideFilter: dict[int, None]
+    # bracket pairs ("()", "[]", ...) of the stacks and the pair of every opening/closing bracket
+    bracketPairs: tuple[str, ...]
+    openingLookup: dict[str, str]
+    closingLookup: dict[str, str]
+    # rows of the pair matrix: nucleotides that may close a pair opened by the nucleotide
+    pairMatrix: dict[str, frozenset[str]]
+
+
+@lru_cache(maxsize=8)
+def compileValidationRules(
+    validBrackets: str, validNucleotides: str, validPairs: str
+) -> ValidationRules:
+    brackets = validBrackets + " "
+    nucleotides = validNucleotides + " "
+    bracketPairs = tuple(
+        brackets[i : i + 2] for i in range(0, len(brackets), 2) if brackets[i] != "."
+    )
+    pairMatrix: dict[str, set[str]] = {}
+    for i in range(0, len(validPairs), 2):
+        pair = validPairs[i : i + 2]
+        if len(pair) == 2:
+            pairMatrix.setdefault(pair[0], set()).add(pair[1])
+    return ValidationRules(
+        bracketChars=frozenset(brackets),
+        nucleotideChars=frozenset(nucleotides),
+        bracketFilter=dict.fromkeys(map(ord, brackets)),
+        nucleotideFilter=dict.fromkeys(map(ord, nucleotides)),
+        bracketPairs=bracketPairs,
+        openingLookup={pair[0]: pair for pair in bracketPairs},
+        closingLookup={pair[1]: pair for pair in bracketPairs if len(pair) == 2},
+        pairMatrix={
+            nucleotide: frozenset(partners)
+            for nucleotide, partners in pairMatrix.items()
+        },
+    )
+
+
+def getValidationRules() -> ValidationRules:
+    """
+    Rules of the current settings, compiled once per process (and again only when the settings change, e.g.
+    override_settings in tests).
+    """
+    return compileValidationRules(
+        settings.VALID_BRACKETS, settings.VALID_NUCLEOTIDES, settings.VALID_PAIRS
+    )
+
+
+def splitFastaRecords(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Splits a multi-record FASTA into the inputs of RnaValidator, reading it line by line. Every ">" header
+    starts a record (strands of one structure are joined with a strand separator), records without headers
+    are a sequence line followed by a dot-bracket line (only before the first header, later lines belong to
+    the record of the header). Empty lines and comments are skipped.
+    """
+    record: list[str] = []
+    for line in lines:
+        line = line.strip()
+        if line == "" or line[0] == "#":
+            continue
+        if line[0] == ">":
+            if record:
+                yield "\n".join(record)
+            record = [line]
+            continue
+        record.append(line)
+        if record[0][0] != ">" and len(record) == 2:
+            yield "\n".join(record)
+            record = []
+    if record:
+        yield "\n".join(record)
+
+
+def fastaRecordName(record: str) -> str | None:
+    """Name in the header of a record, None without a header."""
+    header = record.lstrip().split("\n", 1)[0].strip()
+    return header[1:] if header.startswith(">") else None
+
+
 class RnaValidator:
     def __init__(self, fasta_raw: str) -> None:
         self.fasta_raw: str = fasta_raw
-        self.validBrackets: str = settings.VALID_BRACKETS + " "
-        self.validNucleotides: set[str] = settings.VALID_NUCLEOTIDES + " "
-        self.validPairs: list[str] = [
-            settings.VALID_PAIRS[i : i + 2]
-            for i in range(0, len(settings.VALID_PAIRS), 2)
-        ]
+        self.rules: ValidationRules = getValidationRules()
         self.parsingResult: bool = True
         self.errorList: list[str] = []
         self.strandSeparator: str | None = None
@@ -56,10 +144,10 @@ class RnaValidator:
                 self.parsingResult = False
                 self.errorList.append("Parsing error: Missing Lines")
                 return None
-            if not any(
-                i in self.validBrackets for i in currentStrand[dot_index]
-            ) and all(
-                i in self.validNucleotides for i in currentStrand[dot_index].upper()
+            if self.rules.bracketChars.isdisjoint(
+                currentStrand[dot_index]
+            ) and self.rules.nucleotideChars.issuperset(
+                currentStrand[dot_index].upper()
             ):  # verify order of lines in a strand by checking checking characters in dotbracket line (doesn't contain any valid brackets and contains only valid nucleotides)
                 self.parsingResult = False
                 self.errorList.append("Parsing error: Wrong line order")
@@ -190,9 +278,7 @@ class RnaValidator:
             validationResult = False
 
         # character check
-        invalidCharacters: set = set(
-            char for char in rna if char not in set(self.validNucleotides)
-        )
+        invalidCharacters: set = set(rna.translate(self.rules.nucleotideFilter))
         if len(invalidCharacters) > 0:
             sortedInvalidCharacters = "".join(sorted(invalidCharacters))
             self.errorList.append(
@@ -201,9 +287,7 @@ class RnaValidator:
             validationResult = False
 
         # bracket check
-        invalidBrackets: set = set(
-            char for char in dotBracket if char not in set(self.validBrackets)
-        )
+        invalidBrackets: set = set(dotBracket.translate(self.rules.bracketFilter))
         if len(invalidBrackets) > 0:
             sortedInvalidBrackets = "".join(sorted(invalidBrackets))
             self.errorList.append(
@@ -267,43 +351,47 @@ class RnaValidator:
         list[tuple[int, int]],
         list[tuple[int, int]],
     ]:  # Zmieniono kod aby nie trzeba było powtarzać kodu z liczeniem stacku i par
+        """
+        Pairs the brackets in one pass over the dot-bracket, checking the nucleotides of every pair in the
+        pair matrix. Unpaired closing brackets and incorrect pairs are replaced by dots in the suggested fix.
+        """
+        rules = self.rules
         bracketStacks: dict[str, deque[int]] = {
-            self.validBrackets[i : i + 2]: deque()
-            for i in range(0, len(self.validBrackets), 2)
-            if self.validBrackets[i] != "."
+            pair: deque() for pair in rules.bracketPairs
         }
         allPairs: list[tuple[int, int]] = []
         mismatchingBrackets: list[int] = []
         incorrectPairs: list[tuple[int, int]] = []
-        openingLookup: dict[str, str] = {pair[0]: pair for pair in bracketStacks.keys()}
-        closingLookup: dict[str, str] = {pair[1]: pair for pair in bracketStacks.keys()}
+        openingStacks: dict[str, deque[int]] = {
+            char: bracketStacks[pair] for char, pair in rules.openingLookup.items()
+        }
+        closingStacks: dict[str, deque[int]] = {
+            char: bracketStacks[pair] for char, pair in rules.closingLookup.items()
+        }
+        pairMatrix = rules.pairMatrix
+        noPartners: frozenset[str] = frozenset()
         suggestedDotBracketFixList: list[str] = list(dotBracket)
-        for i in range(len(dotBracket)):
-            if dotBracket[i] in openingLookup:  # opening brackets
-                bracketStacks[openingLookup[dotBracket[i]]].append(i)
-            elif dotBracket[i] in closingLookup:  # closing brackets
-                if (
-                    len(bracketStacks[closingLookup[dotBracket[i]]]) > 0
-                ):  # check if a matching bracket exists
-                    index = bracketStacks[closingLookup[dotBracket[i]]][-1]
-                    if (
-                        rna[bracketStacks[closingLookup[dotBracket[i]]][-1]] + rna[i]
-                        in self.validPairs
-                    ):  # check if the nucleotide pair is correct
-                        allPairs.append((index, i))
-                        bracketStacks[closingLookup[dotBracket[i]]].pop()
-                    else:  # incorrect nucleotide pair, suggest replacement to .
-                        incorrectPairs.append(
-                            (bracketStacks[closingLookup[dotBracket[i]]][-1], i)
-                        )
-                        suggestedDotBracketFixList[i] = "."
-                        suggestedDotBracketFixList[
-                            bracketStacks[closingLookup[dotBracket[i]]][-1]
-                        ] = "."
-                        bracketStacks[closingLookup[dotBracket[i]]].pop()
-                else:  # mismatched closing bracket, suggest replacement to .
-                    mismatchingBrackets.append(i)
-                    suggestedDotBracketFixList[i] = "."
+        for i, char in enumerate(dotBracket):
+            stack = openingStacks.get(char)
+            if stack is not None:  # opening brackets
+                stack.append(i)
+                continue
+            stack = closingStacks.get(char)
+            if stack is None:  # dots and strand breaks
+                continue
+            if not stack:  # mismatched closing bracket, suggest replacement to .
+                mismatchingBrackets.append(i)
+                suggestedDotBracketFixList[i] = "."
+                continue
+            index = stack.pop()
+            if rna[i] in pairMatrix.get(
+                rna[index], noPartners
+            ):  # check if the nucleotide pair is correct
+                allPairs.append((index, i))
+            else:  # incorrect nucleotide pair, suggest replacement to .
+                incorrectPairs.append((index, i))
+                suggestedDotBracketFixList[i] = "."
+                suggestedDotBracketFixList[index] = "."
         return (
             bracketStacks,
             suggestedDotBracketFixList,
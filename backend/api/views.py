@@ -7,22 +7,34 @@ from rest_framework.request import Request
 from rest_framework import status
 from django.core.validators import EmailValidator
 from django.core.exceptions import ValidationError
-from typing import Optional, Any
+from typing import Optional, Any, Callable, Iterable, Iterator
 import random
 from datetime import date, timedelta
-from webapp.models import Job, JobResults, ExampleStructures
-from webapp.tasks import send_email_task
+from webapp.models import (
+    Job,
+    JobResults,
+    ExampleStructures,
+    EngineRun,
+    EngineRunStatus,
+    RenderedDiagram,
+)
+from webapp.tasks import send_email_task, check_engine_run, request_missing_diagrams
+from webapp.metrics import render_prometheus
 from uuid import uuid4
 import os
+from django.db.models import Q
 from django.db.models.query import QuerySet
-from api.validation_tools import RnaValidator
+from api.validation_tools import RnaValidator, fastaRecordName, splitFastaRecords
 from rest_framework.pagination import PageNumberPagination
 from .serializers import JobSerializer
 from django.core.files.uploadedfile import UploadedFile
 from .api_docs import (
     process_request_data_schema,
+    process_request_data_bulk_schema,
     validate_rna_schema,
+    validate_rna_bulk_schema,
     get_results_schema,
+    rescore_results_schema,
     get_suggested_seed_and_job_name_schema,
     download_zip_file_schema,
     job_pagination_schema,
@@ -30,14 +42,22 @@ from .api_docs import (
     setup_test_job_results_schema,
     cleanup_test_jobs_schema,
     process_example_request_data_schema,
+    engine_callback_schema,
+    metrics_schema,
 )
 
+import hmac
+import json
 import zipfile
 import io
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from api.INF_F1 import CalculateF1Inf, dotbracketToPairs
+from api.scoring import annotatedResults, jobDotseqs, scoreDotseqs
 from django.core.files import File
-from api.misc_tools import CreateNewJob
+from api.misc_tools import CreateNewJob, CreateNewJobs
+
+# rows of conformations whose post-processing failed have the error and no files, they aren't shown as results
+SAVED_RESULTS = Q(error__isnull=True) | Q(result_tertiary_structure__gt="")
 
 
 @setup_test_job_schema
@@ -202,7 +222,17 @@ def DownloadZipFile(request: Request) -> HttpResponse:
 
     if job.status != "C":
         return HttpResponse("Job is not finished", status=400)
-    instances = JobResults.objects.filter(job=job)
+    instances = list(
+        JobResults.objects.filter(SAVED_RESULTS, job=job).order_by(
+            "seed", "completed_at"
+        )
+    )
+    if request_missing_diagrams(instances):
+        response = HttpResponse(
+            "Diagrams are being drawn, try again shortly", status=409
+        )
+        response["Retry-After"] = "5"
+        return response
     zip_buffer = io.BytesIO()
     job_name_path = job.job_name.replace(" ", "_")
     with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
@@ -229,6 +259,12 @@ def DownloadZipFile(request: Request) -> HttpResponse:
             name_svg = os.path.basename(instance.result_secondary_structure_svg.name)
             name_ter = os.path.basename(instance.result_tertiary_structure.name)
             name_arc = os.path.basename(instance.result_arc_diagram.name)
+            # diagrams shared through the render cache are named after the conformation
+            stem = os.path.splitext(name_dotseq)[0]
+            if RenderedDiagram.is_cached(instance.result_secondary_structure_svg.name):
+                name_svg = f"{stem}.svg"
+            if RenderedDiagram.is_cached(instance.result_arc_diagram.name):
+                name_arc = f"{stem}_arc.svg"
 
             with open(filePathSecondaryDotseq, "rb") as f:
                 zip_file.writestr(f"{folder_name}/{name_dotseq}", f.read())
@@ -301,14 +337,9 @@ def PostRnaValidation(request: Request) -> Response:
         assert fasta_raw is not None
         sequence_raw = fasta_raw
 
-    validator: RnaValidator = RnaValidator(sequence_raw)
-    results: dict = validator.ValidateRna()
+    results: dict = ValidateRnaRecord(sequence_raw)
 
     if results["Validation Result"]:
-        if results["strandSeparator"] != "N":
-            results["Validated RNA"] = results["Validated RNA"].replace(
-                " ", results["strandSeparator"]
-            )
         return Response(
             results,
             status=status.HTTP_200_OK,
@@ -320,6 +351,135 @@ def PostRnaValidation(request: Request) -> Response:
         )
 
 
+def ValidateRnaRecord(sequence_raw: str) -> dict:
+    """Results of RnaValidator, the validated RNA with the strand separator of the input."""
+    results: dict = RnaValidator(sequence_raw).ValidateRna()
+    if results["Validation Result"] and results["strandSeparator"] != "N":
+        results["Validated RNA"] = results["Validated RNA"].replace(
+            " ", results["strandSeparator"]
+        )
+    return results
+
+
+def StreamValidationResults(records: Iterable[str]) -> Iterator[str]:
+    """One NDJSON line per record: its position, name (header) and validation results."""
+    for index, record in enumerate(records):
+        results = ValidateRnaRecord(record)
+        yield json.dumps(
+            {"Record": index, "Name": fastaRecordName(record), **results}
+        ) + "\n"
+
+
+def ReadBulkRecords(
+    request: Request, max_records: int
+) -> Response | Callable[[], Iterator[str]]:
+    """
+    Records of a bulk request: a multi-record FASTA (fasta_raw or fasta_file) or a JSON array of FASTA
+    records (records). Returns a function reading them again on every call, so they don't have to be
+    kept in memory, or an error response when the input is missing, too large (BULK_VALIDATION_MAX_BYTES)
+    or has more than max_records records.
+    """
+    fasta_raw: Optional[str] = request.data.get("fasta_raw")
+    fasta_file: Optional[UploadedFile] = request.data.get("fasta_file")
+    records_raw: Any = request.data.get("records")
+
+    inputs = [i for i in (fasta_raw, fasta_file, records_raw) if i is not None]
+    if len(inputs) == 0:
+        return Response(
+            {"success": False, "error": "Missing RNA data."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if len(inputs) > 1:
+        return Response(
+            {
+                "success": False,
+                "error": "RNA can be send as text, file or records, only one of them.",
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if records_raw is not None and (
+        not isinstance(records_raw, list)
+        or not all(isinstance(record, str) for record in records_raw)
+    ):
+        return Response(
+            {"success": False, "error": "Records must be a list of strings."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    records: list[str] = records_raw or []
+
+    def readRecords() -> Iterator[str]:
+        if fasta_file is not None:  # read line by line, large uploads stay on disk
+            fasta_file.seek(0)
+            return splitFastaRecords(line.decode("utf-8") for line in fasta_file)
+        if fasta_raw is not None:
+            return splitFastaRecords(fasta_raw.split("\n"))
+        return (record for record in records if record.strip() != "")
+
+    if fasta_file is not None:
+        size = fasta_file.size or 0
+    elif fasta_raw is not None:
+        size = len(fasta_raw.encode("utf-8"))
+    else:
+        size = sum(len(record.encode("utf-8")) for record in records)
+    if size > settings.BULK_VALIDATION_MAX_BYTES:
+        return Response(
+            {
+                "success": False,
+                "error": f"RNA data exceeds the maximum size of {settings.BULK_VALIDATION_MAX_BYTES} bytes.",
+            },
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+
+    try:
+        count = sum(1 for _ in readRecords())  # only counted, records aren't kept
+    except UnicodeDecodeError:
+        return Response(
+            {"success": False, "error": "RNA file must be UTF-8 text."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if count == 0:
+        return Response(
+            {"success": False, "error": "Missing RNA data."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if count > max_records:
+        return Response(
+            {
+                "success": False,
+                "error": f"Number of records exceeds the maximum of {max_records}.",
+            },
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+    return readRecords
+
+
+"""
+example post
+{
+"fasta_raw": ">design1\nGGGAAACCC\n(((...)))\n>design2\nGGGAAAUCC\n(((...)))"
+}
+response (application/x-ndjson, one line per record)
+{"Record": 0, "Name": "design1", "Validation Result": true, ...}
+{"Record": 1, "Name": "design2", "Validation Result": true, ...}
+"""
+
+
+@validate_rna_bulk_schema
+@api_view(["POST"])
+def PostRnaValidationBulk(request: Request) -> Response | StreamingHttpResponse:
+    """
+    Validates many RNA structures in one request: a multi-record FASTA (text or file) or a JSON array of
+    FASTA records. Results are streamed as NDJSON while the records are validated.
+    """
+    readRecords = ReadBulkRecords(request, settings.BULK_VALIDATION_MAX_RECORDS)
+    if isinstance(readRecords, Response):
+        return readRecords
+    return StreamingHttpResponse(
+        StreamValidationResults(readRecords()),
+        content_type="application/x-ndjson",
+    )
+
+
 """
 example post
 {
@@ -382,6 +542,10 @@ def ProcessRequestData(request: Request) -> Response:
     jobName: Optional[str] = request.data.get("job_name")
     email: Optional[str] = request.data.get("email")
     job_alternative_conformations: int = request.data.get("alternative_conformations")
+    # bypasses the result cache, the engine computes every conformation again
+    use_result_cache: bool = (
+        str(request.data.get("use_result_cache", True)).lower() != "false"
+    )
     today_str = date.today().strftime("%Y%m%d")
     count: int = Job.objects.filter(job_name__startswith=f"job-{today_str}").count()
 
@@ -425,7 +589,80 @@ def ProcessRequestData(request: Request) -> Response:
         jobName = f"job-{today_str}-{count}"
 
     return CreateNewJob(
-        sequence_raw, jobName, seed, job_alternative_conformations, email, None
+        sequence_raw,
+        jobName,
+        seed,
+        job_alternative_conformations,
+        email,
+        None,
+        use_result_cache,
+    )
+
+
+"""
+example post
+{
+"fasta_raw": ">design1\nGGGAAACCC\n(((...)))\n>design2\nGGGAAAUCC\n(((...)))",
+"seed": 42,
+"alternative_conformations": 1
+}
+response
+{
+    "success": true,
+    "Jobs": [
+        {"Record": 0, "Job": "design1", "uidh": "Xk3_a"},
+        {"Record": 1, "Job": "design2", "uidh": "b7QwE"}
+    ]
+}
+"""
+
+
+@process_request_data_bulk_schema
+@api_view(["POST"])
+def ProcessRequestDataBulk(request: Request) -> Response:
+    """Creates a job for every record of a multi-record FASTA (text or file) or a JSON array of FASTA records.
+    Either all records pass validation (fixes are applied like in ProcessRequestData) and all jobs are created, or none is.
+    """
+    readRecords = ReadBulkRecords(request, settings.BULK_SUBMISSION_MAX_RECORDS)
+    if isinstance(readRecords, Response):
+        return readRecords
+    seed_raw = request.data.get("seed")
+    jobName: Optional[str] = request.data.get("job_name")
+    use_result_cache: bool = (
+        str(request.data.get("use_result_cache", True)).lower() != "false"
+    )
+
+    try:
+        job_alternative_conformations = int(
+            request.data.get("alternative_conformations") or 1
+        )
+    except (TypeError, ValueError):
+        return Response(
+            {"success": False, "error": "Incorrect alternative_conformations."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    seed: Optional[int] = None
+    if seed_raw not in (None, ""):
+        try:
+            seed = int(seed_raw)
+        except (TypeError, ValueError):
+            return Response(
+                {"success": False, "error": "Incorrect seed."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+    if not jobName:
+        today_str = date.today().strftime("%Y%m%d")
+        count: int = Job.objects.filter(job_name__startswith=f"job-{today_str}").count()
+        jobName = f"job-{today_str}-{count}"
+
+    return CreateNewJobs(
+        list(readRecords()),
+        jobName,
+        seed,
+        job_alternative_conformations,
+        use_result_cache,
     )
 
 
@@ -515,15 +752,21 @@ def GetResults(request: Request) -> Response:
         )
 
     results_list: list = []
+    diagrams_pending: bool = False
 
     if job.status == "C":
-        job_results_qs: QuerySet = JobResults.objects.filter(job__exact=job).order_by(
-            "completed_at"
-        )
+        # conformations may finish out of order, results are listed by seed
+        # conformations whose post-processing failed are listed in failed_conformations
+        job_results_qs: QuerySet = JobResults.objects.filter(
+            SAVED_RESULTS, job__exact=job
+        ).order_by("seed", "completed_at")
+        job_results = list(job_results_qs)
+        # queued at the first view with DIAGRAM_RENDERING="lazy", the diagrams are empty until drawn
+        diagrams_pending = request_missing_diagrams(job_results)
 
         seed_counter: int = job.seed
 
-        for result in job_results_qs:
+        for result in job_results:
             try:
                 result_tertiatiary_structure: str = (
                     result.result_tertiary_structure.read().decode("utf-8")
@@ -542,6 +785,10 @@ def GetResults(request: Request) -> Response:
                 result_secondary_structure_svg: str = (
                     result.result_secondary_structure_svg.read().decode("utf-8")
                 )
+            except FileNotFoundError as e:
+                result_secondary_structure_svg = (
+                    "" if diagrams_pending else f"[Error reading file: {str(e)}]"
+                )
             except Exception as e:
                 result_secondary_structure_svg = f"[Error reading file: {str(e)}]"
 
@@ -549,6 +796,10 @@ def GetResults(request: Request) -> Response:
                 result_arc_diagram: str = result.result_arc_diagram.read().decode(
                     "utf-8"
                 )
+            except FileNotFoundError as e:
+                result_arc_diagram = (
+                    "" if diagrams_pending else f"[Error reading file: {str(e)}]"
+                )
             except Exception as e:
                 result_arc_diagram = f"[Error reading file: {str(e)}]"
 
@@ -561,12 +812,21 @@ def GetResults(request: Request) -> Response:
                     "result_arc_diagram": result_arc_diagram,
                     "f1": result.f1,
                     "inf": result.inf,
-                    "seed": seed_counter,
+                    "seed": result.seed if result.seed is not None else seed_counter,
                     "processing_time": result.processing_time,
+                    "error": result.error,
                 }
             )
             seed_counter += 1
 
+    # conformations whose engine run or post-processing failed, a completed job is shown without them
+    failed_conformations: list[dict] = [
+        {"seed": run.seed, "error": run.error}
+        for run in EngineRun.objects.filter(
+            job__hashed_uid__exact=uid_param, status=EngineRunStatus.Error
+        ).order_by("seed")
+    ]
+
     try:
         input_structure: str = job.input_structure.read().decode("utf-8")
     except Exception as e:
@@ -581,11 +841,83 @@ def GetResults(request: Request) -> Response:
             "created_at": job.created_at,
             "sum_processing_time": job.sum_processing_time,
             "result_list": results_list,
+            "failed_conformations": failed_conformations,
+            "diagrams_pending": diagrams_pending,
             "job_seed": job.seed,
         }
     )
 
 
+"""
+example post
+{
+"uidh": "Xk3_a"
+}
+response
+{
+    "success": true,
+    "Results": [
+        {"seed": 42, "tp": 3, "fp": 0, "fn": 1, "f1": 0.857, "inf": 0.866, "mcc": 0.862,
+         "pk_tp": 0, "pk_fp": 0, "pk_fn": 1, "pk_f1": 0.0, "pk_inf": 0.0, "pk_mcc": 0.0}
+    ]
+}
+"""
+
+
+@rescore_results_schema
+@api_view(["POST"])
+def RescoreResults(request: Request) -> Response:
+    """Scores all conformations of a completed job against its input structure in one batch (F1, INF, MCC and their
+    pseudoknot-only variants) and stores the new F1 and INF values.
+    """
+    uid_param: Optional[str] = request.data.get("uidh")
+
+    if not uid_param:
+        return Response(
+            {"success": False, "error": "Missing uidh parameter."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        job: Job = Job.objects.get(hashed_uid__exact=uid_param)
+    except Job.DoesNotExist:
+        return Response(
+            {"success": False, "error": "Job doesn't exist"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if job.status != "C":
+        return Response(
+            {"success": False, "error": "Job is not completed."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    results: list[JobResults] = list(annotatedResults(job))
+    try:
+        reference, models = jobDotseqs(job, results)
+    except OSError:
+        return Response(
+            {"success": False, "error": "File not found"},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+    scores = scoreDotseqs(reference, models)
+    for result, values in zip(results, scores):
+        result.f1 = values["f1"]
+        result.inf = values["inf"]
+    JobResults.objects.bulk_update(results, ["f1", "inf"])
+
+    return Response(
+        {
+            "success": True,
+            "Results": [
+                {"seed": result.seed, **values}
+                for result, values in zip(results, scores)
+            ],
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
 @get_suggested_seed_and_job_name_schema
 @api_view(["GET"])
 def GetSuggestedSeedAndJobName(request: Request) -> Response:
@@ -684,6 +1016,62 @@ def getInf_F1(request: Request) -> Response:
     return Response({"success": True, "Dane:": {values}})
 
 
+@engine_callback_schema
+@api_view(["POST"])
+def EngineCallback(request: Request) -> Response:
+    """Called by the engine when a (uuid, seed) run completes. Schedules an immediate status check of the run."""
+    token: str = request.headers.get("X-Engine-Token", "")
+    if not settings.ENGINE_CALLBACK_TOKEN or not hmac.compare_digest(
+        token, settings.ENGINE_CALLBACK_TOKEN
+    ):
+        return Response(
+            {"success": False, "error": "Invalid engine token."},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    uuid = request.data.get("uuid")
+    seed = request.data.get("seed")
+    try:
+        seed = int(seed)
+    except (TypeError, ValueError):
+        seed = None
+    if not uuid or seed is None:
+        return Response(
+            {"success": False, "error": "Missing uuid or seed."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        run: EngineRun = EngineRun.objects.get(
+            job__uid=uuid, seed=seed, status=EngineRunStatus.Submitted
+        )
+    except (EngineRun.DoesNotExist, ValidationError):
+        return Response(
+            {"success": False, "error": "No submitted run found."},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+    # the status is verified with the engine, the callback itself is only a wake-up signal
+    check_engine_run.delay(run.pk, reschedule=False)
+    return Response({"success": True}, status=status.HTTP_202_ACCEPTED)
+
+
+@metrics_schema
+@api_view(["GET"])
+def Metrics(request: Request) -> Response | HttpResponse:
+    token: str = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not settings.METRICS_TOKEN or not hmac.compare_digest(
+        token, settings.METRICS_TOKEN
+    ):
+        return Response(
+            {"success": False, "error": "Invalid metrics token."},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+    return HttpResponse(
+        render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @api_view(["GET"])
 def healthcheck(request: Request) -> Response:
     return Response(status=status.HTTP_200_OK)
@@ -0,0 +1,97 @@
+"""
+Arc diagrams (generateRchieDiagram): the direct SVG writer versus matplotlib, for sequences of
+20-2000 nt. Reports the runtime (median of --repeat), the peak Python memory (tracemalloc, measured
+in a separate run) and the size of the SVG file.
+
+The input structure is a chain of hairpins inside a long-range stem, the output structure is the
+same with some pairs opened like the fake engine does, so all three arc colours are drawn.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_arc_diagram --lengths 20 100 500 2000 --repeat 3
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+from benchmarks.common import print_table, setup_django
+from benchmarks.fake_engine import predict_structure
+
+HAIRPIN = "((((((....))))))."
+
+
+def input_structure(length: int) -> str:
+    inner = length - 10
+    hairpins = HAIRPIN * (inner // len(HAIRPIN))
+    return "(((((" + hairpins + "." * (inner - len(hairpins)) + ")))))"
+
+
+def dotseq(structure: str) -> str:
+    sequence = "".join({"(": "G", ")": "C"}.get(char, "A") for char in structure)
+    return f">bench\n{sequence}\n{structure}\n"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--lengths", type=int, nargs="+", default=[20, 50, 100, 200, 500, 1000, 2000]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import override_settings
+    from webapp.visualization_tools import generateRchieDiagram
+
+    directory = tempfile.TemporaryDirectory()
+    target = os.path.join(directory.name, "target.dotseq")
+    model = os.path.join(directory.name, "model.dotseq")
+    output = os.path.join(directory.name, "arc.svg")
+
+    def draw() -> None:
+        result = generateRchieDiagram(target, model, output)
+        if not result.startswith("OK"):
+            raise SystemExit(result)
+
+    rows: list[list[object]] = []
+    with override_settings(MAX_RNA_LENGTH=max(args.lengths)):
+        for renderer in ("svg", "matplotlib"):
+            with override_settings(ARC_DIAGRAM_RENDERER=renderer):
+                for length in args.lengths:
+                    structure = input_structure(length)
+                    with open(target, "w") as f:
+                        f.write(dotseq(structure))
+                    with open(model, "w") as f:
+                        f.write(dotseq(predict_structure(structure, length)))
+
+                    draw()  # imports (matplotlib) and caches aren't part of the runtime
+                    durations = []
+                    for _ in range(args.repeat):
+                        start = perf_counter()
+                        draw()
+                        durations.append(perf_counter() - start)
+
+                    tracemalloc.start()
+                    draw()
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+
+                    rows.append(
+                        [
+                            renderer,
+                            length,
+                            f"{statistics.median(durations) * 1000:.1f}",
+                            f"{peak / 2**20:.1f}",
+                            f"{os.path.getsize(output) / 1024:.1f}",
+                        ]
+                    )
+
+    print_table(["renderer", "nt", "ms", "peak MiB", "SVG KiB"], rows)
+    directory.cleanup()
+
+
+if __name__ == "__main__":
+    main()
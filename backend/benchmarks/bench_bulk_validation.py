@@ -0,0 +1,106 @@
+"""
+Throughput of validating many structures: N requests to /api/validateRNA/ versus one request to
+/api/validateRNABulk/ with the N records as a multi-record FASTA, through the Django test client (the
+whole middleware and DRF stack, without the network). Reports records per second (best of --repeat)
+and the peak Python memory of the bulk request (tracemalloc).
+
+The records are hairpin chains like the arc diagram benchmark, with every fifth record made invalid.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_bulk_validation --records 10 100 1000 --length 200
+"""
+
+import argparse
+import logging
+import tracemalloc
+from time import perf_counter
+from typing import Callable
+
+from benchmarks.bench_arc_diagram import dotseq, input_structure
+from benchmarks.common import print_table, setup_django
+
+
+def records(count: int, length: int) -> list[str]:
+    fasta = dotseq(input_structure(length)).strip()
+    invalid = fasta.replace("AAAA", "AXAA", 1)
+    return [
+        (invalid if n % 5 == 4 else fasta).replace(">bench", f">design{n}")
+        for n in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--length", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import override_settings
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    # every invalid record of the single calls is logged as an unprocessable request
+    logging.getLogger("django.request").setLevel(logging.ERROR)
+
+    def single_calls(fastas: list[str]) -> int:
+        for fasta in fastas:
+            response = client.post(
+                reverse("validateRNA"), {"fasta_raw": fasta}, format="json"
+            )
+            assert response.status_code in (200, 422), response.status_code
+        return len(fastas)
+
+    def bulk_call(fastas: list[str]) -> int:
+        response = client.post(
+            reverse("validateRNABulk"), {"fasta_raw": "\n".join(fastas)}, format="json"
+        )
+        assert response.status_code == 200, response.status_code
+        return sum(1 for _ in response.streaming_content)
+
+    def best_rate(call: Callable[[list[str]], int], fastas: list[str]) -> float:
+        best = 0.0
+        for _ in range(args.repeat):
+            start = perf_counter()
+            assert call(fastas) == len(fastas)
+            best = max(best, len(fastas) / (perf_counter() - start))
+        return best
+
+    rows: list[list[object]] = []
+    with override_settings(
+        ALLOWED_HOSTS=["testserver"],
+        MAX_RNA_LENGTH=args.length,
+        BULK_VALIDATION_MAX_RECORDS=max(args.records),
+        BULK_VALIDATION_MAX_BYTES=2**31,
+    ):
+        single_calls(records(1, args.length))  # URL resolution and imports
+        for count in args.records:
+            fastas = records(count, args.length)
+            single = best_rate(single_calls, fastas)
+            bulk = best_rate(bulk_call, fastas)
+
+            tracemalloc.start()
+            bulk_call(fastas)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            rows.append(
+                [
+                    count,
+                    f"{single:.0f}",
+                    f"{bulk:.0f}",
+                    f"{bulk / single:.1f}x",
+                    f"{peak / 2**20:.1f}",
+                ]
+            )
+
+    print_table(
+        ["records", "single calls rec/s", "bulk rec/s", "speed-up", "bulk peak MiB"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Compares engine throughput of the blocking run_grapharna_task model, where every Celery worker process
+polls one job at a time (execute_and_poll_engine), with the asyncio engine dispatcher driving
+all runs from one process.
+
+Jobs (one conformation each) are run against the fake engine; the blocking model is emulated
+with a pool of --workers threads, the dispatcher uses a temporary SQLite database.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_dispatcher --jobs 200 --run-seconds 1 --workers 4
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from unittest.mock import patch
+
+from benchmarks.common import percentile, print_table, setup_django
+from benchmarks.fake_engine import FakeEngine
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--run-seconds", type=float, default=1.0)
+    parser.add_argument(
+        "--workers", type=int, default=4, help="blocking worker processes"
+    )
+    parser.add_argument("--concurrency", type=int, default=200, help="dispatcher limit")
+    parser.add_argument("--poll", type=float, default=0.5, help="poll interval")
+    args = parser.parse_args()
+
+    database = tempfile.NamedTemporaryFile(suffix=".sqlite3")
+    os.environ["DATABASE_ENGINE"] = "django.db.backends.sqlite3"
+    os.environ["DATABASE_NAME"] = database.name
+    setup_django()
+    from django.core.management import call_command
+    from django.test import override_settings
+    from webapp.engine_client import AsyncEngineClient, reset_engine_client
+    from webapp.engine_dispatcher import EngineDispatcher
+    from webapp.models import EngineRun, EngineRunStatus, Job
+    from webapp.poll_policies import FixedIntervalPolicy
+    from webapp.tasks import execute_and_poll_engine
+
+    for logger in ("webapp.tasks", "httpx"):
+        logging.getLogger(logger).setLevel(logging.WARNING)
+    call_command("migrate", verbosity=0)
+    policy = FixedIntervalPolicy(args.poll)
+    rows: list[list[object]] = []
+
+    def report(name: str, wall: float, latencies: list[float]) -> None:
+        rows.append(
+            [
+                name,
+                args.jobs,
+                f"{wall:.2f}",
+                f"{args.jobs / wall:.1f}",
+                f"{percentile(latencies, 50):.2f}",
+                f"{percentile(latencies, 95):.2f}",
+            ]
+        )
+
+    # blocking: one job per worker process at a time
+    with FakeEngine(run_seconds=args.run_seconds) as engine:
+        reset_engine_client()
+        start = perf_counter()
+
+        def run(n: int) -> float:
+            execute_and_poll_engine(f"bench-{n}", n, poll_policy=policy)
+            return perf_counter() - start
+
+        with override_settings(ENGINE_URL=engine.url):
+            with ThreadPoolExecutor(max_workers=args.workers) as pool:
+                latencies = list(pool.map(run, range(args.jobs)))
+        report(f"blocking, {args.workers} workers", perf_counter() - start, latencies)
+    reset_engine_client()
+
+    # async dispatcher: every run in flight from one process
+    for n in range(args.jobs):
+        job = Job.objects.create(
+            input_structure=f"engine_inputs/bench_{n}.dotseq",
+            strand_separator=" ",
+            seed=n,
+            job_name=f"bench-{n}",
+            status="R",
+            alternative_conformations=1,
+        )
+        EngineRun.objects.create(job=job, seed=n, status=EngineRunStatus.Queued)
+
+    with FakeEngine(run_seconds=args.run_seconds) as engine:
+        latencies = []
+        start = perf_counter()
+
+        def handed_off(run_id: int) -> None:
+            latencies.append(perf_counter() - start)
+
+        async def dispatch() -> None:
+            dispatcher = EngineDispatcher(
+                client=AsyncEngineClient(engine.url),
+                concurrency=args.concurrency,
+                poll_policy=policy,
+                claim_interval=args.poll,
+            )
+            try:
+                await dispatcher.serve(drain=True)
+            finally:
+                await dispatcher.close()
+
+        with patch("webapp.tasks.process_engine_run.delay", handed_off):
+            asyncio.run(dispatch())
+        report(
+            f"async dispatcher, {args.concurrency} in flight",
+            perf_counter() - start,
+            latencies,
+        )
+
+    print_table(
+        ["mode", "jobs", "wall s", "jobs/s", "p50 latency s", "p95 latency s"], rows
+    )
+    database.close()
+
+
+if __name__ == "__main__":
+    main()
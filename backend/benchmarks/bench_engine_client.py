@@ -0,0 +1,73 @@
+"""
+Compares engine status polling through bare requests calls (new TCP connection per call)
+with the pooled keep-alive EngineClient.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_engine_client --requests 2000 --threads 4
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Callable
+
+import requests
+
+from benchmarks.common import percentile, print_table, setup_django
+from benchmarks.fake_engine import FakeEngine
+
+
+def measure(
+    call: Callable[[], requests.Response], count: int, threads: int
+) -> list[float]:
+    def timed(_: int) -> float:
+        start = perf_counter()
+        call().raise_for_status()
+        return perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(timed, range(count)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+
+    setup_django()
+    from webapp.engine_client import EngineClient
+
+    rows: list[list[object]] = []
+    with FakeEngine() as engine:
+        engine.start_run("bench", 1)
+        client = EngineClient(
+            engine.url, pool_size=args.threads, connect_timeout=5, read_timeout=5
+        )
+        variants: dict[str, Callable[[], requests.Response]] = {
+            "bare requests": lambda: requests.get(
+                f"{engine.url}/status/bench", params={"seed": 1}
+            ),
+            "EngineClient": lambda: client.status("bench", 1),
+        }
+        for name, call in variants.items():
+            connections_before = engine.connections
+            start = perf_counter()
+            latencies = measure(call, args.requests, args.threads)
+            elapsed = perf_counter() - start
+            rows.append(
+                [
+                    name,
+                    f"{args.requests / elapsed:.0f}",
+                    f"{percentile(latencies, 50) * 1000:.2f}",
+                    f"{percentile(latencies, 95) * 1000:.2f}",
+                    engine.connections - connections_before,
+                ]
+            )
+        client.close()
+
+    print_table(["variant", "req/s", "p50 ms", "p95 ms", "connections"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+End-to-end throughput of the job pipeline against the fake engine:
+POST postRequestData (CreateNewJob) -> run_grapharna_task -> GET getResults and downloadZip.
+
+Jobs are submitted through the API like the frontend does, the grapharna queue is emulated with
+--workers threads running run_grapharna_task (ENGINE_DISPATCH_MODE, fan-out etc. come from the
+environment as usual). The fake engine writes PDB and annotator JSON files to the shared directory,
+so post-processing (arc diagram and F1/INF per conformation, VARNA graphs per job) runs for real.
+Uses a temporary SQLite database but the real /shared/samples directory, since the input and output
+paths are fixed; the files of the benchmark jobs are removed afterwards.
+
+Reports jobs/minute, per-stage latency and worker utilization (busy time / workers * wall time).
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_pipeline --jobs 50 --workers 4 --run-seconds 1 --conformations 2
+"""
+
+import argparse
+import glob
+import logging
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+from collections import defaultdict
+from time import perf_counter
+from typing import Any, Callable
+from unittest.mock import patch
+
+from benchmarks.common import percentile, print_table, setup_django
+from benchmarks.fake_engine import FakeEngine
+
+SEQUENCE = "GCGCUAGAAAUAGCGCAACCGGAUGAAAAUCCGG\n((((((....))))))..((((((....))))))"
+
+
+def write_placeholder_svgs(paths: list[tuple[str, str]]) -> list[str]:
+    for _, output_path in paths:
+        with open(output_path, "w") as f:
+            f.write('<svg xmlns="http://www.w3.org/2000/svg"/>\n')
+    return [f"OK: File at: {output_path}" for _, output_path in paths]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=4, help="grapharna workers")
+    parser.add_argument("--conformations", type=int, default=1)
+    parser.add_argument("--run-seconds", type=float, default=1.0)
+    parser.add_argument("--run-jitter", type=float, default=0.5)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--poll", type=float, default=0.25, help="poll interval")
+    parser.add_argument(
+        "--batch", action="store_true", help="engine with /run_batch and /status_batch"
+    )
+    parser.add_argument(
+        "--skip-varna",
+        action="store_true",
+        help="write an empty SVG instead of running VARNA (no Java available)",
+    )
+    args = parser.parse_args()
+
+    if not args.skip_varna and shutil.which("java") is None:
+        sys.exit("VARNA needs Java, install it or run with --skip-varna")
+
+    database = tempfile.NamedTemporaryFile(suffix=".sqlite3")
+    os.environ["DATABASE_ENGINE"] = "django.db.backends.sqlite3"
+    os.environ["DATABASE_NAME"] = database.name
+    setup_django()
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+    from webapp.engine_client import reset_engine_client
+    from webapp.models import Job
+    import webapp.tasks
+
+    for logger in ("webapp.tasks", "celery", "httpx", "matplotlib"):
+        logging.getLogger(logger).setLevel(logging.ERROR)
+    call_command("migrate", verbosity=0)
+
+    latencies: dict[str, list[float]] = defaultdict(list)
+    lock = threading.Lock()
+
+    def record(stage: str, seconds: float) -> None:
+        with lock:
+            latencies[stage].append(seconds)
+
+    def timed(stage: str, function: Callable[..., Any]) -> Callable[..., Any]:
+        def wrapper(*a: Any, **kw: Any) -> Any:
+            start = perf_counter()
+            try:
+                return function(*a, **kw)
+            finally:
+                record(stage, perf_counter() - start)
+
+        return wrapper
+
+    tasks: queue.Queue = queue.Queue()
+    submitted_at: dict[str, float] = {}
+
+    def enqueue(uid: Any, example_number: int | None = None) -> None:
+        submitted_at[str(uid)] = perf_counter()
+        tasks.put(uid)
+
+    busy = [0.0]
+    failed: list[str] = []
+
+    def worker() -> None:
+        while (uid := tasks.get()) is not None:
+            start = perf_counter()
+            record("queue wait", start - submitted_at[str(uid)])
+            try:
+                webapp.tasks.run_grapharna_task(uid)
+            except Exception as e:
+                failed.append(f"{uid}: {e}")
+            finally:
+                connection.close()
+            elapsed = perf_counter() - start
+            record("run_grapharna_task", elapsed)
+            with lock:
+                busy[0] += elapsed
+
+    patches: list[Any] = [
+        patch("webapp.tasks.run_grapharna_task.delay", enqueue),
+        patch(
+            "webapp.tasks.process_engine_output",
+            timed("post-processing", webapp.tasks.process_engine_output),
+        ),
+        patch(
+            "webapp.tasks.draw_secondary_structures",
+            timed("VARNA per job", webapp.tasks.draw_secondary_structures),
+        ),
+    ]
+    if args.skip_varna:
+        patches.append(
+            patch("webapp.visualization_tools.drawVARNAgraphs", write_placeholder_svgs)
+        )
+
+    engine = FakeEngine(
+        run_seconds=args.run_seconds,
+        run_jitter=args.run_jitter,
+        failure_rate=args.failure_rate,
+        output_dir=os.path.join(settings.MEDIA_ROOT, "engine_outputs"),
+        input_dir=os.path.join(settings.MEDIA_ROOT, "engine_inputs"),
+        random_seed=1,
+        batch=args.batch,
+    )
+    client = APIClient()
+    with engine, override_settings(
+        ALLOWED_HOSTS=["testserver"],
+        ENGINE_URL=engine.url,
+        ENGINE_POLL_POLICY="webapp.poll_policies.FixedIntervalPolicy",
+        ENGINE_POLL_INTERVAL_SECONDS=args.poll,
+        ENGINE_REQUEST_RETRY_DELAY=args.poll,
+    ):
+        for p in patches:
+            p.start()
+        reset_engine_client()
+        threads = [threading.Thread(target=worker) for _ in range(args.workers)]
+        for thread in threads:
+            thread.start()
+
+        start = perf_counter()
+        hashed_uids = []
+        try:
+            for n in range(args.jobs):
+                request_start = perf_counter()
+                response = client.post(
+                    "/api/postRequestData/",
+                    {
+                        "fasta_raw": f">bench-{n}\n{SEQUENCE}",
+                        "seed": n,
+                        "job_name": f"bench-{n}",
+                        "alternative_conformations": args.conformations,
+                    },
+                    format="json",
+                )
+                record("submit", perf_counter() - request_start)
+                hashed_uids.append(response.json()["uidh"])
+        finally:
+            for _ in threads:
+                tasks.put(None)
+            for thread in threads:
+                thread.join()
+        processing_wall = perf_counter() - start
+
+        completed = 0
+        for uidh in hashed_uids:
+            request_start = perf_counter()
+            response = client.get("/api/getResults/", {"uidh": uidh})
+            record("getResults", perf_counter() - request_start)
+            if response.json().get("status") != "C":
+                continue
+            completed += 1
+            request_start = perf_counter()
+            response = client.get("/api/downloadZip/", {"uidh": uidh})
+            record("downloadZip", perf_counter() - request_start)
+        wall = perf_counter() - start
+
+        for p in patches:
+            p.stop()
+    reset_engine_client()
+
+    for job in Job.objects.all():
+        for path in glob.glob(os.path.join(settings.MEDIA_ROOT, "*", f"{job.uid}*")):
+            os.remove(path)
+    database.close()
+
+    rows = [
+        [
+            stage,
+            len(values),
+            f"{percentile(values, 50):.3f}",
+            f"{percentile(values, 95):.3f}",
+            f"{max(values):.3f}",
+        ]
+        for stage, values in latencies.items()
+    ]
+    print_table(["stage", "count", "p50 s", "p95 s", "max s"], rows)
+    print()
+    print(f"jobs completed:     {completed}/{args.jobs} ({len(failed)} failed)")
+    print(f"wall time:          {wall:.1f} s")
+    print(f"throughput:         {completed / wall * 60:.1f} jobs/minute")
+    print(
+        f"worker utilization: {busy[0] / (args.workers * processing_wall):.0%}"
+        f" ({args.workers} workers)"
+    )
+    if failed:
+        print("\n".join(["", "failures:", *failed[:10]]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Measures how late engine completion is noticed by execute_and_poll_engine
+with the fixed polling interval and with the exponential backoff policy.
+
+For every policy, runs of several durations are started concurrently on the fake engine;
+overhead is the time between the run finishing on the engine and execute_and_poll_engine returning.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_polling --interval 5 --durations 0.5 2 8
+"""
+
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from benchmarks.common import percentile, print_table, setup_django
+from benchmarks.fake_engine import FakeEngine
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--interval", type=float, default=5.0, help="fixed interval and backoff cap"
+    )
+    parser.add_argument("--durations", type=float, nargs="+", default=[0.5, 2.0, 8.0])
+    parser.add_argument("--runs", type=int, default=5, help="runs per duration")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import override_settings
+    from webapp.engine_client import reset_engine_client
+    from webapp.poll_policies import (
+        ExponentialBackoffPolicy,
+        FixedIntervalPolicy,
+        PollPolicy,
+    )
+    from webapp.tasks import execute_and_poll_engine
+
+    logging.getLogger("webapp.tasks").setLevel(logging.WARNING)
+
+    policies: dict[str, tuple[PollPolicy, bool]] = {
+        "fixed": (FixedIntervalPolicy(args.interval), False),
+        "exponential": (
+            ExponentialBackoffPolicy(0.5, 1.5, args.interval, 0.1),
+            False,
+        ),
+        "exponential + eta": (
+            ExponentialBackoffPolicy(0.5, 1.5, args.interval, 0.1),
+            True,
+        ),
+    }
+
+    durations: list[float] = args.durations
+    rows: list[list[object]] = []
+    for name, (policy, send_eta) in policies.items():
+        for duration in durations:
+            with FakeEngine(run_seconds=duration, send_eta=send_eta) as engine:
+                reset_engine_client()
+
+                def run(n: int) -> float:
+                    start = perf_counter()
+                    execute_and_poll_engine(f"bench-{n}", n, poll_policy=policy)
+                    return perf_counter() - start - duration
+
+                with override_settings(ENGINE_URL=engine.url):
+                    with ThreadPoolExecutor(max_workers=args.runs) as pool:
+                        overheads = list(pool.map(run, range(args.runs)))
+                status_calls = engine.requests.get("status", 0) / args.runs
+
+            rows.append(
+                [
+                    name,
+                    f"{duration:g}",
+                    f"{percentile(overheads, 50):.2f}",
+                    f"{max(overheads):.2f}",
+                    f"{status_calls:.1f}",
+                ]
+            )
+    reset_engine_client()
+
+    print_table(
+        ["policy", "run s", "p50 overhead s", "max overhead s", "status calls/run"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+F1/INF of K conformations against the input structure: the set-based path (dotbracketToPairs and
+CalculateF1Inf per conformation, what finalize_job used before) versus one api.scoring.scoreDotseqs
+batch (what it uses now for every job), which also gives MCC and the pseudoknot-only scores. The "scoring" columns
+leave out reading the dot-seqs: CalculateF1Inf over prepared pair sets versus scoreStructures over
+prepared pairs. Times are the median of --repeat runs.
+
+The conformations are the arc diagram benchmark structure with a random fifth of its pairs opened.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_scoring --lengths 100 1000 --models 1 10 100 --repeat 20
+"""
+
+import argparse
+import random
+import statistics
+from time import perf_counter
+from typing import Callable, Mapping
+
+from benchmarks.bench_arc_diagram import dotseq, input_structure
+from benchmarks.common import print_table, setup_django
+
+
+def conformations(structure: str, pairs: set[tuple[int, int]], count: int) -> list[str]:
+    rng = random.Random(count)
+    models = []
+    for _ in range(count):
+        model = list(structure)
+        for i, j in pairs:
+            if rng.random() < 0.2:
+                model[i] = model[j] = "."
+        models.append(dotseq("".join(model)))
+    return models
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--models", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import override_settings
+    from api.INF_F1 import CalculateF1Inf, dotbracketToPairs
+    from api.pair_extraction import extractPairs
+    from api.scoring import scoreDotseqs, scoreStructures
+
+    def median_time(function: Callable[[], object]) -> float:
+        function()
+        durations = []
+        for _ in range(args.repeat):
+            start = perf_counter()
+            function()
+            durations.append(perf_counter() - start)
+        return statistics.median(durations)
+
+    rows: list[list[object]] = []
+    with override_settings(MAX_RNA_LENGTH=max(args.lengths)):
+        for length in args.lengths:
+            structure = input_structure(length)
+            target = dotseq(structure)
+            targetPairs = extractPairs(target)
+            for count in args.models:
+                models = conformations(structure, targetPairs.pairSet(), count)
+                modelPairs = [extractPairs(model) for model in models]
+                targetSet = targetPairs.pairSet()
+                modelSets = [pairs.pairSet() for pairs in modelPairs]
+
+                def set_based() -> list[Mapping[str, float]]:
+                    targetCorrect = dotbracketToPairs(target)["correctPairs"]
+                    return [
+                        CalculateF1Inf(
+                            targetCorrect, dotbracketToPairs(model)["correctPairs"]
+                        )
+                        for model in models
+                    ]
+
+                expected = set_based()
+                for values, batch in zip(expected, scoreDotseqs(target, models)):
+                    assert abs(values["f1"] - batch["f1"]) < 1e-12
+                    assert abs(values["inf"] - batch["inf"]) < 1e-12
+
+                before = median_time(set_based)
+                after = median_time(lambda: scoreDotseqs(target, models))
+                setScoring = median_time(
+                    lambda: [CalculateF1Inf(targetSet, pairs) for pairs in modelSets]
+                )
+                batchScoring = median_time(
+                    lambda: scoreStructures([targetPairs], modelPairs)
+                )
+                rows.append(
+                    [
+                        length,
+                        count,
+                        f"{before * 1000:.3f}",
+                        f"{after * 1000:.3f}",
+                        f"{before / after:.1f}x",
+                        f"{setScoring * 1000:.3f}",
+                        f"{batchScoring * 1000:.3f}",
+                    ]
+                )
+
+    print_table(
+        [
+            "nt",
+            "models",
+            "set-based ms",
+            "batch ms",
+            "speed-up",
+            "set scoring ms",
+            "batch scoring ms",
+        ],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
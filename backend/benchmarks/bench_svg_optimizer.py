@@ -0,0 +1,109 @@
+"""
+Size and time of the SVG post-processing: webapp.svg_optimizer.optimize_svg versus the previous
+ElementTree rewrite (parse, walk, write, what crop_svg did to every VARNA diagram).
+
+Runs over the SVG fixtures in backend/test_files and arc diagrams of --lengths nt written by both
+arc diagram renderers (unoptimized, as they come out of matplotlib or webapp.arc_diagram).
+Times are the median of --repeat runs.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_svg_optimizer --lengths 100 500 --repeat 20
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import statistics
+import tempfile
+from time import perf_counter
+from typing import Callable
+from unittest.mock import patch
+from xml.etree import ElementTree as ET
+
+from benchmarks.bench_arc_diagram import dotseq, input_structure
+from benchmarks.common import print_table, setup_django
+from benchmarks.fake_engine import predict_structure
+
+TEST_FILES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_files"
+)
+
+
+def elementtree_rewrite(input_svg: str, output_svg: str) -> None:
+    tree = ET.parse(input_svg)
+    for _ in tree.getroot():
+        pass
+    tree.write(output_svg)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import override_settings
+    from webapp.svg_optimizer import optimize_svg
+    from webapp.visualization_tools import generateRchieDiagram
+
+    directory = tempfile.TemporaryDirectory()
+    samples = {
+        os.path.relpath(path, TEST_FILES): path
+        for path in sorted(glob.glob(os.path.join(TEST_FILES, "*.svg")))
+    }
+
+    target = os.path.join(directory.name, "target.dotseq")
+    model = os.path.join(directory.name, "model.dotseq")
+    with (
+        override_settings(MAX_RNA_LENGTH=max(args.lengths)),
+        patch("webapp.visualization_tools.optimizeSvgOutput"),
+    ):
+        for length in args.lengths:
+            structure = input_structure(length)
+            with open(target, "w") as f:
+                f.write(dotseq(structure))
+            with open(model, "w") as f:
+                f.write(dotseq(predict_structure(structure, length)))
+            for renderer in ("svg", "matplotlib"):
+                output = os.path.join(directory.name, f"arc_{renderer}_{length}.svg")
+                with override_settings(ARC_DIAGRAM_RENDERER=renderer):
+                    generateRchieDiagram(target, model, output)
+                samples[f"arc diagram {length} nt ({renderer})"] = output
+
+    def median_time(function: Callable[[str, str], None], sample: str) -> float:
+        durations = []
+        for _ in range(args.repeat):
+            work = os.path.join(directory.name, "work.svg")
+            shutil.copy(sample, work)
+            start = perf_counter()
+            function(work, work)
+            durations.append(perf_counter() - start)
+        return statistics.median(durations)
+
+    rows: list[list[object]] = []
+    for name, path in samples.items():
+        optimized = os.path.join(directory.name, "optimized.svg")
+        optimize_svg(path, optimized)
+        before, after = os.path.getsize(path), os.path.getsize(optimized)
+        rows.append(
+            [
+                name,
+                before,
+                after,
+                f"{1 - after / before:.0%}",
+                f"{median_time(elementtree_rewrite, path) * 1000:.2f}",
+                f"{median_time(optimize_svg, path) * 1000:.2f}",
+            ]
+        )
+
+    print_table(
+        ["file", "bytes", "optimized", "saved", "ElementTree ms", "optimizer ms"],
+        rows,
+    )
+    directory.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+RNA validation (api.validation_tools.RnaValidator) for structures of 10-10,000 nt: the validator of a
+request (parsing and ValidateRna, what /validateRNA/, a submission and every F1/INF or arc diagram
+computation pay) and its checks (characters, brackets and pairing) compiled once per process versus the
+previous per-instance lists and per-character set checks. Times are the median of --repeat runs.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_validation --lengths 10 100 1000 10000 --repeat 50
+"""
+
+import argparse
+import statistics
+from collections import deque
+from time import perf_counter
+from typing import Callable
+
+from benchmarks.bench_arc_diagram import dotseq, input_structure
+from benchmarks.common import print_table, setup_django
+
+
+def previous_checks(rna: str, dotBracket: str) -> list[tuple[int, int]]:
+    """The checks as the validator did them before the rules were compiled."""
+    from django.conf import settings
+
+    validBrackets = settings.VALID_BRACKETS + " "
+    validNucleotides = settings.VALID_NUCLEOTIDES + " "
+    validPairs = [
+        settings.VALID_PAIRS[i : i + 2] for i in range(0, len(settings.VALID_PAIRS), 2)
+    ]
+    set(char for char in rna if char not in set(validNucleotides))
+    set(char for char in dotBracket if char not in set(validBrackets))
+
+    bracketStacks: dict[str, deque[int]] = {
+        validBrackets[i : i + 2]: deque()
+        for i in range(0, len(validBrackets), 2)
+        if validBrackets[i] != "."
+    }
+    openingLookup = {pair[0]: pair for pair in bracketStacks.keys()}
+    closingLookup = {pair[1]: pair for pair in bracketStacks.keys()}
+    allPairs: list[tuple[int, int]] = []
+    for i in range(len(dotBracket)):
+        if dotBracket[i] in openingLookup:
+            bracketStacks[openingLookup[dotBracket[i]]].append(i)
+        elif dotBracket[i] in closingLookup:
+            stack = bracketStacks[closingLookup[dotBracket[i]]]
+            if len(stack) > 0:
+                if rna[stack[-1]] + rna[i] in validPairs:
+                    allPairs.append((stack[-1], i))
+                stack.pop()
+    return allPairs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--lengths", type=int, nargs="+", default=[10, 100, 1000, 10000]
+    )
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import override_settings
+    from api.validation_tools import RnaValidator
+
+    def median_time(function: Callable[[], object]) -> float:
+        function()
+        durations = []
+        for _ in range(args.repeat):
+            start = perf_counter()
+            function()
+            durations.append(perf_counter() - start)
+        return statistics.median(durations)
+
+    rows: list[list[object]] = []
+    with override_settings(MAX_RNA_LENGTH=max(args.lengths)):
+        for length in args.lengths:
+            fasta = dotseq(input_structure(length))
+            validator = RnaValidator(fasta)
+            rna, dotBracket = validator.parsedStructure.split("\n")
+            rules = validator.rules
+
+            def compiled_checks() -> list[tuple[int, int]]:
+                set(rna.translate(rules.nucleotideFilter))
+                set(dotBracket.translate(rules.bracketFilter))
+                return validator.stackCheck(dotBracket, rna)[4]
+
+            assert compiled_checks() == previous_checks(rna, dotBracket)
+            before = median_time(lambda: previous_checks(rna, dotBracket))
+            after = median_time(compiled_checks)
+            rows.append(
+                [
+                    length,
+                    f"{median_time(lambda: RnaValidator(fasta).ValidateRna()) * 1000:.3f}",
+                    f"{before * 1000:.3f}",
+                    f"{after * 1000:.3f}",
+                    f"{before / after:.1f}x",
+                ]
+            )
+
+    print_table(
+        ["nt", "validator ms", "previous checks ms", "compiled checks ms", "speed-up"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Secondary structure diagrams per second: drawVARNAgraph starting one VARNA JVM per diagram
+(varnaapi savefig) versus the long-lived VARNA render server of the worker.
+
+Draws a 76-nt tRNA (yeast tRNA-Phe) --diagrams times each way. The first render server diagram
+includes the JVM startup and is reported separately.
+
+Then the VARNA part of post-processing per job (--jobs jobs of --conformations conformations):
+one drawVARNAgraph per conformation (VARNA process each) versus drawVARNAgraphs per job, with the
+render server disabled (one VARNA start per job) and enabled. Needs Java (a JDK for the render server).
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_varna --diagrams 50 --jobs 10 --conformations 5
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from time import perf_counter
+from unittest.mock import patch
+
+from benchmarks.common import percentile, print_table, setup_django
+
+TRNA = (
+    ">tRNA-Phe\n"
+    "GCGGAUUUAGCUCAGUUGGGAGAGCGCCAGACUGAAGAUCUGGAGGUCCUGUGUUCGAUCCACAGAAUUCGCACCA\n"
+    "(((((((..((((........)))).(((((.......))))).....(((((.......))))))))))))....\n"
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--diagrams", type=int, default=50)
+    parser.add_argument("--jobs", type=int, default=10)
+    parser.add_argument("--conformations", type=int, default=5)
+    args = parser.parse_args()
+
+    if shutil.which("java") is None:
+        sys.exit("VARNA needs Java")
+    setup_django()
+    from django.test import override_settings
+    from webapp import visualization_tools
+    from webapp.varna_server import get_varna_server, reset_varna_server
+
+    directory = tempfile.TemporaryDirectory()
+    dotseq = os.path.join(directory.name, "trna.dotseq")
+    with open(dotseq, "w") as f:
+        f.write(TRNA)
+
+    def draw(count: int) -> list[float]:
+        durations = []
+        for n in range(count):
+            start = perf_counter()
+            result = visualization_tools.drawVARNAgraph(
+                dotseq, os.path.join(directory.name, f"{n}.svg")
+            )
+            durations.append(perf_counter() - start)
+            if not result.startswith("OK"):
+                sys.exit(result)
+        return durations
+
+    rows: list[list[object]] = []
+
+    def report(name: str, durations: list[float]) -> None:
+        rows.append(
+            [
+                name,
+                len(durations),
+                f"{len(durations) / sum(durations):.1f}",
+                f"{percentile(durations, 50) * 1000:.0f}",
+                f"{percentile(durations, 95) * 1000:.0f}",
+            ]
+        )
+
+    with patch("webapp.visualization_tools.get_varna_server", return_value=None):
+        report("JVM per diagram", draw(args.diagrams))
+
+    reset_varna_server()
+    startup = draw(1)
+    server = get_varna_server()
+    if server is None or server.renders != 1:
+        sys.exit("VARNA render server didn't start (is a JDK installed?)")
+    report("render server, first diagram", startup)
+    report("render server", draw(args.diagrams))
+    reset_varna_server()
+
+    print_table(["mode", "diagrams", "diagrams/s", "p50 ms", "p95 ms"], rows)
+
+    def draw_jobs(batch: bool) -> list[float]:
+        durations = []
+        for job in range(args.jobs):
+            paths = [
+                (dotseq, os.path.join(directory.name, f"job{job}_{n}.svg"))
+                for n in range(args.conformations)
+            ]
+            start = perf_counter()
+            if batch:
+                results = visualization_tools.drawVARNAgraphs(paths)
+            else:
+                results = [visualization_tools.drawVARNAgraph(*p) for p in paths]
+            durations.append(perf_counter() - start)
+            if not all(result.startswith("OK") for result in results):
+                sys.exit(str(results))
+        return durations
+
+    job_rows: list[list[object]] = []
+
+    def report_jobs(name: str, durations: list[float]) -> None:
+        job_rows.append(
+            [
+                name,
+                len(durations),
+                f"{percentile(durations, 50) * 1000:.0f}",
+                f"{percentile(durations, 95) * 1000:.0f}",
+            ]
+        )
+
+    with override_settings(VARNA_RENDER_SERVER=False):
+        report_jobs("drawVARNAgraph per conformation", draw_jobs(batch=False))
+        report_jobs("drawVARNAgraphs per job", draw_jobs(batch=True))
+    draw(1)  # start the render server, its startup is reported above
+    report_jobs("drawVARNAgraphs, render server", draw_jobs(batch=True))
+    reset_varna_server()
+
+    print()
+    print(f"VARNA post-processing per job ({args.conformations} conformations)")
+    print_table(["mode", "jobs", "p50 ms/job", "p95 ms/job"], job_rows)
+    directory.cleanup()
+
+
+if __name__ == "__main__":
+    main()
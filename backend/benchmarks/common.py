@@ -0,0 +1,27 @@
+import os
+import statistics
+
+
+def setup_django() -> None:
+    """Configures Django the same way manage.py does, so benchmarks can use app code."""
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "GraphaRNA.settings")
+    django.setup()
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q) - 1]
+
+
+def print_table(headers: list[str], rows: list[list[object]]) -> None:
+    cells = [headers] + [[str(c) for c in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    for n, row in enumerate(cells):
+        print("  ".join(c.rjust(w) for c, w in zip(row, widths)))
+        if n == 0:
+            print("  ".join("-" * w for w in widths))
@@ -0,0 +1,433 @@
+"""
+Local stand-in for the grapharna-engine HTTP API, used by the benchmarks and tests.
+
+Implements the endpoints the backend talks to:
+- POST /run (form data: uuid, seed, optional callback_url and callback_token) - starts a run,
+  when a callback_url is given it receives {"uuid", "seed"} once the run is done
+- GET /status/<uuid>?seed=<seed> - 202 while the run is computing (optionally with an "eta" hint),
+  200 with result paths when done
+- POST /cancel/<uuid> - cancels every run of the uuid
+- POST /test - synchronous self-test on engine_inputs/test.dotseq
+- GET /health
+- with batch support: POST /run_batch and /status_batch (JSON {"runs": [{"uuid", "seed"}, ...]}),
+  the status of every run comes back as {"uuid", "seed", "code", "result"}
+
+With an output_dir the engine behaves like the real one on the shared volume: it reads the job input
+(<input_dir>/<uuid>.dotseq) and writes a PDB model and the annotator JSON for every finished run.
+Without it the result paths point to files that don't exist, which is enough for the polling benchmarks.
+
+Setting `down` makes the engine drop every connection without a response, like an engine that is restarting.
+"""
+
+import math
+import os
+import random
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from time import monotonic, sleep
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+from urllib.request import Request, urlopen
+
+
+class EngineHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # hundreds of clients may connect at once
+
+
+BRACKETS = {"(": ")", "[": "]", "{": "}", "<": ">"}
+
+
+def predict_structure(structure: str, seed: int) -> str:
+    """Input structure with some of its pairs opened (depending on the seed), so scores differ per conformation."""
+    rng = random.Random(seed)
+    predicted = list(structure)
+    stacks: dict[str, list[int]] = {opening: [] for opening in BRACKETS}
+    closing = {v: k for k, v in BRACKETS.items()}
+    for i, char in enumerate(structure):
+        if char in BRACKETS:
+            stacks[char].append(i)
+        elif char in closing and stacks[closing[char]]:
+            j = stacks[closing[char]].pop()
+            if rng.random() < 0.1:
+                predicted[i] = predicted[j] = "."
+    return "".join(predicted)
+
+
+def pdb_model(strands: list[str]) -> str:
+    """Backbone-only PDB model (P and C4' atoms on a helix), one chain per strand."""
+    lines = []
+    serial = 0
+    position = 0
+    for chain, strand in zip("ABCDEFGHIJKLMNOPQRSTUVWXYZ", strands):
+        for residue_number, residue in enumerate(strand, start=1):
+            for atom, radius in (("P", 8.9), ("C4'", 7.8)):
+                serial += 1
+                angle = position * 0.57
+                lines.append(
+                    f"ATOM  {serial:5d} {' ' + atom:<4} {residue:>3} {chain}{residue_number:4d}    "
+                    f"{radius * math.cos(angle):8.3f}{radius * math.sin(angle):8.3f}{2.8 * position:8.3f}"
+                    f"  1.00  0.00           {atom[0]:>1}"
+                )
+            position += 1
+        lines.append(
+            f"TER   {serial + 1:5d}      {strand[-1]:>3} {chain}{len(strand):4d}"
+        )
+        serial += 1
+    lines.append("END")
+    return "\n".join(lines) + "\n"
+
+
+class FakeEngine:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        run_seconds: float = 0.0,
+        response_delay: float = 0.0,
+        send_eta: bool = False,
+        run_jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        output_dir: str | None = None,
+        input_dir: str = "/shared/samples/engine_inputs",
+        random_seed: int | None = None,
+        batch: bool = False,
+        capacity: int | None = None,
+    ) -> None:
+        """
+        run_seconds - how long a run stays in "processing" state after /run
+        response_delay - artificial latency added to every HTTP response
+        send_eta - include the remaining run time ("eta", seconds) in 202 status responses
+        run_jitter - random extra run time, up to run_jitter seconds per run
+        failure_rate - fraction of runs that end with an engine error (500) instead of a result
+        output_dir - where the PDB and annotator JSON files of finished runs are written
+        input_dir - where the job inputs (<uuid>.dotseq) are read from
+        random_seed - makes the jitter and failures reproducible
+        batch - advertise and serve /run_batch and /status_batch
+        capacity - runs computed at the same time, further /run calls get 429; advertised in /health
+        """
+        self.run_seconds = run_seconds
+        self.response_delay = response_delay
+        self.send_eta = send_eta
+        self.run_jitter = run_jitter
+        self.failure_rate = failure_rate
+        self.output_dir = output_dir
+        self.input_dir = input_dir
+        self.random = random.Random(random_seed)
+        self.batch = batch
+        self.capacity = capacity
+        self.advertise_capacity = True
+        self.peak_running: int = 0
+        self.admission = threading.Lock()  # capacity check and start of a run
+        self.down = False
+        self.runs: dict[tuple[str, int], float] = {}  # (uuid, seed) -> finish time
+        self.failed: set[tuple[str, int]] = set()
+        self.written: set[tuple[str, int]] = set()
+        self.cancelled: set[str] = set()
+        self.requests: dict[str, int] = {}  # endpoint -> number of requests
+        self.connections: int = 0
+        self.lock = threading.Lock()
+
+        self.server = EngineHTTPServer((host, port), self._handler_class())
+        self.thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def start(self) -> "FakeEngine":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeEngine":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def count(self, endpoint: str) -> None:
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def start_run(
+        self,
+        uuid: str,
+        seed: int,
+        callback_url: str | None = None,
+        callback_token: str = "",
+    ) -> None:
+        with self.lock:
+            run_seconds = self.run_seconds + self.random.uniform(0, self.run_jitter)
+            self.runs[(uuid, seed)] = monotonic() + run_seconds
+            if self.random.random() < self.failure_rate:
+                self.failed.add((uuid, seed))
+            else:
+                self.failed.discard((uuid, seed))
+            self.written.discard((uuid, seed))
+            self.cancelled.discard(uuid)
+        if callback_url:
+            timer = threading.Timer(
+                run_seconds,
+                self.send_callback,
+                (callback_url, callback_token, uuid, seed),
+            )
+            timer.daemon = True
+            timer.start()
+
+    def running(self) -> int:
+        now = monotonic()
+        with self.lock:
+            return sum(
+                1
+                for (uuid, _), finish_time in self.runs.items()
+                if finish_time > now and uuid not in self.cancelled
+            )
+
+    def admit(self, uuid: str, seed: int, *args: Any) -> bool:
+        """Starts the run if it fits in the capacity (always without one)."""
+        with self.admission:
+            running = self.running()
+            if self.capacity is not None and running >= self.capacity:
+                return False
+            self.peak_running = max(self.peak_running, running + 1)
+            self.start_run(uuid, seed, *args)
+        return True
+
+    def send_callback(self, url: str, token: str, uuid: str, seed: int) -> None:
+        if (uuid, seed) not in self.failed:
+            self.write_outputs(uuid, seed)
+        request = Request(
+            url,
+            data=json.dumps({"uuid": uuid, "seed": seed}).encode(),
+            headers={"Content-Type": "application/json", "X-Engine-Token": token},
+        )
+        try:
+            urlopen(request, timeout=5).close()
+        except OSError:
+            pass  # the backend falls back to polling
+        self.count("callback")
+
+    def run_status(self, uuid: str, seed: int) -> tuple[int, dict[str, Any]]:
+        with self.lock:
+            finish_time = self.runs.get((uuid, seed))
+            cancelled = uuid in self.cancelled
+            failed = (uuid, seed) in self.failed
+        if finish_time is None:
+            return 404, {"error": f"Unknown run {uuid} (seed {seed})"}
+        if cancelled:
+            return 500, {"error": "Run cancelled"}
+        remaining = finish_time - monotonic()
+        if remaining > 0:
+            if self.send_eta:
+                return 202, {"status": "processing", "eta": remaining}
+            return 202, {"status": "processing"}
+        if failed:
+            return 500, {"error": "GraphaRNA inference failed"}
+        self.write_outputs(uuid, seed)
+        return 200, self.result(uuid, seed)
+
+    def result(self, uuid: str, seed: int) -> dict[str, Any]:
+        output_dir = self.output_dir or "/shared/samples/engine_outputs"
+        return {
+            "pdbFilePath": os.path.join(output_dir, f"{uuid}_{seed}.pdb"),
+            "jsonFilePath": os.path.join(output_dir, f"{uuid}_{seed}.json"),
+        }
+
+    def read_input(self, uuid: str) -> tuple[str, str]:
+        """Sequence and structure lines of the job input, a random hairpin when there is none."""
+        try:
+            with open(os.path.join(self.input_dir, f"{uuid}.dotseq")) as f:
+                lines = f.read().split("\n")
+            return lines[1].strip(), lines[2].strip()
+        except (OSError, IndexError):
+            rng = random.Random(uuid)
+            stem = "".join(rng.choice("ACGU") for _ in range(8))
+            return stem + "GAAA" + stem[::-1], "(" * 8 + "...." + ")" * 8
+
+    def write_outputs(self, uuid: str, seed: int) -> None:
+        """Writes the PDB model and the annotator JSON of a finished run (once per run)."""
+        if self.output_dir is None:
+            return
+        with self.lock:
+            if (uuid, seed) in self.written:
+                return
+            self.written.add((uuid, seed))
+
+        sequence, structure = self.read_input(uuid)
+        # the annotator doesn't know about strand breaks, the backend re-inserts them
+        strands = sequence.replace("-", " ").split()
+        sequence = "".join(strands)
+        structure = structure.replace(" ", "").replace("-", "")
+        if len(structure) != len(sequence):
+            structure = "." * len(sequence)
+        annotation = {
+            "dotBracket": f">strand_A\n{sequence}\n{predict_structure(structure, seed)}"
+        }
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        paths = self.result(uuid, seed)
+        with open(paths["pdbFilePath"], "w") as f:
+            f.write(pdb_model(strands))
+        with open(paths["jsonFilePath"], "w") as f:
+            json.dump(annotation, f)
+
+    def self_test(self) -> tuple[int, dict[str, Any]]:
+        """The engine /test endpoint: a synchronous run on engine_inputs/test.dotseq."""
+        sleep(self.run_seconds)
+        with self.lock:
+            self.written.discard(("test", 0))
+        self.write_outputs("test", 0)
+        return 200, self.result("test", 0)
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        engine = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def setup(self) -> None:
+                super().setup()
+                # headers and body are written separately, avoid Nagle delays on keep-alive
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with engine.lock:
+                    engine.connections += 1
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def reply(self, code: int, body: dict[str, Any]) -> None:
+                if engine.response_delay:
+                    sleep(engine.response_delay)
+                payload = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def read_body(self) -> str:
+                length = int(self.headers.get("Content-Length", 0))
+                return self.rfile.read(length).decode() if length else ""
+
+            def batch_runs(self) -> list[tuple[str, int]]:
+                runs = json.loads(self.read_body())["runs"]
+                return [(run["uuid"], int(run["seed"])) for run in runs]
+
+            def dropped(self) -> bool:
+                if engine.down:
+                    engine.count("dropped")
+                    self.close_connection = True
+                return engine.down
+
+            def do_GET(self) -> None:
+                if self.dropped():
+                    return
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if url.path == "/health":
+                    engine.count("health")
+                    body: dict[str, Any] = {
+                        "status": "ok",
+                        "features": ["batch"] if engine.batch else [],
+                    }
+                    if engine.capacity is not None and engine.advertise_capacity:
+                        body["capacity"] = engine.capacity
+                    self.reply(200, body)
+                elif url.path.startswith("/status/"):
+                    engine.count("status")
+                    uuid = url.path.removeprefix("/status/")
+                    code, body = engine.run_status(uuid, int(query.get("seed", 0)))
+                    self.reply(code, body)
+                else:
+                    self.reply(404, {"error": "Not found"})
+
+            def do_POST(self) -> None:
+                if self.dropped():
+                    return
+                url = urlparse(self.path)
+                if engine.batch and url.path == "/run_batch":
+                    engine.count("run_batch")
+                    for uuid, seed in self.batch_runs():
+                        engine.start_run(uuid, seed)
+                    self.reply(202, {"status": "started"})
+                    return
+                if engine.batch and url.path == "/status_batch":
+                    engine.count("status_batch")
+                    statuses = []
+                    for uuid, seed in self.batch_runs():
+                        code, body = engine.run_status(uuid, seed)
+                        statuses.append(
+                            {"uuid": uuid, "seed": seed, "code": code, "result": body}
+                        )
+                    self.reply(200, {"runs": statuses})
+                    return
+
+                form = {k: v[0] for k, v in parse_qs(self.read_body()).items()}
+                if url.path == "/run":
+                    engine.count("run")
+                    if engine.admit(
+                        form["uuid"],
+                        int(form.get("seed", 0)),
+                        form.get("callback_url"),
+                        form.get("callback_token", ""),
+                    ):
+                        self.reply(202, {"status": "started"})
+                    else:
+                        engine.count("rejected")
+                        self.reply(429, {"error": "Engine at capacity"})
+                elif url.path.startswith("/cancel/"):
+                    engine.count("cancel")
+                    with engine.lock:
+                        engine.cancelled.add(url.path.removeprefix("/cancel/"))
+                    self.reply(200, {"status": "cancelled"})
+                elif url.path == "/test":
+                    engine.count("test")
+                    self.reply(*engine.self_test())
+                else:
+                    self.reply(404, {"error": "Not found"})
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a fake grapharna-engine.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--run-seconds", type=float, default=5.0)
+    parser.add_argument("--run-jitter", type=float, default=0.0)
+    parser.add_argument("--response-delay", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--output-dir",
+        default=None,
+        help="write PDB and annotator JSON files here, e.g. /shared/samples/engine_outputs",
+    )
+    parser.add_argument("--input-dir", default="/shared/samples/engine_inputs")
+    parser.add_argument("--batch", action="store_true", help="serve batch endpoints")
+    parser.add_argument("--capacity", type=int, default=None)
+    args = parser.parse_args()
+
+    fake = FakeEngine(
+        args.host,
+        args.port,
+        run_seconds=args.run_seconds,
+        response_delay=args.response_delay,
+        run_jitter=args.run_jitter,
+        failure_rate=args.failure_rate,
+        output_dir=args.output_dir,
+        input_dir=args.input_dir,
+        batch=args.batch,
+        capacity=args.capacity,
+    )
+    print(f"Fake engine listening on {fake.url}")
+    fake.server.serve_forever()
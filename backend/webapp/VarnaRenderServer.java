@@ -0,0 +1,40 @@
+import fr.orsay.lri.varna.applications.VARNAcmd;
+
+import java.io.BufferedReader;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.nio.charset.StandardCharsets;
+import java.util.Arrays;
+import java.util.Vector;
+
+/**
+ * Keeps one JVM with VARNA loaded and draws diagrams on request, see webapp/varna_server.py.
+ *
+ * Every line on stdin holds the arguments of one VARNAcmd call separated by tabs, the answer is one
+ * line on stdout: "OK" or "ERROR <message>". Anything VARNA prints goes to stderr, so stdout only
+ * carries answers. Started with the source-file launcher: java -cp VARNAv3-93.jar VarnaRenderServer.java
+ */
+public class VarnaRenderServer {
+    public static void main(String[] args) throws Exception {
+        PrintStream replies = new PrintStream(new FileOutputStream(FileDescriptor.out), true, "UTF-8");
+        System.setOut(System.err);
+        BufferedReader requests = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+
+        replies.println("READY");
+        String line;
+        while ((line = requests.readLine()) != null) {
+            if (line.isEmpty()) {
+                continue;
+            }
+            try {
+                new VARNAcmd(new Vector<String>(Arrays.asList(line.split("\t", -1)))).run();
+                replies.println("OK");
+            } catch (Throwable e) { // VARNAcmd reports bad input with exceptions (VARNAcmd.ExitCode)
+                String message = String.valueOf(e.getMessage()).replace('\n', ' ');
+                replies.println("ERROR " + e.getClass().getSimpleName() + ": " + message);
+            }
+        }
+    }
+}
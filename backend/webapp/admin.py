@@ -1,5 +1,12 @@
 from django.contrib import admin
-from .models import ExampleStructures, Job, JobResults
+from .models import (
+    CircuitBreakerState,
+    EngineRun,
+    ExampleStructures,
+    Job,
+    JobResults,
+    Metric,
+)
 
 
 @admin.register(Job)
@@ -21,6 +28,7 @@ class JobAdmin(admin.ModelAdmin):
 class JobResultsAdmin(admin.ModelAdmin):
     list_display = (
         "job",
+        "seed",
         "completed_at",
         "result_secondary_structure_dotseq",
         "result_secondary_structure_svg",
@@ -37,3 +45,39 @@ class ExampleStructuresAdmin(admin.ModelAdmin):
         "id",
         "job",
     )
+
+
+@admin.register(EngineRun)
+class EngineRunAdmin(admin.ModelAdmin):
+    list_display = (
+        "job",
+        "seed",
+        "status",
+        "submitted_at",
+        "finished_at",
+    )
+    list_filter = ("status",)
+
+
+@admin.register(CircuitBreakerState)
+class CircuitBreakerStateAdmin(admin.ModelAdmin):
+    list_display = (
+        "name",
+        "state",
+        "failures",
+        "opened_at",
+        "next_probe_at",
+        "changed_at",
+    )
+
+
+@admin.register(Metric)
+class MetricAdmin(admin.ModelAdmin):
+    list_display = (
+        "name",
+        "labels",
+        "kind",
+        "value",
+        "updated_at",
+    )
+    search_fields = ("name",)
@@ -0,0 +1,142 @@
+from html import escape
+
+# one nucleotide is 0.4 inch wide, like the n / 2.5 inch wide matplotlib figure (all sizes are in pt)
+UNIT = 28.8
+PADDING = 7.2  # pad_inches=0.1
+TITLE_FONT_SIZE = 12
+LEGEND_FONT_SIZE = 10
+LEGEND = (
+    ("red", "Missing (Input only)"),
+    ("green", "Common (Match)"),
+    ("blue", "Added (Output only)"),
+)
+
+
+def clip(value: float, low: float, high: float) -> float:
+    return min(max(value, low), high)
+
+
+def write_arc_diagram_svg(
+    nucleotides: str,
+    n: int,
+    missing_pairs: set[tuple[int, int]],
+    common_pairs: set[tuple[int, int]],
+    added_pairs: set[tuple[int, int]],
+    output_img_path: str,
+    grid_step: int = 20,
+) -> None:
+    """
+    Writes the arc diagram of generateRchieDiagram straight to SVG, without matplotlib: input structure
+    arcs above the sequence (missing red, common green), output structure arcs below (added blue, common
+    green), grey grid lines every grid_step nucleotides and the legend underneath.
+
+    Arcs of one colour are a single path of SVG arc commands and the sequence is a single text element
+    with one x position per nucleotide, so the file grows by a few bytes per nucleotide and pair.
+    Pairs are 1-indexed (i, j) with i < j.
+    """
+    all_pairs = missing_pairs | common_pairs | added_pairs
+    max_span = max((j - i) for (i, j) in all_pairs) if all_pairs else 1
+    max_r = max_span / 2.0 + 1
+    lw = clip(1.5 * (50 / max(len(all_pairs), 1)), 0.5, 1.85)
+    y_offset = max_r * 0.01
+    text_y_pos = max_r + 2.0
+    total_plot_height = text_y_pos + 2.0
+    seq_font_size = clip(300 / n, 5, 10)
+    index_font_size = seq_font_size * 0.85
+
+    legend_height = LEGEND_FONT_SIZE * 2.2
+    entry_widths = [30 + len(label) * LEGEND_FONT_SIZE * 0.55 for _, label in LEGEND]
+    legend_width = sum(entry_widths) + 10
+    width = max(n * UNIT, legend_width) + 2 * PADDING
+    plot_height = 2 * total_plot_height * UNIT
+    height = plot_height + seq_font_size * 1.2 + legend_height + 2 * PADDING
+
+    def x(position: float) -> float:
+        return (position - 0.5) * UNIT + PADDING
+
+    def y(value: float) -> float:
+        return (total_plot_height - value) * UNIT + PADDING
+
+    def arcs(pairs: set[tuple[int, int]], top: bool) -> str:
+        baseline = y(y_offset if top else -y_offset)
+        # clockwise from the left end goes up, y grows downwards
+        sweep = 1 if top else 0
+        return "".join(
+            f"M{x(i):.1f} {baseline:.1f}A{(j - i) * UNIT / 2:.1f} {(j - i) * UNIT / 2:.1f} "
+            f"0 0 {sweep} {x(j):.1f} {baseline:.1f}"
+            for i, j in sorted(pairs)
+        )
+
+    grid = list(range(1, n + 1, grid_step))
+    if (n - 1) % grid_step != 0:  # line at the end of the structure
+        grid.append(n)
+
+    zero = y(0)
+    parts = [
+        '<?xml version="1.0" encoding="utf-8"?>\n',
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.1f}pt" height="{height:.1f}pt" '
+        f'viewBox="0 0 {width:.1f} {height:.1f}" version="1.1">\n',
+        f'<rect width="{width:.1f}" height="{height:.1f}" fill="white"/>\n',
+        '<path stroke="lightgrey" stroke-width="0.5" fill="none" d="'
+        + "".join(
+            f"M{x(g):.1f} {y(total_plot_height):.1f}V{y(-total_plot_height):.1f}"
+            for g in grid
+        )
+        + '"/>\n',
+    ]
+    for pairs, color, top in (
+        (missing_pairs, "red", True),
+        (common_pairs, "green", True),
+        (added_pairs, "blue", False),
+        (common_pairs, "green", False),
+    ):
+        if pairs:
+            parts.append(
+                f'<path stroke="{color}" stroke-width="{lw:.2f}" fill="none" '
+                f'stroke-linecap="square" d="{arcs(pairs, top)}"/>\n'
+            )
+
+    positions = " ".join(f"{x(i + 1):.1f}" for i in range(len(nucleotides[:n])))
+    parts.append(
+        f'<text x="{positions}" y="{zero + seq_font_size * 0.9:.1f}" font-family="monospace" '
+        f'font-size="{seq_font_size:.1f}" text-anchor="middle">{escape(nucleotides[:n])}</text>\n'
+    )
+    parts.append(
+        f'<text y="{zero - seq_font_size * 0.15:.1f}" font-family="sans-serif" '
+        f'font-size="{index_font_size:.1f}" fill="gray" text-anchor="middle">'
+        + "".join(f'<tspan x="{x(i):.1f}">{i}</tspan>' for i in range(10, n + 1, 10))
+        + "</text>\n"
+    )
+    parts.append(
+        f'<path stroke="black" stroke-width="1" fill="none" d="M{x(0.5):.1f} {zero:.1f}H{x(n + 0.5):.1f}'
+        f'M{x(n + 0.5) - 6:.1f} {zero - 3:.1f}L{x(n + 0.5):.1f} {zero:.1f}L{x(n + 0.5) - 6:.1f} {zero + 3:.1f}"/>\n'
+    )
+    for label, value, baseline in (
+        ("Input Structure", text_y_pos, 0.0),
+        ("Output Structure", -text_y_pos, TITLE_FONT_SIZE * 0.9),
+    ):
+        parts.append(
+            f'<text x="{x(1):.1f}" y="{y(value) + baseline:.1f}" font-family="sans-serif" '
+            f'font-size="{TITLE_FONT_SIZE}" font-weight="bold">{label}</text>\n'
+        )
+
+    # legend: three entries in one row, centred under the plot
+    left = (width - legend_width) / 2
+    legend_top = PADDING + plot_height + seq_font_size * 1.2
+    parts.append(
+        f'<rect x="{left:.1f}" y="{legend_top:.1f}" width="{legend_width:.1f}" height="{legend_height:.1f}" '
+        'fill="white" stroke="lightgrey" rx="2"/>\n'
+    )
+    middle = legend_top + legend_height / 2
+    entry_x = left + 10
+    for (color, label), entry_width in zip(LEGEND, entry_widths):
+        parts.append(
+            f'<path stroke="{color}" stroke-width="2" d="M{entry_x:.1f} {middle:.1f}h20"/>'
+            f'<text x="{entry_x + 25:.1f}" y="{middle + LEGEND_FONT_SIZE * 0.35:.1f}" '
+            f'font-family="sans-serif" font-size="{LEGEND_FONT_SIZE}">{label}</text>\n'
+        )
+        entry_x += entry_width
+    parts.append("</svg>\n")
+
+    with open(output_img_path, "w") as f:
+        f.write("".join(parts))
@@ -0,0 +1,195 @@
+import logging
+from datetime import timedelta
+from time import monotonic
+from typing import Callable
+import requests
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from . import metrics
+from .models import CircuitBreakerState, CircuitState
+
+logger = logging.getLogger(__name__)
+
+# responses meaning the engine (or the proxy in front of it) is down, not that a run failed
+FAILURE_STATUS_CODES = (502, 504)
+
+
+class CircuitOpenError(Exception):
+    """Exception raised instead of calling the engine while the circuit is open."""
+
+    def __init__(self, retry_in: float) -> None:
+        self.retry_in = retry_in  # seconds until the next health probe
+        super().__init__(f"Engine unavailable, next health check in {retry_in:.0f}s")
+
+
+def probe_engine_health() -> bool:
+    """Calls the engine /health endpoint directly (not through the breaker)."""
+    try:
+        response = requests.get(
+            f"{settings.ENGINE_URL.rstrip('/')}/health",
+            timeout=(
+                settings.ENGINE_CONNECT_TIMEOUT_SECONDS,
+                settings.ENGINE_CONNECT_TIMEOUT_SECONDS,
+            ),
+        )
+        return response.status_code == 200
+    except requests.RequestException:
+        return False
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker around the engine calls, shared by all workers through the CircuitBreakerState table.
+
+    After failure_threshold consecutive transport failures the circuit opens and calls fail fast
+    with CircuitOpenError. While open, one caller per probe_interval probes the engine /health endpoint
+    (the half-open state); a successful probe or call closes the circuit again.
+    The state is cached in-process for cache_seconds, so a closed circuit costs about one query per second.
+    """
+
+    def __init__(
+        self,
+        name: str = "engine",
+        failure_threshold: int | None = None,
+        probe_interval: float | None = None,
+        cache_seconds: float | None = None,
+        probe: Callable[[], bool] = probe_engine_health,
+    ) -> None:
+        self.name = name
+        self.failure_threshold: int = (
+            failure_threshold or settings.ENGINE_BREAKER_FAILURE_THRESHOLD
+        )
+        self.probe_interval: float = (
+            probe_interval
+            if probe_interval is not None
+            else settings.ENGINE_BREAKER_PROBE_INTERVAL_SECONDS
+        )
+        self.cache_seconds: float = (
+            cache_seconds
+            if cache_seconds is not None
+            else settings.ENGINE_BREAKER_CACHE_SECONDS
+        )
+        self.probe = probe
+        self._cached: CircuitBreakerState | None = None
+        self._cached_at: float = 0.0
+
+    def load(self, fresh: bool = False) -> CircuitBreakerState:
+        if (
+            not fresh
+            and self._cached is not None
+            and monotonic() - self._cached_at < self.cache_seconds
+        ):
+            return self._cached
+        row, _ = CircuitBreakerState.objects.get_or_create(name=self.name)
+        self._cached, self._cached_at = row, monotonic()
+        return row
+
+    @property
+    def state(self) -> str:
+        return str(self.load(fresh=True).state)
+
+    def retry_in(self, row: CircuitBreakerState) -> float:
+        if row.next_probe_at is None:
+            return self.probe_interval
+        delay: float = (row.next_probe_at - timezone.now()).total_seconds()
+        return max(delay, 0.0)
+
+    def before_call(self) -> None:
+        """Raises CircuitOpenError while the circuit is open; probes the engine health when a probe is due."""
+        row = self.load()
+        if row.state == CircuitState.Closed:
+            return
+        row = self.load(fresh=True)
+        if row.state == CircuitState.Closed:
+            return
+
+        now = timezone.now()
+        next_probe_at = now + timedelta(seconds=self.probe_interval)
+        claimed = (
+            CircuitBreakerState.objects.filter(name=self.name)
+            .filter(Q(next_probe_at__isnull=True) | Q(next_probe_at__lte=now))
+            .exclude(state=CircuitState.Closed)
+            .update(state=CircuitState.HalfOpen, next_probe_at=next_probe_at)
+        )
+        if not claimed:  # not due yet or another worker is probing
+            metrics.increment("engine_circuit_rejected_total")
+            raise CircuitOpenError(self.retry_in(row))
+
+        self.transition(row.state, CircuitState.HalfOpen)
+        healthy = self.probe()
+        metrics.increment(
+            "engine_health_probes_total", result="ok" if healthy else "failed"
+        )
+        if healthy:
+            self.close()
+            return
+        CircuitBreakerState.objects.filter(
+            name=self.name, state=CircuitState.HalfOpen
+        ).update(state=CircuitState.Open, changed_at=timezone.now())
+        self.transition(CircuitState.HalfOpen, CircuitState.Open)
+        self.load(fresh=True)
+        metrics.increment("engine_circuit_rejected_total")
+        raise CircuitOpenError(self.probe_interval)
+
+    def record_success(self) -> None:
+        row = self.load()
+        if row.state == CircuitState.Closed and row.failures == 0:
+            return
+        self.close()
+
+    def record_failure(self) -> None:
+        CircuitBreakerState.objects.get_or_create(name=self.name)
+        CircuitBreakerState.objects.filter(name=self.name).update(
+            failures=F("failures") + 1
+        )
+        row = self.load(fresh=True)
+        if row.state != CircuitState.Closed or row.failures < self.failure_threshold:
+            return
+
+        now = timezone.now()
+        opened = CircuitBreakerState.objects.filter(
+            name=self.name, state=CircuitState.Closed
+        ).update(
+            state=CircuitState.Open,
+            opened_at=now,
+            next_probe_at=now + timedelta(seconds=self.probe_interval),
+            changed_at=now,
+        )
+        if opened:
+            logger.error(
+                f"Engine circuit opened after {row.failures} consecutive failures"
+            )
+            self.transition(CircuitState.Closed, CircuitState.Open)
+        self.load(fresh=True)
+
+    def close(self) -> None:
+        previous = self.load(fresh=True).state
+        closed = (
+            CircuitBreakerState.objects.filter(name=self.name)
+            .exclude(state=CircuitState.Closed)
+            .update(
+                state=CircuitState.Closed,
+                failures=0,
+                next_probe_at=None,
+                changed_at=timezone.now(),
+            )
+        )
+        if closed:
+            logger.info("Engine circuit closed, engine is reachable again")
+            self.transition(previous, CircuitState.Closed)
+        else:
+            CircuitBreakerState.objects.filter(name=self.name, failures__gt=0).update(
+                failures=0
+            )
+        self.load(fresh=True)
+
+    def transition(self, source: str, target: str) -> None:
+        metrics.increment(
+            "engine_circuit_transitions_total",
+            source=CircuitState(source).label,
+            target=CircuitState(target).label,
+        )
+        metrics.set_gauge(
+            "engine_circuit_open", 0 if target == CircuitState.Closed else 1
+        )
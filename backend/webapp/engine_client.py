@@ -0,0 +1,359 @@
+import os
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from .circuit_breaker import FAILURE_STATUS_CODES, CircuitBreaker, CircuitOpenError
+
+# feature listed in the engine /health response ({"status": "ok", "features": ["batch"]})
+# by engines that accept several runs per /run_batch and /status_batch call
+BATCH_FEATURE = "batch"
+
+RunKey = tuple[str, int]  # (uuid, seed)
+
+
+class PartialSubmissionError(requests.RequestException):
+    """A submission without batches failed after the engine had accepted the runs in accepted."""
+
+    def __init__(self, message: str, accepted: list[RunKey]) -> None:
+        super().__init__(message)
+        self.accepted = accepted
+
+
+class EngineClient:
+    """
+    HTTP client for the grapharna-engine.
+    All calls go through one requests.Session, so connections to the engine are pooled and kept alive
+    between /run, /status and /cancel calls instead of opening a new TCP connection per request.
+    With a breaker, calls raise CircuitOpenError instead of reaching the engine while it is down.
+    submit_runs and poll_runs handle several runs per call when the engine supports batches.
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        pool_size: int | None = None,
+        connect_timeout: float | None = None,
+        read_timeout: float | None = None,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        self.base_url: str = (base_url or settings.ENGINE_URL).rstrip("/")
+        self.pool_size: int = pool_size or settings.ENGINE_POOL_SIZE
+        self.connect_timeout: float = (
+            connect_timeout
+            if connect_timeout is not None
+            else settings.ENGINE_CONNECT_TIMEOUT_SECONDS
+        )
+        self.read_timeout: float = (
+            read_timeout
+            if read_timeout is not None
+            else settings.ENGINE_READ_TIMEOUT_SECONDS
+        )
+
+        self.breaker = breaker
+        self.batch_supported: bool | None = None  # unknown until the first batch call
+
+        self.session: requests.Session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,  # the engine is a single host
+            pool_maxsize=self.pool_size,
+            max_retries=0,  # retries are handled by the callers
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @property
+    def timeout(self) -> tuple[float, float]:
+        return (self.connect_timeout, self.read_timeout)
+
+    def request(self, method: str, path: str, **kwargs: Any) -> requests.Response:
+        if self.breaker is not None:
+            self.breaker.before_call()
+        try:
+            response = self.session.request(
+                method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs
+            )
+        except requests.RequestException:
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise
+        if self.breaker is not None:
+            if response.status_code in FAILURE_STATUS_CODES:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+        return response
+
+    def run(self, uuid: str, seed: int, **fields: Any) -> requests.Response:
+        return self.request("POST", "/run", data={"uuid": uuid, "seed": seed, **fields})
+
+    def status(self, uuid: str, seed: int) -> requests.Response:
+        return self.request("GET", f"/status/{uuid}", params={"seed": seed})
+
+    def cancel(self, uuid: str) -> requests.Response:
+        return self.request("POST", f"/cancel/{uuid}")
+
+    def health(self) -> requests.Response:
+        return self.request("GET", "/health")
+
+    def run_batch(self, runs: list[RunKey]) -> requests.Response:
+        return self.request("POST", "/run_batch", json=batch_payload(runs))
+
+    def status_batch(self, runs: list[RunKey]) -> requests.Response:
+        return self.request("POST", "/status_batch", json=batch_payload(runs))
+
+    def supports_batch(self) -> bool:
+        """Whether the engine advertises batch support in /health, checked once per client."""
+        if self.batch_supported is None:
+            try:
+                response = self.health()
+                features = response.json().get("features", [])
+            except (requests.RequestException, ValueError, AttributeError):
+                return False  # ask again next time
+            self.batch_supported = response.status_code == 200 and (
+                BATCH_FEATURE in features
+            )
+        return self.batch_supported
+
+    def use_batch(self, runs: list[RunKey]) -> bool:
+        return len(runs) > 1 and self.supports_batch()
+
+    def submit_runs(self, runs: list[RunKey]) -> None:
+        """
+        Starts the runs with one /run_batch call, or with one /run call per run when the engine
+        doesn't support batches. Raises requests.RequestException when the engine rejects the submission,
+        PartialSubmissionError when some of the /run calls were accepted before one failed.
+        """
+        if self.use_batch(runs):
+            response = self.run_batch(runs)
+            if response.status_code not in (404, 405):
+                response.raise_for_status()
+                return
+            self.batch_supported = False  # engine replaced by one without batches
+        accepted: list[RunKey] = []
+        for uuid, seed in runs:
+            try:
+                self.run(uuid, seed).raise_for_status()
+            except (requests.RequestException, CircuitOpenError) as e:
+                if not accepted:
+                    raise
+                raise PartialSubmissionError(str(e), accepted) from e
+            accepted.append((uuid, seed))
+
+    def poll_runs(
+        self, runs: list[RunKey]
+    ) -> dict[RunKey, tuple[int, dict[str, Any], float | None]]:
+        """
+        Status of the runs as (status code, body, retry hint) per run, the same values a /status call
+        returns for it. One /status_batch call, or one /status call per run without batch support.
+        """
+        if self.use_batch(runs):
+            response = self.status_batch(runs)
+            if response.status_code not in (404, 405):
+                response.raise_for_status()
+                return parse_status_batch(response, runs)
+            self.batch_supported = False
+
+        statuses = {}
+        for uuid, seed in runs:
+            response = self.status(uuid, seed)
+            try:
+                body = response.json()
+            except ValueError:
+                body = {"error": response.text}
+            statuses[(uuid, seed)] = (response.status_code, body, retry_after(response))
+        return statuses
+
+    def test(self, **kwargs: Any) -> requests.Response:
+        """Runs the engine self-test synchronously, so the read timeout is the whole engine timeout."""
+        return self.session.post(
+            settings.ENGINE_TEST_URL,
+            timeout=(self.connect_timeout, settings.ENGINE_TIMEOUT_SECONDS),
+            **kwargs,
+        )
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncEngineClient:
+    """
+    asyncio counterpart of EngineClient, used by the engine dispatcher to drive many runs from one process.
+    Connections are pooled by one httpx.AsyncClient, limited to pool_size concurrent connections.
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        pool_size: int | None = None,
+        connect_timeout: float | None = None,
+        read_timeout: float | None = None,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        self.base_url: str = (base_url or settings.ENGINE_URL).rstrip("/")
+        self.pool_size: int = pool_size or settings.ENGINE_POOL_SIZE
+        self.connect_timeout: float = (
+            connect_timeout
+            if connect_timeout is not None
+            else settings.ENGINE_CONNECT_TIMEOUT_SECONDS
+        )
+        self.read_timeout: float = (
+            read_timeout
+            if read_timeout is not None
+            else settings.ENGINE_READ_TIMEOUT_SECONDS
+        )
+
+        self.breaker = breaker
+
+        self.session: httpx.AsyncClient = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size,
+            ),
+            timeout=httpx.Timeout(
+                self.read_timeout, connect=self.connect_timeout, pool=None
+            ),
+        )
+
+    async def request(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        if self.breaker is not None:
+            await sync_to_async(self.breaker.before_call)()
+        try:
+            response = await self.session.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            if self.breaker is not None:
+                await sync_to_async(self.breaker.record_failure)()
+            raise
+        if self.breaker is not None:
+            if response.status_code in FAILURE_STATUS_CODES:
+                await sync_to_async(self.breaker.record_failure)()
+            else:
+                await sync_to_async(self.breaker.record_success)()
+        return response
+
+    async def run(self, uuid: str, seed: int, **fields: Any) -> httpx.Response:
+        return await self.request(
+            "POST", "/run", data={"uuid": uuid, "seed": seed, **fields}
+        )
+
+    async def status(self, uuid: str, seed: int) -> httpx.Response:
+        return await self.request("GET", f"/status/{uuid}", params={"seed": seed})
+
+    async def cancel(self, uuid: str) -> httpx.Response:
+        return await self.request("POST", f"/cancel/{uuid}")
+
+    async def health(self) -> httpx.Response:
+        return await self.request("GET", "/health")
+
+    async def close(self) -> None:
+        await self.session.aclose()
+
+
+def retry_after(response: requests.Response | httpx.Response) -> float | None:
+    """
+    Returns the delay (in seconds) the engine asked for before the next status call, or None.
+    Reads the Retry-After header (seconds or HTTP date) or an "eta" field (seconds left) in the JSON body.
+    """
+    header = response.headers.get("Retry-After")
+    if header:
+        try:
+            return max(float(header), 0.0)
+        except ValueError:
+            pass
+        try:
+            when = parsedate_to_datetime(header)
+        except (TypeError, ValueError):
+            when = None
+        if when is not None:
+            if when.tzinfo is None:
+                when = when.replace(tzinfo=timezone.utc)
+            return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+    try:
+        body = response.json()
+    except ValueError:
+        return None
+    return eta(body)
+
+
+def eta(body: Any) -> float | None:
+    """The "eta" field (seconds left) of a status body."""
+    if isinstance(body, dict) and isinstance(body.get("eta"), (int, float)):
+        return max(float(body["eta"]), 0.0)
+    return None
+
+
+def batch_payload(runs: list[RunKey]) -> dict[str, Any]:
+    return {"runs": [{"uuid": uuid, "seed": seed} for uuid, seed in runs]}
+
+
+def parse_status_batch(
+    response: requests.Response, runs: list[RunKey]
+) -> dict[RunKey, tuple[int, dict[str, Any], float | None]]:
+    """
+    Splits a /status_batch response, {"runs": [{"uuid", "seed", "code", "result"}, ...]}, where code and
+    result are what /status would have returned for the run. A Retry-After header applies to every run.
+    """
+    header_hint = retry_after(response) if response.headers.get("Retry-After") else None
+    statuses: dict[RunKey, tuple[int, dict[str, Any], float | None]] = {}
+    for entry in response.json().get("runs", []):
+        key = (str(entry["uuid"]), int(entry["seed"]))
+        body = entry.get("result") or {}
+        hint = eta(body)
+        statuses[key] = (
+            int(entry["code"]),
+            body,
+            hint if hint is not None else header_hint,
+        )
+    for key in runs:
+        if key not in statuses:
+            statuses[key] = (404, {"error": "Run missing from batch status"}, None)
+    return statuses
+
+
+_client: EngineClient | None = None
+_client_pid: int | None = None
+_client_lock = threading.Lock()
+
+
+def get_engine_client() -> EngineClient:
+    """
+    Returns the engine client of the current process.
+    The client is created on first use and recreated after a fork, so every Celery worker process
+    has its own connection pool (sockets must not be shared between processes).
+    """
+    global _client, _client_pid
+
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            _client = EngineClient(breaker=CircuitBreaker())
+            _client_pid = pid
+        return _client
+
+
+def get_engine_breaker() -> CircuitBreaker:
+    """Circuit breaker of the engine client of the current process."""
+    breaker = get_engine_client().breaker
+    assert breaker is not None
+    return breaker
+
+
+def reset_engine_client() -> None:
+    """Closes and forgets the client of the current process."""
+    global _client, _client_pid
+
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
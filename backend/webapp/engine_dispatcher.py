@@ -0,0 +1,390 @@
+import asyncio
+import logging
+from time import monotonic
+from typing import Any
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from . import metrics
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .engine_client import AsyncEngineClient, retry_after
+from .models import EngineRun, EngineRunStatus
+from .poll_policies import PollPolicy, get_poll_policy
+
+logger = logging.getLogger(__name__)
+
+# the engine is computing as many runs as it can, the run is submitted again later
+REJECTED_STATUS_CODES = (429, 503)
+
+
+class EngineRunError(Exception):
+    """Exception raised when the engine reports an error for a run or can't be reached."""
+
+
+class EngineBusyError(Exception):
+    """Exception raised when the engine rejects a run because it is at capacity."""
+
+    def __init__(self, retry_in: float | None) -> None:
+        self.retry_in = retry_in  # Retry-After of the engine, if any
+        super().__init__("Engine at capacity")
+
+
+class EngineCapacity:
+    """
+    Number of runs the engine accepts at the same time.
+
+    The limit is the capacity the engine advertises in /health ("capacity"), or `maximum` when it
+    advertises none. A 429/503 answer to /run lowers it to the number of runs the engine is computing;
+    refresh_interval after the last rejection every accepted run raises it by one again, so the
+    dispatcher finds out when the engine grows without flooding it.
+    """
+
+    def __init__(self, maximum: int, refresh_interval: float) -> None:
+        self.maximum = maximum
+        self.refresh_interval = refresh_interval
+        self.advertised: int | None = None
+        self.limit: int = maximum
+        self.refreshed_at: float | None = None
+        self.rejected_at: float | None = None
+
+    @property
+    def ceiling(self) -> int:
+        if self.advertised is None:
+            return self.maximum
+        return max(1, min(self.advertised, self.maximum))
+
+    @property
+    def recently_rejected(self) -> bool:
+        return (
+            self.rejected_at is not None
+            and monotonic() - self.rejected_at < self.refresh_interval
+        )
+
+    def refresh_due(self) -> bool:
+        return (
+            self.refreshed_at is None
+            or monotonic() - self.refreshed_at >= self.refresh_interval
+        )
+
+    def advertise(self, capacity: int | None) -> None:
+        self.refreshed_at = monotonic()
+        self.advertised = capacity
+        if self.recently_rejected:
+            self.limit = min(self.limit, self.ceiling)
+        else:
+            self.limit = self.ceiling
+
+    def accepted(self, running: int) -> None:
+        if self.recently_rejected:
+            # answers to concurrent submissions come in any order, the engine holds at least `running`
+            self.limit = max(self.limit, min(running, self.ceiling))
+        else:
+            self.limit = min(self.limit + 1, self.ceiling)
+
+    def rejected(self, running: int) -> None:
+        self.limit = max(1, min(running, self.ceiling))
+        self.rejected_at = monotonic()
+
+
+def claim_runs(limit: int) -> list[EngineRun]:
+    """Marks up to `limit` queued runs (oldest job first) as submitted and returns them."""
+    with transaction.atomic():
+        runs = list(
+            EngineRun.objects.select_for_update(skip_locked=True, of=("self",))
+            .select_related("job")
+            .filter(status=EngineRunStatus.Queued)
+            .order_by("job__created_at", "seed")[:limit]
+        )
+        submitted_at = timezone.now()
+        EngineRun.objects.filter(pk__in=[run.pk for run in runs]).update(
+            status=EngineRunStatus.Submitted, submitted_at=submitted_at
+        )
+    for run in runs:
+        run.status = EngineRunStatus.Submitted
+        run.submitted_at = submitted_at
+    return runs
+
+
+def submitted_runs() -> list[EngineRun]:
+    return list(
+        EngineRun.objects.select_related("job").filter(status=EngineRunStatus.Submitted)
+    )
+
+
+def is_submitted(run_id: int) -> bool:
+    """False once the run stopped being submitted elsewhere (e.g. another conformation failed the job)."""
+    return EngineRun.objects.filter(
+        pk=run_id, status=EngineRunStatus.Submitted
+    ).exists()
+
+
+def hand_off(run_id: int, result: dict[str, Any]) -> bool:
+    """Stores the engine result and queues the post-processing of the run (process_engine_run)."""
+    from .tasks import process_engine_run
+
+    claimed = EngineRun.objects.filter(
+        pk=run_id, status=EngineRunStatus.Submitted
+    ).update(
+        status=EngineRunStatus.Finished,
+        finished_at=timezone.now(),
+        pdb_file_path=result.get("pdbFilePath"),
+        json_file_path=result.get("jsonFilePath"),
+    )
+    if claimed:
+        process_engine_run.delay(run_id)
+    return bool(claimed)
+
+
+def requeue_run(run_id: int) -> None:
+    """Puts a run the engine rejected back in the queue, it keeps its place (job created_at order)."""
+    EngineRun.objects.filter(pk=run_id, status=EngineRunStatus.Submitted).update(
+        status=EngineRunStatus.Queued, submitted_at=None
+    )
+
+
+def fail_run(run_id: int, message: str) -> None:
+    from .tasks import fail_engine_run
+
+    run = EngineRun.objects.select_related("job").get(pk=run_id)
+    if run.status == EngineRunStatus.Submitted:
+        fail_engine_run(run, message)
+
+
+class EngineDispatcher:
+    """
+    Drives the engine runs of the "async" dispatch mode from a single process.
+
+    run_grapharna_task (grapharna queue) only queues the EngineRuns of a job; the dispatcher claims them
+    (oldest job first) and keeps as many /run + /status conversations going at the same time on one event
+    loop as the engine accepts (see EngineCapacity, at most `concurrency`), instead of one blocked worker
+    process per job. Finished runs are handed off to process_engine_run.
+    Only one dispatcher should run per deployment: on start it resumes every run left submitted.
+    While the engine circuit is open no new runs are claimed and the runs in flight wait for the engine.
+    """
+
+    def __init__(
+        self,
+        client: AsyncEngineClient | None = None,
+        concurrency: int | None = None,
+        timeout: float | None = None,
+        poll_policy: PollPolicy | None = None,
+        claim_interval: float | None = None,
+    ) -> None:
+        self.concurrency: int = concurrency or settings.ENGINE_DISPATCHER_CONCURRENCY
+        # status calls are short, ENGINE_POOL_SIZE connections are shared by all runs in flight
+        self.client: AsyncEngineClient = client or AsyncEngineClient(
+            breaker=CircuitBreaker()
+        )
+        self.timeout: float = (
+            timeout if timeout is not None else settings.ENGINE_TIMEOUT_SECONDS
+        )
+        self.poll_policy: PollPolicy = poll_policy or get_poll_policy()
+        self.claim_interval: float = (
+            claim_interval
+            if claim_interval is not None
+            else settings.ENGINE_DISPATCHER_CLAIM_INTERVAL_SECONDS
+        )
+        self.capacity = EngineCapacity(
+            self.concurrency, settings.ENGINE_CAPACITY_REFRESH_SECONDS
+        )
+        self.in_flight: dict[int, asyncio.Task] = {}
+        self.running: set[int] = set()  # runs the engine accepted and is computing
+        self.paused_until: float = 0.0  # Retry-After of the last rejection
+        self.published: tuple[int, int] | None = None
+        self.finished: int = 0
+        self.failed: int = 0
+        self.rejected: int = 0
+
+    async def serve(
+        self, stop: asyncio.Event | None = None, drain: bool = False
+    ) -> None:
+        """
+        Claims queued runs and drives them until `stop` is set.
+        With drain the dispatcher returns as soon as there is nothing queued and nothing in flight.
+        Runs in flight when stopping stay submitted and are resumed by the next dispatcher.
+        """
+        stop = stop or asyncio.Event()
+        for run in await sync_to_async(submitted_runs)():
+            self.start(run, resumed=True)
+
+        try:
+            while not stop.is_set():
+                if self.capacity.refresh_due():
+                    await self.refresh_capacity()
+                free = self.capacity.limit - len(self.in_flight)
+                if (
+                    free > 0
+                    and monotonic() >= self.paused_until
+                    and await sync_to_async(self.engine_available)()
+                ):
+                    for run in await sync_to_async(claim_runs)(free):
+                        self.start(run)
+                await sync_to_async(self.publish_metrics)()
+                if drain and not self.in_flight:
+                    break
+
+                stop_waiter = asyncio.ensure_future(stop.wait())
+                await asyncio.wait(
+                    [stop_waiter, *self.in_flight.values()],
+                    timeout=self.claim_interval,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                stop_waiter.cancel()
+        finally:
+            tasks = list(self.in_flight.values())
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def refresh_capacity(self) -> None:
+        """Reads the capacity the engine advertises in /health."""
+        capacity = self.capacity.advertised
+        try:
+            response = await self.client.health()
+            advertised = response.json().get("capacity")
+            capacity = advertised if isinstance(advertised, int) else None
+        except (httpx.HTTPError, CircuitOpenError, ValueError, AttributeError) as e:
+            logger.warning(f"Failed to read engine capacity: {e}")
+        self.capacity.advertise(capacity)
+
+    def publish_metrics(self) -> None:
+        values = (len(self.running), self.capacity.limit)
+        if values == self.published:
+            return
+        self.published = values
+        running, limit = values
+        metrics.set_gauge("engine_runs_in_flight", running)
+        metrics.set_gauge("engine_capacity", limit)
+        metrics.set_gauge("engine_utilization", running / limit)
+
+    def engine_available(self) -> bool:
+        if self.client.breaker is None:
+            return True
+        try:
+            self.client.breaker.before_call()
+        except CircuitOpenError:
+            return False
+        return True
+
+    def start(self, run: EngineRun, resumed: bool = False) -> None:
+        task = asyncio.create_task(self.drive(run, resumed))
+        self.in_flight[run.pk] = task
+        task.add_done_callback(lambda _: self.in_flight.pop(run.pk, None))
+
+    async def cancel(self, run: EngineRun) -> None:
+        """Stops driving the run and cancels it on the engine."""
+        task = self.in_flight.pop(run.pk, None)
+        if task is not None:
+            task.cancel()
+        await self.cancel_on_engine(run)
+
+    async def cancel_on_engine(self, run: EngineRun) -> None:
+        try:
+            await self.client.cancel(str(run.job.uid))
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            logger.error(f"Failed to cancel engine request: {e}")
+
+    async def drive(self, run: EngineRun, resumed: bool = False) -> None:
+        elapsed = (timezone.now() - run.submitted_at).total_seconds()
+        try:
+            async with asyncio.timeout(max(self.timeout - elapsed, 0)):
+                result = await self.converse(run, resumed)
+            if result is not None and await sync_to_async(hand_off)(run.pk, result):
+                self.finished += 1
+        except TimeoutError:
+            await self.cancel_on_engine(run)
+            await sync_to_async(fail_run)(run.pk, "Engine operation timed out")
+            self.failed += 1
+            return
+        except EngineRunError as e:
+            await sync_to_async(fail_run)(run.pk, str(e))
+            self.failed += 1
+            return
+        except EngineBusyError as e:
+            self.capacity.rejected(len(self.running))
+            self.paused_until = max(
+                self.paused_until, monotonic() + (e.retry_in or self.claim_interval)
+            )
+            await sync_to_async(requeue_run)(run.pk)
+            await sync_to_async(metrics.increment)("engine_run_rejections_total")
+            self.rejected += 1
+            return
+        except Exception as e:  # e.g. a body that isn't JSON or a database error
+            logger.exception(f"Failed to drive {run}: {e}")
+            try:
+                await sync_to_async(fail_run)(run.pk, f"Engine run failed: {e}")
+            except Exception:
+                logger.exception(f"Failed to record the failure of {run}")
+            self.failed += 1
+            return
+        finally:
+            self.running.discard(run.pk)
+
+    async def converse(
+        self, run: EngineRun, resumed: bool = False
+    ) -> dict[str, Any] | None:
+        """Submits the run (unless resumed) and polls it until the engine returns the result."""
+        uuid = str(run.job.uid)
+        max_retries = settings.ENGINE_REQUEST_MAX_RETRIES
+
+        retries = 0
+        while not resumed:
+            try:
+                response = await self.client.run(uuid, run.seed)
+                if response.status_code in REJECTED_STATUS_CODES:
+                    raise EngineBusyError(retry_after(response))
+                response.raise_for_status()
+                self.running.add(run.pk)
+                self.capacity.accepted(len(self.running))
+                break
+            except CircuitOpenError as e:
+                await asyncio.sleep(max(e.retry_in, self.claim_interval))
+            except httpx.HTTPError as e:
+                retries += 1
+                if retries >= max_retries:
+                    raise EngineRunError(f"Failed to contact engine: {e}")
+                logger.warning(f"Engine request failed for {run}, retrying. Error: {e}")
+                await asyncio.sleep(settings.ENGINE_REQUEST_RETRY_DELAY)
+
+        self.running.add(run.pk)  # resumed runs weren't submitted here
+        polls = run.polls
+        retries = 0
+        while True:
+            status_resp: httpx.Response | None
+            hint: float | None = None
+            try:
+                status_resp = await self.client.status(uuid, run.seed)
+            except CircuitOpenError as e:
+                status_resp = None
+                hint = e.retry_in
+            except httpx.HTTPError as e:
+                retries += 1
+                if retries >= max_retries:
+                    raise EngineRunError(
+                        f"Max retries reached while polling engine status: {e}"
+                    )
+                status_resp = None
+
+            if status_resp is not None and status_resp.status_code == 200:
+                result: dict[str, Any] = status_resp.json()
+                return result
+            if status_resp is not None and status_resp.status_code not in (
+                202,
+                *REJECTED_STATUS_CODES,  # status calls are throttled, not the run
+            ):
+                raise EngineRunError(
+                    f"Engine reported error: {status_resp.status_code} {status_resp.text}"
+                )
+
+            if status_resp is not None:
+                hint = retry_after(status_resp)
+            delay = self.poll_policy.next_delay(polls, hint)
+            if not await sync_to_async(is_submitted)(run.pk):
+                return None  # the job failed or was cancelled meanwhile
+            polls += 1
+            await asyncio.sleep(delay)
+
+    async def close(self) -> None:
+        await self.client.close()
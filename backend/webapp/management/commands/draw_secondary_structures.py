@@ -0,0 +1,57 @@
+import os
+from typing import Any
+from django.core.management.base import BaseCommand, CommandParser
+from webapp.models import JobResults
+from webapp.tasks import draw_secondary_structures
+
+
+class Command(BaseCommand):
+    help = (
+        "Draws the missing VARNA graphs of completed jobs (or all of them with --redraw), "
+        "many jobs per VARNA start."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--redraw",
+            action="store_true",
+            help="draw every VARNA graph again, e.g. after a VARNA upgrade",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="diagrams drawn per VARNA start",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        results = (
+            JobResults.objects.filter(job__status="C")
+            .exclude(result_secondary_structure_svg="")
+            .order_by("pk")
+        )
+        batch: list[JobResults] = []
+        removed: set[str] = set()  # diagrams in the render cache are shared by results
+        drawn = 0
+        for result in results.iterator():
+            if options["redraw"]:
+                path = result.result_secondary_structure_svg.path
+                if path not in removed and os.path.exists(path):
+                    os.remove(path)
+                removed.add(path)
+            batch.append(result)
+            if len(batch) >= options["batch_size"]:
+                drawn += self.draw(batch)
+                batch = []
+        drawn += self.draw(batch)
+        self.stdout.write(f"Drew {drawn} VARNA graphs")
+
+    def draw(self, batch: list[JobResults]) -> int:
+        missing = [
+            result
+            for result in batch
+            if not os.path.exists(result.result_secondary_structure_svg.path)
+        ]
+        if missing:
+            draw_secondary_structures(missing)
+        return len(missing)
@@ -0,0 +1,38 @@
+import asyncio
+import signal
+from typing import Any
+from django.core.management.base import BaseCommand, CommandParser
+from webapp.engine_dispatcher import EngineDispatcher
+
+
+class Command(BaseCommand):
+    help = 'Drives the engine runs of the "async" dispatch mode (ENGINE_DISPATCH_MODE=async) until stopped.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=None,
+            help="max number of engine runs in flight (ENGINE_DISPATCHER_CONCURRENCY by default)",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        asyncio.run(self.serve(options["concurrency"]))
+
+    async def serve(self, concurrency: int | None) -> None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        dispatcher = EngineDispatcher(concurrency=concurrency)
+        self.stdout.write(
+            f"Engine dispatcher started (concurrency {dispatcher.concurrency})"
+        )
+        try:
+            await dispatcher.serve(stop)
+        finally:
+            await dispatcher.close()
+        self.stdout.write(
+            f"Engine dispatcher stopped: {dispatcher.finished} runs finished, {dispatcher.failed} failed"
+        )
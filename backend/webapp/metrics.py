@@ -0,0 +1,126 @@
+import threading
+from collections import defaultdict
+from time import monotonic
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import Metric, MetricKind
+
+# updates not written to the database yet, kept by each process: (name, labels) -> value
+_pending_counters: dict[tuple[str, str], float] = defaultdict(float)
+_pending_gauges: dict[tuple[str, str], float] = {}
+_pending_lock = threading.Lock()
+_flushed_at = monotonic()
+
+
+def format_labels(labels: dict[str, object]) -> str:
+    """Prometheus label set without braces, sorted by name: a="1",b="2"."""
+    return ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+
+
+def increment(name: str, amount: float = 1, **labels: object) -> None:
+    """Adds amount to a counter shared by all processes (written by flush)."""
+    with _pending_lock:
+        _pending_counters[(name, format_labels(labels))] += amount
+    flush_if_due()
+
+
+def set_gauge(name: str, value: float, **labels: object) -> None:
+    with _pending_lock:
+        _pending_gauges[(name, format_labels(labels))] = value
+    flush_if_due()
+
+
+def flush_if_due() -> None:
+    if monotonic() - _flushed_at >= settings.METRICS_FLUSH_SECONDS:
+        flush()
+
+
+def flush() -> None:
+    """Writes the updates buffered by this process in one transaction."""
+    global _flushed_at
+    with _pending_lock:
+        counters = dict(_pending_counters)
+        gauges = dict(_pending_gauges)
+        _pending_counters.clear()
+        _pending_gauges.clear()
+        _flushed_at = monotonic()
+    if not counters and not gauges:
+        return
+    try:
+        with transaction.atomic():
+            for (name, labels), amount in counters.items():
+                _add_to_counter(name, labels, amount)
+            for (name, labels), value in gauges.items():
+                Metric.objects.update_or_create(
+                    name=name,
+                    labels=labels,
+                    defaults={"kind": MetricKind.Gauge, "value": value},
+                )
+    except Exception:
+        # kept for the next flush, gauges set meanwhile are newer
+        with _pending_lock:
+            for key, amount in counters.items():
+                _pending_counters[key] += amount
+            for key, value in gauges.items():
+                _pending_gauges.setdefault(key, value)
+        raise
+
+
+def reset() -> None:
+    """Drops the buffered updates (tests)."""
+    with _pending_lock:
+        _pending_counters.clear()
+        _pending_gauges.clear()
+
+
+def _add_to_counter(name: str, labels: str, amount: float) -> None:
+    if Metric.objects.filter(name=name, labels=labels).update(
+        value=F("value") + amount
+    ):
+        return
+    try:
+        with transaction.atomic():
+            Metric.objects.create(
+                name=name, labels=labels, kind=MetricKind.Counter, value=amount
+            )
+    except IntegrityError:  # created by another process meanwhile
+        Metric.objects.filter(name=name, labels=labels).update(
+            value=F("value") + amount
+        )
+
+
+def observe(name: str, value: float, **labels: object) -> None:
+    """Records one observation as a <name>_count and <name>_sum counter pair (Prometheus summary without quantiles)."""
+    increment(f"{name}_count", 1, **labels)
+    increment(f"{name}_sum", value, **labels)
+
+
+def get_value(name: str, **labels: object) -> float:
+    """Value written to the database, with the updates buffered by this process."""
+    key = (name, format_labels(labels))
+    with _pending_lock:
+        if key in _pending_gauges:
+            return _pending_gauges[key]
+        pending = _pending_counters.get(key, 0.0)
+    metric = Metric.objects.filter(name=name, labels=key[1]).first()
+    return (metric.value if metric is not None else 0.0) + pending
+
+
+def render_prometheus() -> str:
+    """
+    All metrics in the Prometheus text exposition format. Updates still buffered by other processes
+    show up with their next flush.
+    """
+    flush()
+    metrics: dict[str, list[Metric]] = defaultdict(list)
+    for metric in Metric.objects.order_by("name", "labels"):
+        metrics[metric.name].append(metric)
+
+    lines: list[str] = []
+    for name, samples in metrics.items():
+        lines.append(f"# TYPE {name} {samples[0].kind}")
+        for sample in samples:
+            labels = f"{{{sample.labels}}}" if sample.labels else ""
+            lines.append(f"{name}{labels} {sample.value!r}")
+    return "\n".join(lines) + "\n"
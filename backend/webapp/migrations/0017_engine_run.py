@@ -0,0 +1,60 @@
+# Generated by Django 5.2.12 on 2026-10-18 07:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("webapp", "0016_job_finished_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EngineRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("seed", models.IntegerField()),
+                (
+                    "status",
+                    models.TextField(
+                        choices=[
+                            ("P", "Pending"),
+                            ("S", "Submitted"),
+                            ("F", "Finished"),
+                            ("C", "Completed"),
+                            ("E", "Error"),
+                        ],
+                        default="P",
+                    ),
+                ),
+                ("submitted_at", models.DateTimeField(null=True)),
+                ("finished_at", models.DateTimeField(null=True)),
+                ("pdb_file_path", models.CharField(max_length=512, null=True)),
+                ("json_file_path", models.CharField(max_length=512, null=True)),
+                ("error", models.TextField(blank=True, null=True)),
+                (
+                    "job",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="webapp.job"
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("job", "seed"), name="unique_job_seed_run"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.12 on 2026-10-18 07:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("webapp", "0017_engine_run"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="enginerun",
+            name="polls",
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.12 on 2026-10-18 07:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("webapp", "0018_engine_run_polls"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="jobresults",
+            name="seed",
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name="enginerun",
+            name="status",
+            field=models.TextField(
+                choices=[
+                    ("P", "Pending"),
+                    ("Q", "Queued"),
+                    ("S", "Submitted"),
+                    ("F", "Finished"),
+                    ("C", "Completed"),
+                    ("E", "Error"),
+                ],
+                default="P",
+            ),
+        ),
+    ]
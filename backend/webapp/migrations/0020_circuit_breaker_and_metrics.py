@@ -0,0 +1,66 @@
+# Generated by Django 5.2.12 on 2026-10-18 07:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("webapp", "0019_job_results_seed"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CircuitBreakerState",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                (
+                    "state",
+                    models.TextField(
+                        choices=[("C", "Closed"), ("O", "Open"), ("H", "Half-open")],
+                        default="C",
+                    ),
+                ),
+                ("failures", models.IntegerField(default=0)),
+                ("opened_at", models.DateTimeField(null=True)),
+                ("next_probe_at", models.DateTimeField(null=True)),
+                ("changed_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Metric",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=128)),
+                ("labels", models.CharField(blank=True, default="", max_length=255)),
+                (
+                    "kind",
+                    models.TextField(
+                        choices=[("counter", "Counter"), ("gauge", "Gauge")],
+                        default="counter",
+                    ),
+                ),
+                ("value", models.FloatField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("name", "labels"), name="unique_metric_labels"
+                    )
+                ],
+            },
+        ),
+    ]
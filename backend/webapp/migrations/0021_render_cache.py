@@ -0,0 +1,25 @@
+# Generated by Django 5.2.12 on 2026-10-18 08:39
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("webapp", "0020_circuit_breaker_and_metrics"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RenderedDiagram",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+                ("references", models.IntegerField(default=0)),
+                ("used_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
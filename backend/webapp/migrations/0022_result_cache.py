@@ -0,0 +1,23 @@
+# Generated by Django 5.2.12 on 2026-10-18 08:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("webapp", "0021_render_cache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="use_result_cache",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name="jobresults",
+            name="cache_key",
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.12 on 2026-10-18 09:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("webapp", "0022_result_cache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="diagrams_requested_at",
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.12 on 2026-10-18 09:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("webapp", "0023_job_diagrams_requested_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="jobresults",
+            name="error",
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
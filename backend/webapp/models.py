@@ -2,7 +2,8 @@ import os
 from typing import Any, Dict, Tuple
 import uuid
 from datetime import timedelta, datetime
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.utils import timezone
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -55,6 +56,10 @@ class Job(models.Model):
             ),
         ]
     )
+    # conformations computed before for the same structure and seed are reused (webapp/result_cache.py)
+    use_result_cache: models.BooleanField = models.BooleanField(default=True)
+    # when drawing of the missing diagrams was queued (DIAGRAM_RENDERING="lazy"), cleared once they are drawn
+    diagrams_requested_at: models.DateTimeField = models.DateTimeField(null=True)
 
     def __str__(self) -> str:
         return str(self.job_name)
@@ -72,7 +77,7 @@ class ExampleStructures(models.Model):
 
 
 class JobResults(models.Model):
-    job: models.ForeignKey = models.ForeignKey(Job, on_delete=models.CASCADE)
+    job: models.ForeignKey[Job, Job] = models.ForeignKey(Job, on_delete=models.CASCADE)
     completed_at: models.DateTimeField = models.DateTimeField(
         default=timezone.now, null=True
     )
@@ -95,6 +100,14 @@ class JobResults(models.Model):
         ],
     )
     processing_time: models.DurationField = models.DurationField(null=True)
+    seed: models.IntegerField = models.IntegerField(null=True)
+    # hash of the input structure, seed and model (webapp/result_cache.py)
+    cache_key: models.CharField = models.CharField(
+        max_length=64, null=True, blank=True, db_index=True
+    )
+    # why a stage of the post-processing (webapp/tasks.py PostProcessingPipeline) or the scoring failed, the
+    # row of a conformation whose post-processing failed has no files
+    error: models.TextField = models.TextField(null=True, blank=True)
 
     def __str__(self) -> str:
         return str(self.result_tertiary_structure)
@@ -109,10 +122,134 @@ class JobResults(models.Model):
             self.result_secondary_structure_dotseq.path
         ):
             self.result_secondary_structure_dotseq.delete(save=False)
-        if self.result_secondary_structure_svg and os.path.isfile(
-            self.result_secondary_structure_svg.path
-        ):
-            self.result_secondary_structure_svg.delete(save=False)
-        if self.result_arc_diagram and os.path.isfile(self.result_arc_diagram.path):
-            self.result_arc_diagram.delete(save=False)
+        for diagram in (self.result_secondary_structure_svg, self.result_arc_diagram):
+            if diagram and RenderedDiagram.is_cached(diagram.name):
+                RenderedDiagram.release(diagram.name)  # shared with other results
+            elif diagram and os.path.isfile(diagram.path):
+                diagram.delete(save=False)
         return super().delete(*args, **kwargs)
+
+
+RENDER_CACHE_DIR = "render_cache"
+
+
+class RenderedDiagram(models.Model):
+    """
+    Diagram in the render cache (RENDER_CACHE_DIR under MEDIA_ROOT), shared by all results with the same
+    structures. references counts the JobResults pointing at it, unreferenced diagrams are removed by
+    delete_expired_jobs.
+    """
+
+    name: models.CharField = models.CharField(max_length=255, primary_key=True)
+    references: models.IntegerField = models.IntegerField(default=0)
+    used_at: models.DateTimeField = models.DateTimeField(default=timezone.now)
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.references} references)"
+
+    @staticmethod
+    def is_cached(name: str) -> bool:
+        return name.startswith(RENDER_CACHE_DIR + "/")
+
+    @classmethod
+    def acquire(cls, name: str) -> None:
+        updates = {"references": F("references") + 1, "used_at": timezone.now()}
+        if cls.objects.filter(name=name).update(**updates):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(name=name, references=1)
+        except IntegrityError:  # created by another process meanwhile
+            cls.objects.filter(name=name).update(**updates)
+
+    @classmethod
+    def release(cls, name: str) -> None:
+        cls.objects.filter(name=name).update(
+            references=F("references") - 1, used_at=timezone.now()
+        )
+
+
+class EngineRunStatus(models.TextChoices):
+    Pending = "P", "Pending"
+    Queued = "Q", "Queued"  # submit task enqueued, engine not contacted yet
+    Submitted = "S", "Submitted"
+    Finished = "F", "Finished"  # engine finished, output not processed yet
+    Completed = "C", "Completed"
+    Error = "E", "Error"
+
+
+class EngineRun(models.Model):
+    """
+    Engine run of a single conformation (job, seed). In the non-blocking dispatch modes progress of the job is
+    persisted here, so every step runs as a short, separate task; in the blocking mode it lets a redelivered
+    run_grapharna_task resume the job.
+    """
+
+    job: models.ForeignKey[Job, Job] = models.ForeignKey(Job, on_delete=models.CASCADE)
+    seed: models.IntegerField = models.IntegerField()
+    status: models.TextField = models.TextField(
+        choices=EngineRunStatus, default=EngineRunStatus.Pending
+    )
+    submitted_at: models.DateTimeField = models.DateTimeField(null=True)
+    finished_at: models.DateTimeField = models.DateTimeField(null=True)
+    polls: models.IntegerField = models.IntegerField(default=0)
+    pdb_file_path: models.CharField = models.CharField(max_length=512, null=True)
+    json_file_path: models.CharField = models.CharField(max_length=512, null=True)
+    error: models.TextField = models.TextField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["job", "seed"], name="unique_job_seed_run")
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.job} (seed {self.seed})"
+
+
+class CircuitState(models.TextChoices):
+    Closed = "C", "Closed"
+    Open = "O", "Open"
+    HalfOpen = "H", "Half-open"  # health probe in progress
+
+
+class CircuitBreakerState(models.Model):
+    """State of a circuit breaker, kept in the database so every worker process sees the same circuit."""
+
+    name: models.CharField = models.CharField(max_length=64, primary_key=True)
+    state: models.TextField = models.TextField(
+        choices=CircuitState, default=CircuitState.Closed
+    )
+    failures: models.IntegerField = models.IntegerField(default=0)
+    opened_at: models.DateTimeField = models.DateTimeField(null=True)
+    next_probe_at: models.DateTimeField = models.DateTimeField(null=True)
+    changed_at: models.DateTimeField = models.DateTimeField(default=timezone.now)
+
+    def __str__(self) -> str:
+        return f"{self.name} ({CircuitState(self.state).label})"
+
+
+class MetricKind(models.TextChoices):
+    Counter = "counter", "Counter"
+    Gauge = "gauge", "Gauge"
+
+
+class Metric(models.Model):
+    """Value of a counter or gauge shared by all processes, exported by the /api/metrics/ endpoint."""
+
+    name: models.CharField = models.CharField(max_length=128)
+    labels: models.CharField = models.CharField(max_length=255, blank=True, default="")
+    kind: models.TextField = models.TextField(
+        choices=MetricKind, default=MetricKind.Counter
+    )
+    value: models.FloatField = models.FloatField(default=0)
+    updated_at: models.DateTimeField = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "labels"], name="unique_metric_labels"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.name}{{{self.labels}}}"
@@ -0,0 +1,76 @@
+import abc
+import math
+import random
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class PollPolicy(abc.ABC):
+    """
+    Decides how long to wait before the next engine status call.
+    attempt - number of status calls already made for the run (0 before the first wait)
+    hint - delay suggested by the engine (Retry-After header or progress estimate), None if absent
+    """
+
+    @abc.abstractmethod
+    def next_delay(self, attempt: int, hint: float | None = None) -> float: ...
+
+
+class FixedIntervalPolicy(PollPolicy):
+    """Polls every `interval` seconds regardless of the engine hints (the original behaviour)."""
+
+    def __init__(self, interval: float | None = None) -> None:
+        self.interval: float = (
+            interval if interval is not None else settings.ENGINE_POLL_INTERVAL_SECONDS
+        )
+
+    def next_delay(self, attempt: int, hint: float | None = None) -> float:
+        return self.interval
+
+
+class ExponentialBackoffPolicy(PollPolicy):
+    """
+    Starts polling fast and grows the delay exponentially up to a cap, with random jitter so runs
+    submitted together don't poll in lockstep. A hint from the engine replaces the computed delay.
+    """
+
+    def __init__(
+        self,
+        initial: float | None = None,
+        factor: float | None = None,
+        max_delay: float | None = None,
+        jitter: float | None = None,
+    ) -> None:
+        self.initial: float = (
+            initial if initial is not None else settings.ENGINE_POLL_INITIAL_SECONDS
+        )
+        self.factor: float = (
+            factor if factor is not None else settings.ENGINE_POLL_BACKOFF_FACTOR
+        )
+        self.max_delay: float = (
+            max_delay if max_delay is not None else settings.ENGINE_POLL_MAX_SECONDS
+        )
+        self.jitter: float = (
+            jitter if jitter is not None else settings.ENGINE_POLL_JITTER
+        )
+        # the exponent at which the delay reaches max_delay, a larger one would only overflow the power
+        self.max_exponent: int = 0
+        if self.factor > 1 and 0 < self.initial < self.max_delay:
+            self.max_exponent = math.ceil(
+                math.log(self.max_delay / self.initial, self.factor)
+            )
+
+    def next_delay(self, attempt: int, hint: float | None = None) -> float:
+        if hint is not None:
+            return min(max(hint, 0.0), self.max_delay)
+        exponent = min(attempt, self.max_exponent) if self.factor > 1 else attempt
+        delay = min(self.initial * self.factor**exponent, self.max_delay)
+        delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        return min(max(delay, 0.0), self.max_delay)
+
+
+def get_poll_policy() -> PollPolicy:
+    """Instantiates the policy class named by the ENGINE_POLL_POLICY setting (dotted path)."""
+    policy_class = import_string(settings.ENGINE_POLL_POLICY)
+    policy: PollPolicy = policy_class()
+    return policy
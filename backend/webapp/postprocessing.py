@@ -0,0 +1,47 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from django.conf import settings
+
+_pool: Executor | None = None
+_pool_pid: int | None = None
+_pool_lock = threading.Lock()
+
+
+def get_postprocessing_pool() -> Executor | None:
+    """
+    Pool post-processing conformations next to the engine runs of the current process (created on first
+    use and after a fork, like the engine client), or None when ENGINE_POSTPROCESSING_WORKERS is 0.
+
+    Processes are forked from the worker, so they share its settings. Daemonic processes (celery prefork
+    children) can't have children of their own, there the pool is made of threads, which still overlaps
+    post-processing with the engine runs the task is waiting for.
+    """
+    global _pool, _pool_pid
+
+    workers = settings.ENGINE_POSTPROCESSING_WORKERS
+    if workers <= 0:
+        return None
+    pid = os.getpid()
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            if multiprocessing.current_process().daemon:
+                _pool = ThreadPoolExecutor(workers, "postprocessing")
+            else:
+                _pool = ProcessPoolExecutor(
+                    workers, mp_context=multiprocessing.get_context("fork")
+                )
+            _pool_pid = pid
+        return _pool
+
+
+def reset_postprocessing_pool() -> None:
+    """Shuts down and forgets the post-processing pool of the current process."""
+    global _pool, _pool_pid
+
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(cancel_futures=True)
+        _pool = None
+        _pool_pid = None
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import FileField
+from django.utils import timezone
+from . import metrics
+from .models import RENDER_CACHE_DIR, JobResults, RenderedDiagram
+
+# unreferenced diagrams are kept this long, a job that just found one in the cache references it
+# once its conformation is saved
+PRUNE_GRACE = timedelta(days=1)
+
+
+def normalized_structure(dotseq_path: str) -> str:
+    """Sequence and dot-bracket of a .dotseq file the way the diagrams read them (no strand breaks, no header)."""
+    with open(dotseq_path) as f:
+        lines = f.read().split("\n")
+    sequence, structure = (
+        line.strip().replace(" ", "").replace("-", "") for line in lines[1:3]
+    )
+    return f"{sequence.upper()}\n{structure}"
+
+
+def cached_diagram_path(kind: str, dotseq_paths: list[str]) -> str:
+    """
+    Path of the diagram of the given structures in the render cache: a hash of the normalized structures
+    (for arc diagrams the reference and the model) and of the render settings, so a setting change doesn't
+    serve old diagrams.
+    """
+    options = [kind, str(settings.SVG_COORDINATE_PRECISION)]
+    if kind == "arc":
+        options.append(settings.ARC_DIAGRAM_RENDERER)
+    content = "\n".join(options + [normalized_structure(p) for p in dotseq_paths])
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return os.path.join(settings.MEDIA_ROOT, RENDER_CACHE_DIR, f"{kind}-{digest}.svg")
+
+
+def temporary_path(path: str) -> str:
+    """Where a diagram is drawn before it is moved into the cache, so nobody reads half of it."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return f"{path}.{uuid.uuid4().hex}.tmp.svg"
+
+
+def record_lookup(kind: str, hit: bool) -> None:
+    """Counts a lookup and updates the hit rate of the kind of diagram (varna or arc)."""
+    metrics.increment(
+        "render_cache_lookups_total", kind=kind, result="hit" if hit else "miss"
+    )
+    hits = metrics.get_value("render_cache_lookups_total", kind=kind, result="hit")
+    misses = metrics.get_value("render_cache_lookups_total", kind=kind, result="miss")
+    metrics.set_gauge("render_cache_hit_rate", hits / (hits + misses), kind=kind)
+
+
+def use_cached_diagram(result: JobResults, field: str, path: str) -> None:
+    """Points the result at a diagram in the cache and references it."""
+    name = os.path.relpath(path, settings.MEDIA_ROOT)
+    diagram: FileField = getattr(result, field)
+    if diagram.name == name:
+        return
+    if diagram and RenderedDiagram.is_cached(diagram.name):
+        RenderedDiagram.release(diagram.name)
+    RenderedDiagram.acquire(name)
+    setattr(result, field, name)
+    result.save(update_fields=[field])
+
+
+def prune_render_cache() -> int:
+    """Removes the diagrams no result has referenced for PRUNE_GRACE, returns how many."""
+    cutoff = timezone.now() - PRUNE_GRACE
+    removed = 0
+    for name in RenderedDiagram.objects.filter(
+        references__lte=0, used_at__lt=cutoff
+    ).values_list("name", flat=True):
+        # only when it is still unreferenced, a job may have picked it up meanwhile
+        if RenderedDiagram.objects.filter(name=name, references__lte=0).delete()[0]:
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            if os.path.isfile(path):
+                os.remove(path)
+            removed += 1
+
+    # drawn but never referenced (the job failed before saving its results)
+    directory = os.path.join(settings.MEDIA_ROOT, RENDER_CACHE_DIR)
+    if os.path.isdir(directory):
+        known = set(RenderedDiagram.objects.values_list("name", flat=True))
+        for entry in os.scandir(directory):
+            name = f"{RENDER_CACHE_DIR}/{entry.name}"
+            if (
+                name not in known
+                and entry.is_file()
+                and entry.stat().st_mtime < cutoff.timestamp()
+            ):
+                os.remove(entry.path)
+                removed += 1
+    return removed
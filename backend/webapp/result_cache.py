@@ -0,0 +1,104 @@
+import hashlib
+import os
+import shutil
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from . import metrics
+from .models import Job, JobResults, RenderedDiagram
+
+RESULT_FILE_FIELDS = (
+    "result_tertiary_structure",
+    "result_secondary_structure_dotseq",
+    "result_secondary_structure_svg",
+    "result_arc_diagram",
+)
+
+
+def result_key(job_data: Job, seed: int) -> str:
+    """
+    Key of a conformation in the result cache. The engine is seeded, so the same validated structure (with the
+    same strand separator), seed and model always give the same result.
+    """
+    with open(job_data.input_structure.path, "rb") as f:
+        lines = f.read().decode("utf-8").split("\n")
+    # finalize_job writes the strand separator in place of the spaces, the job name (header) doesn't matter
+    sequence, structure = (line.strip().replace("-", " ") for line in lines[1:3])
+    content = "\n".join(
+        [
+            sequence,
+            structure,
+            job_data.strand_separator,
+            str(seed),
+            str(settings.MODEL_NAME),
+            str(settings.EPOCHS),
+        ]
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def find_memoized_result(key: str, job_data: Job) -> JobResults | None:
+    """The latest conformation of another completed job with the key."""
+    return (
+        JobResults.objects.filter(cache_key=key, job__status="C")
+        .exclude(job=job_data)
+        .select_related("job")
+        .order_by("-completed_at")
+        .first()
+    )
+
+
+def record_result_lookup(hit: bool) -> None:
+    metrics.increment("result_cache_lookups_total", result="hit" if hit else "miss")
+    hits = metrics.get_value("result_cache_lookups_total", result="hit")
+    misses = metrics.get_value("result_cache_lookups_total", result="miss")
+    metrics.set_gauge("result_cache_hit_rate", hits / (hits + misses))
+
+
+def clone_name(name: str, source: JobResults, job_data: Job, seed: int) -> str:
+    """Name of a result file of source for the conformation of the job: <uid>_<seed>... like engine outputs."""
+    directory, base = os.path.split(name)
+    prefix = f"{source.job.uid}_{source.seed}"
+    if base.startswith(prefix):
+        base = base[len(prefix) :]
+    else:
+        base = f"_{base}"
+    return os.path.join(directory, f"{job_data.uid}_{seed}{base}")
+
+
+def clone_result(source: JobResults, job_data: Job, seed: int, key: str) -> JobResults:
+    """
+    JobResults row of the conformation of the job with the files of source, without running the engine:
+    diagrams in the render cache are referenced, the other files are hard-linked (copied when the link
+    fails) under names of the new job, so deleting either job leaves the other one intact.
+    A missing VARNA graph is drawn when the job is finalized.
+    """
+    start = timezone.now()
+    names: dict[str, str] = {}
+    with transaction.atomic():
+        for field in RESULT_FILE_FIELDS:
+            file = getattr(source, field)
+            if not file:
+                continue
+            if RenderedDiagram.is_cached(file.name):
+                RenderedDiagram.acquire(file.name)
+                names[field] = file.name
+                continue
+            names[field] = clone_name(file.name, source, job_data, seed)
+            path = os.path.join(settings.MEDIA_ROOT, names[field])
+            if os.path.exists(file.path) and not os.path.exists(path):
+                try:
+                    os.link(file.path, path)
+                except OSError:
+                    shutil.copyfile(file.path, path)
+        end = timezone.now()
+        return JobResults.objects.create(
+            job=job_data,
+            seed=seed,
+            completed_at=end,
+            processing_time=end - start,
+            f1=source.f1,
+            inf=source.inf,
+            cache_key=key,
+            **names,
+        )
@@ -0,0 +1,257 @@
+import functools
+import os
+import re
+import tempfile
+from collections import Counter
+from html import escape
+from xml.etree.ElementTree import Element, iterparse
+
+SVG_NS = "http://www.w3.org/2000/svg"
+XLINK_NS = "http://www.w3.org/1999/xlink"
+NAMESPACES = {  # namespaces kept in the output, everything else (metadata) is dropped
+    SVG_NS: "",
+    XLINK_NS: "xlink:",
+    "http://www.w3.org/XML/1998/namespace": "xml:",
+}
+# attributes holding coordinates or lengths, their numbers are rounded (not transforms, a rounded
+# scale factor moves everything under it)
+NUMERIC_ATTRIBUTES = {
+    "x", "y", "x1", "y1", "x2", "y2", "cx", "cy", "r", "rx", "ry", "dx", "dy",
+    "width", "height", "d", "points", "viewBox", "stroke-width",
+    "font-size",
+}  # fmt: skip
+# presentation attributes that are moved to a class when the same combination repeats
+STYLE_ATTRIBUTES = {
+    "style", "clip-path", "fill", "fill-opacity", "stroke", "stroke-width", "stroke-opacity",
+    "stroke-linecap", "stroke-linejoin", "stroke-dasharray", "font-family",
+    "font-size", "font-weight", "font-style", "text-anchor",
+}  # fmt: skip
+TEXT_ELEMENTS = {"text", "tspan", "textPath", "style"}
+DROPPED_ELEMENTS = {"metadata", "title", "desc"}
+PATH_COMMAND = re.compile(r"\s*([A-Za-z])\s*")
+
+
+class Node:
+    __slots__ = ("tag", "attrib", "style", "text", "tail", "children", "element")
+
+    def __init__(self, tag: str, attrib: dict[str, str], element: Element) -> None:
+        self.tag = tag
+        self.attrib = attrib
+        self.style: tuple[tuple[str, str], ...] = ()  # presentation attributes, sorted
+        self.text = ""
+        self.tail = ""
+        self.children: list["Node"] = []
+        self.element: Element | None = element  # until its tail is known
+
+
+def split_name(name: str) -> tuple[str | None, str]:
+    if name.startswith("{"):
+        namespace, local = name[1:].split("}", 1)
+        return namespace, local
+    return None, name
+
+
+@functools.cache
+def long_number(precision: int) -> re.Pattern[str]:
+    """Numbers with more than precision decimals, shorter ones are written as they are."""
+    return re.compile(rf"-?\d*\.\d{{{precision + 1},}}(?:[eE][-+]?\d+)?")
+
+
+def round_numbers(value: str, precision: int) -> str:
+    def rounded(match: re.Match[str]) -> str:
+        text = f"{float(match.group()):.{precision}f}"
+        if "." in text:
+            text = text.rstrip("0").rstrip(".")
+        return "0" if text == "-0" else text
+
+    return long_number(precision).sub(rounded, value)
+
+
+def optimize_svg(
+    input_svg: str,
+    output_svg: str | None = None,
+    precision: int = 2,
+    crop_padding: float | None = None,
+) -> None:
+    """
+    Rewrites an SVG (VARNA or arc diagram) in one streaming pass over the file:
+    - with crop_padding, sets the viewBox/width/height to the bounding box of the top-level lines,
+      circles and texts (what VARNA draws) plus the padding
+    - rounds coordinates and lengths to precision decimals
+    - drops comments, metadata and elements or attributes of other namespaces (editor data)
+    - drops whitespace between elements
+    - replaces presentation attributes repeated on several elements by a class in one <style>
+
+    The file is written to output_svg (input_svg by default) through a temporary file, so readers never see
+    a half written diagram.
+    """
+    min_x, min_y = float("inf"), float("inf")
+    max_x, max_y = float("-inf"), float("-inf")
+
+    root: Node | None = None
+    stack: list[Node] = []
+    skipped = 0  # depth inside a dropped element
+    uses_xlink = False
+    for event, element in iterparse(input_svg, events=("start", "end")):
+        namespace, tag = split_name(element.tag)
+        if event == "start":
+            if skipped or namespace not in NAMESPACES or tag in DROPPED_ELEMENTS:
+                skipped += 1
+                continue
+            node = Node(NAMESPACES[namespace] + tag, {}, element)
+            for name, value in element.attrib.items():
+                attribute_namespace, attribute = split_name(name)
+                if attribute_namespace is None:
+                    node.attrib[attribute] = value
+                elif attribute_namespace in NAMESPACES:
+                    node.attrib[NAMESPACES[attribute_namespace] + attribute] = value
+                    uses_xlink = uses_xlink or attribute_namespace == XLINK_NS
+            node.style = tuple(
+                sorted((k, v) for k, v in node.attrib.items() if k in STYLE_ATTRIBUTES)
+            )
+            if stack:
+                stack[-1].children.append(node)
+            else:
+                root = node
+            stack.append(node)
+            continue
+
+        if skipped:
+            skipped -= 1
+            continue
+        node = stack.pop()
+        node.text = element.text or ""
+        for child in node.children:  # tails are parsed after the end of an element
+            assert child.element is not None
+            child.tail = child.element.tail or ""
+            child.element = None
+        if crop_padding is not None and len(stack) == 1:
+            box = bounding_box(tag, element.attrib)
+            if box is not None:
+                min_x, min_y = min(min_x, box[0]), min(min_y, box[1])
+                max_x, max_y = max(max_x, box[2]), max(max_y, box[3])
+        del element[
+            :
+        ]  # the nodes hold what is written, the element keeps its tail for the parent
+
+    if root is None:
+        raise ValueError(f"No SVG element in {input_svg}")
+
+    if crop_padding is not None and min_x <= max_x:
+        min_x -= crop_padding
+        min_y -= crop_padding
+        width = max_x + crop_padding - min_x
+        height = max_y + crop_padding - min_y
+        root.attrib["viewBox"] = f"{min_x} {min_y} {width} {height}"
+        root.attrib["width"] = str(width)
+        root.attrib["height"] = str(height)
+
+    root.attrib["xmlns"] = SVG_NS
+    if uses_xlink:
+        root.attrib["xmlns:xlink"] = XLINK_NS
+
+    classes = style_classes(root)
+    parts = ['<?xml version="1.0" encoding="utf-8"?>']
+    write_node(root, parts, precision, classes, in_text=False)
+    if classes:  # the <style> goes right after the root start tag
+        rules = "".join(
+            f".{name}{{{css(style, precision)}}}" for style, name in classes.items()
+        )
+        end = parts.index(">", 1) + 1
+        parts.insert(end, f"<style>{escape(rules, quote=False)}</style>")
+
+    output_svg = output_svg or input_svg
+    directory = os.path.dirname(os.path.abspath(output_svg))
+    with tempfile.NamedTemporaryFile(
+        "w", dir=directory, suffix=".svg", delete=False, encoding="utf-8"
+    ) as f:
+        f.write("".join(parts))
+    os.replace(f.name, output_svg)
+
+
+def bounding_box(
+    tag: str, attrib: dict[str, str]
+) -> tuple[float, float, float, float] | None:
+    """Box of a VARNA line, circle or text (its anchor point)."""
+    if tag == "line":
+        x = [float(attrib["x1"]), float(attrib["x2"])]
+        y = [float(attrib["y1"]), float(attrib["y2"])]
+    elif tag == "circle":
+        cx, cy, r = float(attrib["cx"]), float(attrib["cy"]), float(attrib.get("r", 0))
+        x, y = [cx - r, cx + r], [cy - r, cy + r]
+    elif tag == "text" and "x" in attrib and "y" in attrib:
+        x, y = [float(attrib["x"])], [float(attrib["y"])]
+    else:
+        return None
+    return min(x), min(y), max(x), max(y)
+
+
+def style_classes(root: Node) -> dict[tuple[tuple[str, str], ...], str]:
+    """Class names for the presentation attribute combinations used by more than one element."""
+    counts: Counter = Counter()
+    nodes = [root]
+    while nodes:
+        node = nodes.pop()
+        if node.style and node is not root and "class" not in node.attrib:
+            counts[node.style] += 1
+        nodes.extend(node.children)
+    repeated = [style for style, count in counts.most_common() if count > 1]
+    return {style: f"s{n}" for n, style in enumerate(repeated)}
+
+
+def css(style: tuple[tuple[str, str], ...], precision: int) -> str:
+    declarations: list[str] = []
+    for name, value in style:
+        if name == "style":
+            declarations.extend(
+                ":".join(part.strip() for part in declaration.split(":", 1))
+                for declaration in value.split(";")
+                if declaration.strip()
+            )
+        elif name in NUMERIC_ATTRIBUTES and re.fullmatch(r"-?[.\d]+", value):
+            # CSS lengths need a unit
+            declarations.append(f"{name}:{round_numbers(value, precision)}px")
+        else:
+            declarations.append(f"{name}:{value}")
+    return ";".join(declarations)
+
+
+def command(match: re.Match[str]) -> str:
+    return match.group(1)
+
+
+def write_node(
+    node: Node,
+    parts: list[str],
+    precision: int,
+    classes: dict[tuple[tuple[str, str], ...], str],
+    in_text: bool,
+) -> None:
+    inside_text = in_text or node.tag in TEXT_ELEMENTS
+    attributes = dict(node.attrib)
+    style_class = None if "class" in attributes else classes.get(node.style)
+    if style_class is not None:
+        for name in STYLE_ATTRIBUTES:
+            attributes.pop(name, None)
+        attributes["class"] = style_class
+
+    parts.append(f"<{node.tag}")
+    for name, value in attributes.items():
+        if name in NUMERIC_ATTRIBUTES:
+            value = " ".join(round_numbers(value, precision).split())
+            if name == "d":
+                value = PATH_COMMAND.sub(command, value)
+        if name == "style":
+            value = css((("style", value),), precision)
+        parts.append(f' {name}="{escape(value)}"')
+    text = node.text if inside_text else node.text.strip()
+    if not node.children and not text:
+        parts.append("/>")
+    else:
+        parts.append(">")
+        parts.append(escape(text, quote=False))
+        for child in node.children:
+            write_node(child, parts, precision, classes, inside_text)
+        parts.append(f"</{node.tag}>")
+    tail = node.tail if in_text else node.tail.strip()
+    parts.append(escape(tail, quote=False))
@@ -4,7 +4,38 @@ from email.mime.text import MIMEText
 import smtplib
 from django.utils import timezone
 from django.conf import settings
-from .models import ExampleStructures, Job, JobResults
+from .models import (
+    ExampleStructures,
+    EngineRun,
+    EngineRunStatus,
+    Job,
+    JobResults,
+    RenderedDiagram,
+)
+from .circuit_breaker import CircuitOpenError
+from .engine_client import (
+    PartialSubmissionError,
+    get_engine_breaker,
+    get_engine_client,
+    retry_after,
+)
+from .poll_policies import FixedIntervalPolicy, PollPolicy, get_poll_policy
+from .postprocessing import get_postprocessing_pool
+from .result_cache import (
+    clone_result,
+    find_memoized_result,
+    record_result_lookup,
+    result_key,
+)
+from .render_cache import (
+    cached_diagram_path,
+    prune_render_cache,
+    record_lookup,
+    temporary_path,
+    use_cached_diagram,
+)
+from collections import deque
+from concurrent.futures import Future
 from time import sleep, time
 from uuid import UUID
 import requests
@@ -12,9 +43,11 @@ from celery import shared_task
 import os
 import json
 from celery.utils.log import get_task_logger
+from django.db import transaction
+from django.db.models import F, Q
 from django.db.models.query import QuerySet
 from django.template import Template, Context
-from typing import Any
+from typing import Any, Callable, Iterable, Iterator, Mapping
 
 
 class EngineTimeoutError(Exception):
@@ -58,7 +91,9 @@ def delete_expired_jobs() -> str:
 
         job.delete()
 
-    logger.info(f"Deleted {count} expired jobs.")
+    pruned = prune_render_cache()
+
+    logger.info(f"Deleted {count} expired jobs and {pruned} cached diagrams.")
     return f"Deleted {count} expired jobs."
 
 
@@ -92,6 +127,7 @@ def send_email_task(
     title: str,
     url: str,
     expiration_date: str | None = None,
+    failed_conformations: int = 0,
 ) -> bool:
     logger = get_task_logger(__name__)
     sender_email = settings.EMAIL_HOST_USER
@@ -105,12 +141,12 @@ def send_email_task(
         logger.error(f"Error loading template: {e}")
         return False
     template = Template(template_content)
+    context: dict[str, Any] = {"url": url}
     if expiration_date:
-        html_content = template.render(
-            Context({"url": url, "expiration_date": expiration_date})
-        )
-    else:
-        html_content = template.render(Context({"url": url}))
+        context["expiration_date"] = expiration_date
+    if failed_conformations:  # conformations missing from a finished job
+        context["failed_conformations"] = failed_conformations
+    html_content = template.render(Context(context))
 
     msg = MIMEMultipart()
     msg["From"] = sender_email
@@ -133,43 +169,61 @@ def execute_and_poll_engine(
     uuid: str,
     seed: int,
     timeout: int = settings.ENGINE_TIMEOUT_SECONDS,
-    check_interval: int = settings.ENGINE_POLL_INTERVAL_SECONDS,
+    check_interval: float | None = None,
+    poll_policy: PollPolicy | None = None,
+    submitted: bool = False,
 ) -> dict[str, Any]:
+    """
+    Starts an engine run and polls its status until it finishes.
+    Delays between status calls come from poll_policy (ENGINE_POLL_POLICY by default),
+    passing check_interval polls at that fixed interval instead.
+    With submitted, the run was started by an earlier attempt of the task and is only polled.
+    """
 
     logger = get_task_logger(__name__)
-    engine_url = settings.ENGINE_URL
-    run_url = f"{engine_url}/run"
-    logger.info(f"Sending request to engine at {run_url} for UUID: {uuid}")
+    client = get_engine_client()
+    if poll_policy is None:
+        poll_policy = (
+            FixedIntervalPolicy(check_interval)
+            if check_interval is not None
+            else get_poll_policy()
+        )
+    if submitted:
+        logger.info(f"Resuming engine run of UUID: {uuid} (seed {seed})")
+    else:
+        logger.info(
+            f"Sending request to engine at {client.base_url}/run for UUID: {uuid}"
+        )
 
-    try:
-        response = requests.post(run_url, data={"uuid": uuid, "seed": seed})
-        response.raise_for_status()
-    except requests.RequestException as e:
-        raise Exception(f"Failed to contact engine: {e}")
+        try:
+            response = client.run(uuid, seed)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise Exception(f"Failed to contact engine: {e}")
 
-    logger.info(f"Received response with status code {response.status_code}")
+        logger.info(f"Received response with status code {response.status_code}")
     start_time = time()
-    status_url = f"{engine_url}/status/{uuid}"
-    cancel_url = f"{engine_url}/cancel/{uuid}"
 
     retries = 0
+    polls = 0
     while True:
         logger.info("Polling engine for results...")
         if time() - start_time > timeout:
             try:
-                response = requests.post(f"{cancel_url}")
-            except requests.RequestException as e:
+                logger.error(f"Engine cancel response: {client.cancel(uuid).text}")
+            except (requests.RequestException, CircuitOpenError) as e:
                 logger.error(f"Failed to cancel engine request: {e}")
             error_msg = "Engine operation timed out"
-            logger.error(f"{error_msg}: {response.text}")
+            logger.error(error_msg)
             raise EngineTimeoutError(error_msg, job_uuid=uuid)
 
         try:
-            status_resp = requests.get(f"{status_url}?seed={seed}")
+            status_resp = client.status(uuid, seed)
         except requests.RequestException:
             logger.warning("Failed to get status from engine, retrying...")
             retries += 1
-            sleep(check_interval)
+            # transport errors keep the fixed retry delay, the poll policy paces only running runs
+            sleep(settings.ENGINE_REQUEST_RETRY_DELAY)
             if retries >= settings.ENGINE_REQUEST_MAX_RETRIES:
                 raise Exception("Max retries reached while polling engine status")
             continue
@@ -181,7 +235,8 @@ def execute_and_poll_engine(
 
         elif status_resp.status_code == 202:
             logger.info("Engine is still processing the request...")
-            sleep(check_interval)
+            sleep(poll_policy.next_delay(polls, retry_after(status_resp)))
+            polls += 1
             continue
 
         elif status_resp.status_code == 500:
@@ -194,14 +249,665 @@ def execute_and_poll_engine(
             )
 
 
+def execute_and_poll_engine_runs(
+    uuid: str,
+    seeds: list[int],
+    fanout: int,
+    timeout: int = settings.ENGINE_TIMEOUT_SECONDS,
+    poll_policy: PollPolicy | None = None,
+    submitted: Iterable[int] = (),
+    on_submit: Callable[[list[int]], None] | None = None,
+    polls: Mapping[int, int] | None = None,
+    on_poll: Callable[[list[int]], None] | None = None,
+) -> Iterator[tuple[int, dict[str, Any], datetime]]:
+    """
+    Runs the conformations (seeds) of a job concurrently: keeps up to fanout runs in flight, polls them
+    together and yields (seed, result, submitted_at) as soon as a run finishes, so the caller can post-process it
+    while the engine computes the others. Engines with batch support get one /run_batch and /status_batch call
+    for all of them instead of one call per run. A run the engine fails on is resubmitted up to ENGINE_REQUEST_MAX_RETRIES times.
+    Seeds in submitted were started by an earlier attempt of the task and are only polled, on_submit is called
+    with the seeds of every /run call before it is sent.
+    The poll policy backs off per run: polls holds the status calls already made for the submitted seeds
+    (EngineRun.polls) and on_poll is called with the seeds still running after every status call, so runs
+    submitted later start polling fast again.
+    """
+
+    logger = get_task_logger(__name__)
+    client = get_engine_client()
+    if poll_policy is None:
+        poll_policy = get_poll_policy()
+    max_retries = settings.ENGINE_REQUEST_MAX_RETRIES
+
+    in_flight: dict[int, tuple[float, datetime]] = {
+        seed: (time(), timezone.now()) for seed in submitted if seed in seeds
+    }  # seed -> (start, submitted_at)
+    pending: list[int] = [seed for seed in seeds if seed not in in_flight]
+    retries: dict[int, int] = {seed: 0 for seed in seeds}
+    run_polls: dict[int, int] = {seed: (polls or {}).get(seed, 0) for seed in in_flight}
+
+    def retry(seed: int, error: str) -> None:
+        retries[seed] += 1
+        if retries[seed] >= max_retries:
+            raise Exception(f"Max retries reached for seed {seed}: {error}")
+        logger.warning(
+            f"Engine request failed for seed {seed} (attempt {retries[seed]}/{max_retries}). Error: {error}"
+        )
+
+    while pending or in_flight:
+        if pending and len(in_flight) < fanout:
+            batch = pending[: fanout - len(in_flight)]
+            if on_submit is not None:
+                on_submit(batch)
+            try:
+                client.submit_runs([(uuid, seed) for seed in batch])
+            except requests.RequestException as e:
+                # runs the engine accepted before the failure are polled, only the others are resubmitted
+                accepted = (
+                    [seed for _, seed in e.accepted]
+                    if isinstance(e, PartialSubmissionError)
+                    else []
+                )
+                for seed in accepted:
+                    pending.remove(seed)
+                    in_flight[seed] = (time(), timezone.now())
+                    run_polls[seed] = 0
+                for seed in batch:
+                    if seed not in accepted:
+                        retry(seed, f"Failed to contact engine: {e}")
+                sleep(settings.ENGINE_REQUEST_RETRY_DELAY)
+                continue
+            del pending[: len(batch)]
+            logger.info(f"Submitted {uuid} (seeds {batch}) to the engine")
+            for seed in batch:
+                in_flight[seed] = (time(), timezone.now())
+                run_polls[seed] = 0
+
+        for seed in sorted(in_flight):
+            start_time, submitted_at = in_flight[seed]
+            if time() - start_time > timeout:
+                try:
+                    client.cancel(uuid)
+                except (requests.RequestException, CircuitOpenError) as e:
+                    logger.error(f"Failed to cancel engine request: {e}")
+                raise EngineTimeoutError("Engine operation timed out", job_uuid=uuid)
+
+        finished = False
+        delays: list[float] = []
+        try:
+            statuses = client.poll_runs([(uuid, seed) for seed in sorted(in_flight)])
+        except requests.RequestException as e:
+            for seed in in_flight:
+                retry(seed, f"Failed to get status from engine: {e}")
+            sleep(settings.ENGINE_REQUEST_RETRY_DELAY)
+            continue
+
+        running = [seed for (_, seed), (code, _, _) in statuses.items() if code == 202]
+        for seed in running:
+            run_polls[seed] += 1
+        if running and on_poll is not None:
+            on_poll(sorted(running))
+
+        for (_, seed), (code, body, hint) in sorted(statuses.items()):
+            _, submitted_at = in_flight[seed]
+            if code == 200:
+                del in_flight[seed]
+                finished = True
+                yield seed, body, submitted_at
+            elif code == 202:
+                delays.append(poll_policy.next_delay(run_polls[seed] - 1, hint))
+            else:
+                del in_flight[seed]
+                retry(seed, f"Engine reported error: {code} {body}")
+                pending.insert(0, seed)
+                sleep(settings.ENGINE_REQUEST_RETRY_DELAY)
+
+        if in_flight and not finished:
+            sleep(min(delays) if delays else poll_policy.next_delay(0))
+
+
+def fail_job(job_data: Job) -> None:
+    job_data.status = "E"
+    job_data.finished_at = timezone.now()
+    job_data.expires_at = timezone.now() + timedelta(
+        weeks=settings.JOB_EXPIRATION_WEEKS
+    )
+    job_data.save()
+
+
+def process_engine_output(
+    job_data: Job,
+    seed: int,
+    result_data: dict[str, Any],
+    processing_start: datetime,
+) -> JobResults:
+    """
+    Post-processing of a single conformation: stores the dot-bracket structure returned by the annotator,
+    draws the arc diagram and creates the JobResults row. The VARNA graphs of all conformations are drawn
+    and their F1/INF calculated together when the job is finalized (draw_secondary_structures, scoreJobResults).
+    """
+    outputs = render_conformation(
+        str(job_data.uid),
+        seed,
+        result_data.get("pdbFilePath"),
+        result_data.get("jsonFilePath"),
+        job_data.input_structure.path,
+        job_data.strand_separator,
+    )
+    return save_conformation(job_data, seed, outputs, processing_start)
+
+
+def render_conformation(
+    uuid_str: str,
+    seed: int,
+    output_path_pdb: Any,
+    output_path_json: Any,
+    input_structure_path: str,
+    strand_separator: str,
+) -> dict[str, Any]:
+    """
+    File work of process_engine_output, without database access so it can run in the post-processing pool.
+    Returns the paths of the result files (no dotseq when the annotator found no structure).
+    With RENDER_CACHE the arc diagram is drawn into the render cache, unless it is there already (arc_cached).
+    With DIAGRAM_RENDERING="lazy" it is only drawn when the results are viewed (request_missing_diagrams).
+    """
+
+    from webapp.visualization_tools import generateRchieDiagram
+
+    logger = get_task_logger(__name__)
+
+    output_dir = "/shared/samples/engine_outputs"
+
+    if not isinstance(output_path_pdb, str) or not isinstance(output_path_json, str):
+        logger.error(
+            f"Invalid file paths returned from engine: PDB={output_path_pdb}, JSON={output_path_json}"
+        )
+        raise Exception("Engine returned invalid file paths (None or non-string)")
+
+    if not os.path.exists(output_path_pdb):
+        logger.error(f"Can't find {output_path_pdb}")
+        raise Exception(f"PDB file missing at {output_path_pdb}")
+
+    if not os.path.exists(output_path_json):
+        logger.error(f"Can't find {output_path_json}")
+        raise Exception(f"JSON file missing at {output_path_json}")
+
+    outputs: dict[str, Any] = {"pdb": output_path_pdb}
+    try:
+        with open(output_path_json, "r") as f:
+            json_data = json.load(f)
+        """"Get dotBracket from annotator and adjust it to match input structure strand breaks"""
+        dotbracket_from_annotator = json_data.get("dotBracket", "").split("\n")
+        with open(input_structure_path, "rb") as f:
+            reference_line = f.read().decode("utf-8").split("\n")[1]
+
+        split_indices = [i for i, char in enumerate(reference_line) if char == " "]
+        if split_indices:
+            new_dotbracket_list = []
+            for line in dotbracket_from_annotator[1:]:
+                for index in sorted(split_indices):
+                    line = line[:index] + strand_separator + line[index:]
+                new_dotbracket_list.append(line)
+            dotbracket_from_annotator = [
+                dotbracket_from_annotator[0],
+                new_dotbracket_list[0],
+                new_dotbracket_list[1],
+            ]
+        dotbracket_from_annotator = "\n".join(dotbracket_from_annotator)
+        dotbracket_path = os.path.join(output_dir, f"{uuid_str}_{seed}.dotseq")
+        if dotbracket_from_annotator:
+            with open(dotbracket_path, "w") as dbn_file:
+                dbn_file.write(dotbracket_from_annotator + "\n")
+        else:
+            logger.error("No dotBracket structure found in JSON")
+    except Exception as e:
+        logger.exception(f"Error processing JSON data: {e}")
+        raise
+
+    # removed once the conformation is saved, until then a redelivered task can post-process it again
+    outputs["json"] = output_path_json
+
+    if dotbracket_from_annotator:
+        arc_diagram_path = os.path.join(output_dir, f"{uuid_str}_{seed}_arc.svg")
+        drawing_path = arc_diagram_path
+        arc_cached = False
+        if settings.RENDER_CACHE:
+            arc_diagram_path = cached_diagram_path(
+                "arc", [input_structure_path, dotbracket_path]
+            )
+            arc_cached = os.path.exists(arc_diagram_path)
+            drawing_path = temporary_path(arc_diagram_path)
+        logger.info(f"{input_structure_path}")
+        if not arc_cached and settings.DIAGRAM_RENDERING != "lazy":
+            try:
+                generateRchieDiagram(
+                    input_structure_path, dotbracket_path, drawing_path
+                )
+                if drawing_path != arc_diagram_path:
+                    os.replace(drawing_path, arc_diagram_path)
+            except Exception as e:
+                logger.error(f"Error generating arc diagram{e}")
+                raise
+            logger.info("Generated Arc diagram")
+
+        outputs.update(
+            dotseq=dotbracket_path,
+            # drawn by draw_secondary_structures
+            svg=os.path.join(output_dir, f"{uuid_str}_{seed}.svg"),
+            arc=arc_diagram_path,
+            arc_cached=arc_cached,
+        )
+    return outputs
+
+
+def save_conformation(
+    job_data: Job,
+    seed: int,
+    outputs: dict[str, Any],
+    processing_start: datetime,
+) -> JobResults:
+    """Creates the JobResults row of a conformation rendered by render_conformation."""
+    logger = get_task_logger(__name__)
+
+    processing_end: datetime = timezone.now()
+    paths = {
+        field: os.path.relpath(outputs[key], settings.MEDIA_ROOT)
+        for key, field in (
+            ("pdb", "result_tertiary_structure"),
+            ("dotseq", "result_secondary_structure_dotseq"),
+            ("svg", "result_secondary_structure_svg"),
+            ("arc", "result_arc_diagram"),
+        )
+        if key in outputs
+    }
+    try:
+        cache_key: str | None = result_key(job_data, seed)
+    except (OSError, ValueError) as e:  # not memoized then
+        logger.warning(f"Failed to read the input of {job_data.uid}: {e}")
+        cache_key = None
+    try:
+        job_result_qs: QuerySet = JobResults.objects.filter(job__exact=job_data)
+        if (
+            job_result_qs.count() + 1 == job_data.alternative_conformations
+        ):  # check if current job result is the last one
+            job_data.sum_processing_time = sum(
+                [i.processing_time for i in job_result_qs], timedelta()
+            ) + (processing_end - processing_start)
+            job_data.save()
+        with transaction.atomic():
+            job_result: JobResults = JobResults.objects.create(
+                job=job_data,
+                seed=seed,
+                completed_at=processing_end,
+                processing_time=(processing_end - processing_start),
+                cache_key=cache_key,
+                **paths,
+            )
+            arc_diagram = paths.get("result_arc_diagram", "")
+            if RenderedDiagram.is_cached(arc_diagram):
+                RenderedDiagram.acquire(arc_diagram)
+                record_lookup("arc", hit=outputs.get("arc_cached", False))
+    except Exception as e:
+        logger.exception(f"Failed to create JobResults: {str(e)}")
+        raise
+    if "json" in outputs and os.path.exists(outputs["json"]):
+        os.remove(outputs["json"])
+    return job_result
+
+
+class PostProcessingPipeline:
+    """
+    Post-processes the conformations of a job in the post-processing pool (ENGINE_POSTPROCESSING_WORKERS)
+    while the task goes on with the next engine runs. JobResults rows are still created in seed order by
+    the task itself; without the pool every conformation is processed at once, as before.
+    A conformation whose post-processing fails gets a JobResults row without files with the error, its
+    EngineRun is marked as failed too; the job is finished with the others (finish).
+    """
+
+    def __init__(self, job_data: Job) -> None:
+        self.job_data = job_data
+        self.pool = get_postprocessing_pool()
+        self.pending: deque[tuple[int, datetime, Future]] = deque()
+        self.failed: dict[int, str] = {}  # seed -> error
+
+    def submit(
+        self, seed: int, result_data: dict[str, Any], processing_start: datetime
+    ) -> None:
+        if self.pool is None:
+            try:
+                process_engine_output(
+                    self.job_data, seed, result_data, processing_start
+                )
+            except Exception as e:
+                self.record_failure(seed, e, processing_start)
+                return
+            self.completed(seed)
+            return
+        future = self.pool.submit(
+            render_conformation,
+            str(self.job_data.uid),
+            seed,
+            result_data.get("pdbFilePath"),
+            result_data.get("jsonFilePath"),
+            self.job_data.input_structure.path,
+            self.job_data.strand_separator,
+        )
+        self.pending.append((seed, processing_start, future))
+        self.save(wait=False)
+
+    def save(self, wait: bool = True) -> None:
+        """Saves the rendered conformations in seed order, all of them when wait is set."""
+        while self.pending and (wait or self.pending[0][2].done()):
+            seed, processing_start, future = self.pending.popleft()
+            try:
+                outputs = future.result()
+                save_conformation(self.job_data, seed, outputs, processing_start)
+            except Exception as e:
+                self.record_failure(seed, e, processing_start)
+                continue
+            self.completed(seed)
+
+    def finish(self) -> None:
+        """
+        Saves the remaining conformations. With failed ones the job is finished with those that were saved,
+        it fails only when none of them was.
+        """
+        self.save()
+        if not self.failed:
+            return
+        results = JobResults.objects.filter(job=self.job_data, error__isnull=True)
+        if not results.exists():
+            raise Exception(
+                f"Post-processing failed for every conformation: {self.failed}"
+            )
+        self.job_data.sum_processing_time = sum(
+            (result.processing_time for result in results), timedelta()
+        )
+        self.job_data.save()
+
+    def completed(self, seed: int) -> None:
+        record_engine_runs(self.job_data, [seed], EngineRunStatus.Completed)
+
+    def record_failure(
+        self, seed: int, error: Exception, processing_start: datetime
+    ) -> None:
+        logger = get_task_logger(__name__)
+
+        logger.error(f"Post-processing of seed {seed} failed: {error}")
+        self.failed[seed] = str(error)
+        message = f"Post-processing failed: {error}"
+        processing_end: datetime = timezone.now()
+        JobResults.objects.create(
+            job=self.job_data,
+            seed=seed,
+            completed_at=processing_end,
+            processing_time=processing_end - processing_start,
+            error=message,
+        )
+        record_engine_runs(
+            self.job_data, [seed], EngineRunStatus.Error, error=message
+        )
+
+    def cancel(self) -> None:
+        for _, _, future in self.pending:
+            future.cancel()
+        self.pending.clear()
+
+
+def draw_secondary_structures(results: Iterable[JobResults]) -> timedelta:
+    """
+    Draws the missing VARNA graphs of the given results (all conformations of a job, or of many jobs)
+    with one drawVARNAgraphs call, so VARNA starts once per batch. Returns the time it took.
+
+    With RENDER_CACHE results with the same structure share one diagram in the render cache, only the
+    diagrams that aren't cached yet are drawn.
+    """
+    from webapp.visualization_tools import drawVARNAgraphs
+
+    logger = get_task_logger(__name__)
+
+    start: datetime = timezone.now()
+    targets: dict[str, list[JobResults]] = {}  # diagram path -> results showing it
+    for result in results:
+        if (
+            not result.result_secondary_structure_dotseq
+            or not result.result_secondary_structure_svg
+            or os.path.exists(result.result_secondary_structure_svg.path)
+        ):
+            continue
+        if settings.RENDER_CACHE:
+            path = cached_diagram_path(
+                "varna", [result.result_secondary_structure_dotseq.path]
+            )
+        else:
+            path = result.result_secondary_structure_svg.path
+        targets.setdefault(path, []).append(result)
+
+    missing = {path for path in targets if not os.path.exists(path)}
+    if missing:
+        paths = [
+            (
+                targets[path][0].result_secondary_structure_dotseq.path,
+                temporary_path(path) if settings.RENDER_CACHE else path,
+            )
+            for path in missing
+        ]
+        for path, (_, drawing_path), outcome in zip(
+            missing, paths, drawVARNAgraphs(paths)
+        ):
+            if not outcome.startswith("OK"):
+                logger.error(
+                    f"Failed to generate secondary structure {path}: {outcome}"
+                )
+            elif drawing_path != path:
+                os.replace(drawing_path, path)
+            if drawing_path != path and os.path.exists(drawing_path):
+                os.remove(drawing_path)
+        logger.info(f"Generated {len(paths)} VARNA diagrams")
+
+    if settings.RENDER_CACHE:
+        for path, shown_by in targets.items():
+            if not os.path.exists(path):  # failed, logged above
+                continue
+            for n, result in enumerate(shown_by):
+                record_lookup("varna", hit=n > 0 or path not in missing)
+                use_cached_diagram(result, "result_secondary_structure_svg", path)
+    return timezone.now() - start
+
+
+def draw_arc_diagrams(results: Iterable[JobResults]) -> None:
+    """Draws the missing arc diagrams of the given results (DIAGRAM_RENDERING="lazy")."""
+    from webapp.visualization_tools import generateRchieDiagram
+
+    logger = get_task_logger(__name__)
+
+    for result in results:
+        diagram = result.result_arc_diagram
+        if (
+            not diagram
+            or not result.result_secondary_structure_dotseq
+            or os.path.exists(diagram.path)
+        ):
+            continue
+        drawing_path = temporary_path(diagram.path)
+        outcome = generateRchieDiagram(
+            result.job.input_structure.path,
+            result.result_secondary_structure_dotseq.path,
+            drawing_path,
+        )
+        if outcome.startswith("OK"):
+            os.replace(drawing_path, diagram.path)
+        else:
+            logger.error(f"Failed to generate arc diagram {diagram.path}: {outcome}")
+            if os.path.exists(drawing_path):
+                os.remove(drawing_path)
+
+
+def diagrams_missing(result: JobResults) -> bool:
+    return bool(result.result_secondary_structure_dotseq) and any(
+        diagram and not os.path.exists(diagram.path)
+        for diagram in (
+            result.result_secondary_structure_svg,
+            result.result_arc_diagram,
+        )
+    )
+
+
+def request_missing_diagrams(results: list[JobResults]) -> bool:
+    """
+    With DIAGRAM_RENDERING="lazy" the VARNA graphs and arc diagrams of a job are drawn the first time its
+    results are viewed (GetResults, DownloadZipFile) instead of when it is finalized. The view doesn't draw
+    them itself: that would start a VARNA server in every web worker and hold the request for the whole
+    render. The drawing is queued on the grapharna worker, which keeps its render server (draw_diagrams_task),
+    and the view reports it as pending. Returns whether diagrams of the results (one job) are missing.
+
+    The drawing is queued once per job: views polling the results or retrying the download while it is drawn
+    find Job.diagrams_requested_at set and don't queue it again, unless the request is older than
+    DIAGRAM_REQUEST_TIMEOUT (the task was lost or failed).
+    """
+    missing = [result for result in results if diagrams_missing(result)]
+    if settings.DIAGRAM_RENDERING != "lazy" or not missing:
+        return False
+    job: Job = missing[0].job
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.DIAGRAM_REQUEST_TIMEOUT)
+    requested = (
+        Job.objects.filter(pk=job.pk)
+        .filter(
+            Q(diagrams_requested_at__isnull=True) | Q(diagrams_requested_at__lt=stale)
+        )
+        .update(diagrams_requested_at=now)
+    )
+    if requested:
+        draw_diagrams_task.delay(str(job.pk))
+    return True
+
+
 @shared_task(queue="grapharna")
-def run_grapharna_task(uuid_param: UUID, example_number: int | None = None) -> str:
+def draw_diagrams_task(job_id: UUID | str) -> str:
+    """Draws the missing diagrams of a job whose results were viewed (request_missing_diagrams)."""
+    results = draw_missing_diagrams(list(JobResults.objects.filter(job_id=job_id)))
+    if any(diagrams_missing(result) for result in results):
+        return "Diagrams missing"  # failed, logged, queued again after DIAGRAM_REQUEST_TIMEOUT
+    Job.objects.filter(pk=job_id).update(diagrams_requested_at=None)
+    return "OK"
+
 
-    from webapp.visualization_tools import (
-        drawVARNAgraph,
-        generateRchieDiagram,
+def draw_missing_diagrams(results: list[JobResults]) -> list[JobResults]:
+    """
+    Draws the missing diagrams of the results (DIAGRAM_RENDERING="lazy"). The rows are read again, another
+    task may have pointed them at the render cache meanwhile. Every diagram is drawn into a temporary file
+    and moved into place, so two tasks drawing the same diagram (a request queued again after
+    DIAGRAM_REQUEST_TIMEOUT) never leave a partial file. Returns the results as they are after drawing.
+    """
+    if settings.DIAGRAM_RENDERING != "lazy" or not any(
+        diagrams_missing(result) for result in results
+    ):
+        return results
+    current = list(
+        JobResults.objects.select_related("job")
+        .filter(pk__in=[result.pk for result in results])
+        .order_by("pk")
     )
-    from api.INF_F1 import CalculateF1Inf, dotbracketToPairs
+    draw_secondary_structures(current)
+    draw_arc_diagrams(current)
+    drawn = {result.pk: result for result in current}
+    return [drawn.get(result.pk, result) for result in results]
+
+
+def finalize_job(job_data: Job, example_number: int | None = None) -> None:
+    """
+    Scores and draws the VARNA graphs of all conformations, marks the job as completed once all of its
+    conformations are saved and notifies the user.
+    """
+
+    from api.scoring import scoreJobResults
+
+    logger = get_task_logger(__name__)
+
+    # before the strand separator is written into the input structure, failures are recorded on the rows
+    scoreJobResults(job_data)
+
+    try:
+        drawing_time = timedelta()
+        if settings.DIAGRAM_RENDERING != "lazy":  # drawn when viewed otherwise
+            drawing_time = draw_secondary_structures(
+                JobResults.objects.filter(job=job_data)
+            )
+    except Exception as e:
+        logger.error(f"Failed to generate secondary structures: {e}")
+        fail_job(job_data)
+        raise
+    if job_data.sum_processing_time is not None:
+        job_data.sum_processing_time += drawing_time
+
+    """Post-processing: replace spaces with input strand separator in input structure file"""
+    if job_data.strand_separator and job_data.strand_separator != " ":
+        try:
+            with job_data.input_structure.open("rb") as f:
+                input_data = f.read().decode("utf-8")
+                input_data = input_data.replace(" ", job_data.strand_separator)
+
+            with job_data.input_structure.open("w") as f:
+                f.write(input_data)
+        except Exception as e:
+            logger.error(f"Error replacing spaces in input structure: {e}")
+            raise
+    if example_number is None:  # not an example job
+        job_data.expires_at = timezone.now() + timedelta(
+            weeks=settings.JOB_EXPIRATION_WEEKS
+        )
+    job_data.finished_at = timezone.now()
+    job_data.status = "C"
+    job_data.save()
+
+    if example_number is not None:  # example job
+        ExampleStructures.objects.update_or_create(
+            id=example_number, defaults={"job": job_data}
+        )
+
+    if job_data.email:
+        url = f"{settings.RESULT_BASE_URL}?uidh={job_data.hashed_uid}"
+        send_email_task.delay(
+            receiver_email=job_data.email,
+            template_path=settings.TEMPLATE_PATH_JOB_FINISHED,
+            title=settings.TITLE_JOB_FINISHED,
+            url=url,
+            failed_conformations=job_data.alternative_conformations
+            - JobResults.objects.filter(
+                job=job_data, result_tertiary_structure__gt=""
+            ).count(),
+        )
+    logger.info("GraphaRNA run completed successfully.")
+
+
+def hold_or_fail_job(
+    job_data: Job, example_number: int | None, error: CircuitOpenError
+) -> str:
+    """
+    Called when the engine circuit is open. With ENGINE_BREAKER_OPEN_ACTION="hold" the job goes back to the queue
+    until the next engine health probe, otherwise it fails at once instead of retrying against a dead engine.
+    """
+    logger = get_task_logger(__name__)
+
+    if settings.ENGINE_BREAKER_OPEN_ACTION == "fail":
+        logger.error(f"{error}. Failing job {job_data.uid}.")
+        fail_job(job_data)
+        return "Engine unavailable"
+
+    # saved conformations are kept, the job resumes with the others (resume_engine_runs)
+    job_data.status = "Q"
+    job_data.save()
+    run_grapharna_task.apply_async(
+        (job_data.uid,),
+        {"example_number": example_number},
+        countdown=max(error.retry_in, 1),
+    )
+    logger.warning(f"{error}. Job {job_data.uid} held in the queue.")
+    return "Held"
+
+
+@shared_task(queue="grapharna")
+def run_grapharna_task(uuid_param: UUID, example_number: int | None = None) -> str:
 
     logger = get_task_logger(__name__)
 
@@ -218,7 +924,11 @@ def run_grapharna_task(uuid_param: UUID, example_number: int | None = None) -> s
         logger.info(f"Job {uuid_param} is already completed. Exiting task.")
         return "Job already completed"
 
-    seed = job_data.seed
+    try:
+        get_engine_breaker().before_call()
+    except CircuitOpenError as e:
+        return hold_or_fail_job(job_data, example_number, e)
+
     uuid_str = str(uuid_param)
 
     output_dir = "/shared/samples/engine_outputs"
@@ -232,236 +942,469 @@ def run_grapharna_task(uuid_param: UUID, example_number: int | None = None) -> s
         logger.exception(f"Failed to update job status: {str(e)}")
         raise
 
+    try:
+        reuse_memoized_results(job_data)
+    except Exception as e:  # the engine computes them
+        logger.exception(f"Failed to reuse memoized results: {e}")
+
+    if settings.ENGINE_DISPATCH_MODE in ("callback", "scheduled", "async"):
+        start_engine_runs(job_data)
+        logger.info(f"Job {uuid_param} handed over to engine run tasks.")
+        return "Submitted"
+
+    runs = resume_engine_runs(job_data)
+    pipeline = PostProcessingPipeline(job_data)
+    for run in list(runs.values()):
+        if run.status == EngineRunStatus.Finished and engine_outputs_exist(run):
+            logger.info(f"Reusing the engine outputs of {run}")
+            del runs[run.seed]
+            pipeline.submit(
+                run.seed,
+                {"pdbFilePath": run.pdb_file_path, "jsonFilePath": run.json_file_path},
+                run.submitted_at or timezone.now(),
+            )
+
+    def submitting(seeds: list[int]) -> None:
+        record_engine_runs(
+            job_data,
+            seeds,
+            EngineRunStatus.Submitted,
+            submitted_at=timezone.now(),
+            polls=0,
+        )
+
+    def polled(seeds: list[int]) -> None:
+        EngineRun.objects.filter(job=job_data, seed__in=seeds).update(
+            polls=F("polls") + 1
+        )
+
+    def finished(seed: int, result_data: dict[str, Any]) -> None:
+        record_engine_runs(
+            job_data,
+            [seed],
+            EngineRunStatus.Finished,
+            finished_at=timezone.now(),
+            pdb_file_path=result_data.get("pdbFilePath"),
+            json_file_path=result_data.get("jsonFilePath"),
+        )
+
+    if settings.ENGINE_CONFORMATION_FANOUT > 1:
+        try:
+            for run_seed, run_result, submitted_at in execute_and_poll_engine_runs(
+                uuid_str,
+                list(runs),
+                settings.ENGINE_CONFORMATION_FANOUT,
+                submitted=[
+                    run.seed
+                    for run in runs.values()
+                    if run.status == EngineRunStatus.Submitted
+                ],
+                on_submit=submitting,
+                polls={run.seed: run.polls for run in runs.values()},
+                on_poll=polled,
+            ):
+                finished(run_seed, run_result)
+                pipeline.submit(run_seed, run_result, submitted_at)
+            pipeline.finish()
+        except CircuitOpenError as e:
+            pipeline.cancel()
+            return hold_or_fail_job(job_data, example_number, e)
+        except Exception as e:
+            pipeline.cancel()
+            logger.error(f"Engine run failed, failing the job: {e}")
+            fail_job(job_data)
+            raise
+        logger.info("Saved to database")
+        finalize_job(job_data, example_number)
+        return "OK"
+
     max_retries = settings.ENGINE_REQUEST_MAX_RETRIES
     retry_timeout = settings.ENGINE_REQUEST_RETRY_DELAY
 
-    for i in range(job_data.alternative_conformations):
+    for run in runs.values():
         processing_start: datetime = timezone.now()
 
         retries: int = 0
 
         result_data: dict[str, Any] = {}
 
+        # the engine may still be computing it for the previous attempt of the task
+        resumed = run.status == EngineRunStatus.Submitted
         while retries < max_retries:
             try:
+                if not resumed:
+                    submitting([run.seed])
                 result_data = execute_and_poll_engine(
-                    uuid=uuid_str,
-                    seed=seed + i,
+                    uuid=uuid_str, seed=run.seed, submitted=resumed
                 )
 
                 break
             except EngineTimeoutError as e:
                 logger.error(f"Engine timeout error: {e}")
-                job_data.status = "E"
-                job_data.finished_at = timezone.now()
-                job_data.expires_at = timezone.now() + timedelta(
-                    weeks=settings.JOB_EXPIRATION_WEEKS
-                )
-                job_data.save()
+                pipeline.cancel()
+                fail_job(job_data)
                 raise
+            except CircuitOpenError as e:
+                pipeline.cancel()
+                return hold_or_fail_job(job_data, example_number, e)
             except Exception as e:
                 logger.warning(
                     f"Engine request failed (attempt {retries + 1}/{max_retries}). "
                     f"Retrying in {retry_timeout}s. Error: {e}"
                 )
+                resumed = False
                 retries += 1
                 sleep(retry_timeout)
         if retries == max_retries:
             logger.error("Max retries reached. Failing the job.")
-            job_data.status = "E"
-            job_data.finished_at = timezone.now()
-            job_data.expires_at = timezone.now() + timedelta(
-                weeks=settings.JOB_EXPIRATION_WEEKS
-            )
-            job_data.save()
+            pipeline.cancel()
+            fail_job(job_data)
             raise
-        output_path_pdb = result_data.get("pdbFilePath")
-        output_path_json = result_data.get("jsonFilePath")
-
-        if not isinstance(output_path_pdb, str) or not isinstance(
-            output_path_json, str
-        ):
-            logger.error(
-                f"Invalid file paths returned from engine: PDB={output_path_pdb}, JSON={output_path_json}"
-            )
-            raise Exception("Engine returned invalid file paths (None or non-string)")
-
-        if not os.path.exists(output_path_pdb):
-            logger.error(f"Can't find {output_path_pdb}")
-            raise Exception(f"PDB file missing at {output_path_pdb}")
-
-        if not os.path.exists(output_path_json):
-            logger.error(f"Can't find {output_path_json}")
-            raise Exception(f"JSON file missing at {output_path_json}")
 
+        finished(run.seed, result_data)
         try:
-            with open(output_path_json, "r") as f:
-                json_data = json.load(f)
-            """"Get dotBracket from annotator and adjust it to match input structure strand breaks"""
-            dotbracket_from_annotator = json_data.get("dotBracket", "").split("\n")
-            reference_line = (
-                job_data.input_structure.read().decode("utf-8").split("\n")[1]
-            )
-            job_data.input_structure.seek(0)
-
-            split_indices = [i for i, char in enumerate(reference_line) if char == " "]
-            if split_indices:
-                new_dotbracket_list = []
-                for line in dotbracket_from_annotator[1:]:
-                    for index in sorted(split_indices):
-                        line = line[:index] + job_data.strand_separator + line[index:]
-                    new_dotbracket_list.append(line)
-                dotbracket_from_annotator = [
-                    dotbracket_from_annotator[0],
-                    new_dotbracket_list[0],
-                    new_dotbracket_list[1],
-                ]
-            dotbracket_from_annotator = "\n".join(dotbracket_from_annotator)
-            dotbracket_path = os.path.join(output_dir, f"{uuid_str}_{seed}.dotseq")
-            if dotbracket_from_annotator:
-                with open(dotbracket_path, "w") as dbn_file:
-                    dbn_file.write(dotbracket_from_annotator + "\n")
-            else:
-                logger.error("No dotBracket structure found in JSON")
+            pipeline.submit(run.seed, result_data, processing_start)
         except Exception as e:
-            logger.exception(f"Error processing JSON data: {e}")
+            logger.error(f"Post-processing failed, failing the job: {e}")
+            pipeline.cancel()
+            fail_job(job_data)
             raise
+    try:
+        pipeline.finish()
+    except Exception as e:
+        logger.error(f"Post-processing failed, failing the job: {e}")
+        fail_job(job_data)
+        raise
+    logger.info("Saved to database")
 
-        os.remove(output_path_json)
+    finalize_job(job_data, example_number)
 
-        if dotbracket_from_annotator:
-            secondary_structure_svg_path = os.path.join(
-                output_dir, f"{uuid_str}_{seed + i}.svg"
-            )
-            try:
-                drawVARNAgraph(dotbracket_path, secondary_structure_svg_path)
-            except Exception as e:
-                logger.error(f"Failed to generate secondary structure: {e}")
-                raise
+    return "OK"
 
-            arc_diagram_path = os.path.join(
-                output_dir, f"{uuid_str}_{seed + i}_arc.svg"
-            )
-            logger.info(f"{job_data.input_structure}")
-            try:
-                generateRchieDiagram(
-                    job_data.input_structure.path, dotbracket_path, arc_diagram_path
-                )
 
-            except Exception as e:
-                logger.error(f"Error generating arc diagram{e}")
-                raise
-            logger.info("Generated Arc and VARNA diagrams")
-            try:
-                target = job_data.input_structure.path
-                model = dotbracket_path
-                with open(target) as f:
-                    target_dict = dotbracketToPairs(
-                        f.read().replace(" ", "").replace("-", "")
-                    )
-                with open(model) as f:
-                    model_dict = dotbracketToPairs(
-                        f.read().replace(" ", "").replace("-", "")
-                    )
-                values = CalculateF1Inf(
-                    target_dict["correctPairs"], model_dict["correctPairs"]
-                )
-            except Exception as e:
-                logger.error(f"Error with generating F1 and INF value {e}")
-                raise
-            logger.info(f"Calculated inf and f1 values {values}")
+def reuse_memoized_results(job_data: Job) -> int:
+    """
+    Clones the conformations another job computed for the same structure, seed and model (RESULT_CACHE) into
+    the job, so the engine only runs the others. Jobs created with use_result_cache=False run every conformation.
+    Returns the number of reused conformations.
+    """
+    logger = get_task_logger(__name__)
 
-            relative_path_pdb = os.path.relpath(output_path_pdb, settings.MEDIA_ROOT)
-            relative_path_dotseq = os.path.relpath(dotbracket_path, settings.MEDIA_ROOT)
-            relative_path_svg = os.path.relpath(
-                secondary_structure_svg_path, settings.MEDIA_ROOT
-            )
-            relative_path_arc = os.path.relpath(arc_diagram_path, settings.MEDIA_ROOT)
+    if not settings.RESULT_CACHE or not job_data.use_result_cache:
+        return 0
+    saved = set(JobResults.objects.filter(job=job_data).values_list("seed", flat=True))
+    reused = 0
+    for i in range(job_data.alternative_conformations):
+        seed = job_data.seed + i
+        if seed in saved:
+            continue
+        key = result_key(job_data, seed)
+        source = find_memoized_result(key, job_data)
+        hit = source is not None and conformation_is_saved(source)
+        record_result_lookup(hit)
+        if source is None or not hit:
+            continue
+        clone_result(source, job_data, seed, key)
+        EngineRun.objects.update_or_create(
+            job=job_data, seed=seed, defaults={"status": EngineRunStatus.Completed}
+        )
+        logger.info(f"Reused conformation {seed} of job {source.job.uid}")
+        reused += 1
 
-            processing_end: datetime = timezone.now()
-            try:
-                job_result_qs: QuerySet = JobResults.objects.filter(job__exact=job_data)
-                if (
-                    job_result_qs.count() + 1 == job_data.alternative_conformations
-                ):  # check if current job result is the last one
-                    job_data.sum_processing_time = sum(
-                        [i.processing_time for i in job_result_qs], timedelta()
-                    ) + (processing_end - processing_start)
-                    job_data.save()
-                JobResults.objects.create(
-                    job=job_data,
-                    result_tertiary_structure=relative_path_pdb,
-                    result_secondary_structure_dotseq=relative_path_dotseq,
-                    result_secondary_structure_svg=relative_path_svg,
-                    result_arc_diagram=relative_path_arc,
-                    completed_at=processing_end,
-                    inf=values["inf"],
-                    f1=values["f1"],
-                    processing_time=(processing_end - processing_start),
-                )
-            except Exception as e:
-                logger.exception(f"Failed to create JobResults: {str(e)}")
-                raise
+    results = JobResults.objects.filter(job=job_data)
+    if reused and results.count() == job_data.alternative_conformations:
+        job_data.sum_processing_time = sum(
+            (result.processing_time for result in results), timedelta()
+        )
+        job_data.save()
+    return reused
+
+
+def conformation_is_saved(result: JobResults) -> bool:
+    """
+    The JobResults row and the files it points at are complete (the VARNA graph is drawn by finalize_job,
+    both diagrams are drawn when viewed with DIAGRAM_RENDERING="lazy").
+    """
+    files = [result.result_tertiary_structure]
+    if result.result_secondary_structure_dotseq:
+        files.append(result.result_secondary_structure_dotseq)
+        if settings.DIAGRAM_RENDERING != "lazy":
+            files.append(result.result_arc_diagram)
+    return all(file and os.path.exists(file.path) for file in files)
+
+
+def resume_engine_runs(job_data: Job) -> dict[int, EngineRun]:
+    """
+    Progress of the conformations of a job in the blocking dispatch mode, so a task redelivered after a worker
+    crash (CELERY_TASK_ACKS_LATE) or held by the circuit breaker resumes where it stopped instead of running
+    every conformation on the engine again.
+    Returns the EngineRun of every conformation without a complete JobResults row, in seed order: Pending,
+    Submitted (the engine may still be computing it) or Finished (its outputs may be on disk).
+    Incomplete rows of an interrupted conformation are removed.
+    """
+    results = list(JobResults.objects.filter(job=job_data))
+    saved = {result.seed for result in results if conformation_is_saved(result)}
+    for result in results:
+        if result.seed not in saved:
+            result.delete()
+
+    runs: dict[int, EngineRun] = {}
+    for i in range(job_data.alternative_conformations):
+        seed = job_data.seed + i
+        run, _ = EngineRun.objects.get_or_create(job=job_data, seed=seed)
+        if seed in saved:
+            if run.status != EngineRunStatus.Completed:
+                record_engine_runs(job_data, [seed], EngineRunStatus.Completed)
         else:
-            processing_end = timezone.now()
-            relative_path_pdb = os.path.relpath(output_path_pdb, settings.MEDIA_ROOT)
+            runs[seed] = run
+    return runs
 
-            try:
-                job_result_qs = JobResults.objects.filter(job__exact=job_data)
-                if (
-                    job_result_qs.count() + 1 == job_data.alternative_conformations
-                ):  # check if current job result is the last one
-                    job_data.sum_processing_time = sum(
-                        [i.processing_time for i in job_result_qs], timedelta()
-                    ) + (processing_end - processing_start)
-                    job_data.save()
-                JobResults.objects.create(
-                    job=job_data,
-                    result_tertiary_structure=relative_path_pdb,
-                    completed_at=processing_end,
-                    processing_time=(processing_end - processing_start),
-                )
-            except Exception as e:
-                logger.exception(f"Failed to create JobResults: {str(e)}")
-                raise
-    logger.info("Saved to database")
 
-    """Post-processing: replace spaces with input strand separator in input structure file"""
-    if job_data.strand_separator and job_data.strand_separator != " ":
+def engine_outputs_exist(run: EngineRun) -> bool:
+    return bool(
+        run.pdb_file_path
+        and run.json_file_path
+        and os.path.exists(run.pdb_file_path)
+        and os.path.exists(run.json_file_path)
+    )
+
+
+def record_engine_runs(
+    job_data: Job, seeds: list[int], status: EngineRunStatus, **fields: Any
+) -> None:
+    EngineRun.objects.filter(job=job_data, seed__in=seeds).update(
+        status=status, **fields
+    )
+
+
+def example_number_of(job_data: Job) -> int | None:
+    example = ExampleStructures.objects.filter(job=job_data).first()
+    return example.id if example is not None else None
+
+
+def start_engine_runs(job_data: Job) -> None:
+    """
+    Creates an EngineRun for every conformation of the job and submits the first ENGINE_CONFORMATION_FANOUT of them.
+    A job whose conformations were all reused from the result cache is finalized right away.
+    """
+    for i in range(job_data.alternative_conformations):
+        EngineRun.objects.get_or_create(job=job_data, seed=job_data.seed + i)
+    if not submit_next_engine_runs(job_data):
+        finalize_job_task.delay(job_data.uid)
+
+
+def submit_next_engine_runs(job_data: Job) -> bool:
+    """
+    Submits pending conformations of the job (in seed order) until ENGINE_CONFORMATION_FANOUT of them are in flight.
+    In the async mode queued runs are claimed by the engine dispatcher instead of submit_engine_run tasks.
+    Returns False if no conformation of the job is left to submit or waiting for the engine.
+    """
+    in_flight_statuses = [
+        EngineRunStatus.Queued,
+        EngineRunStatus.Submitted,
+        EngineRunStatus.Finished,
+    ]
+    with transaction.atomic():
+        # serializes concurrent process_engine_run tasks of the same job
+        Job.objects.select_for_update().get(pk=job_data.pk)
+        runs = EngineRun.objects.filter(job=job_data)
+        in_flight = runs.filter(status__in=in_flight_statuses).count()
+        free_slots = max(settings.ENGINE_CONFORMATION_FANOUT - in_flight, 0)
+        to_submit = list(
+            runs.filter(status=EngineRunStatus.Pending)
+            .order_by("seed")
+            .values_list("pk", flat=True)[:free_slots]
+        )
+        runs.filter(pk__in=to_submit).update(status=EngineRunStatus.Queued)
+
+    if settings.ENGINE_DISPATCH_MODE != "async":
+        for run_id in to_submit:
+            submit_engine_run.delay(run_id)
+    return in_flight + len(to_submit) > 0
+
+
+def next_check_delay(run: EngineRun, hint: float | None = None) -> float:
+    """
+    Countdown of the next check_engine_run. In callback mode the check is only a fallback for a lost callback,
+    in scheduled mode it follows the poll policy (ENGINE_POLL_POLICY).
+    """
+    if settings.ENGINE_DISPATCH_MODE == "callback":
+        return float(settings.ENGINE_CALLBACK_FALLBACK_SECONDS)
+    return get_poll_policy().next_delay(run.polls, hint)
+
+
+def fail_engine_run(run: EngineRun, message: str) -> None:
+    """
+    Marks the run and its job as failed. Remaining conformations of the job are not submitted
+    and the ones still computed by the engine are cancelled.
+    """
+    logger = get_task_logger(__name__)
+    logger.error(f"Engine run {run} failed: {message}")
+
+    run.status = EngineRunStatus.Error
+    run.error = message
+    run.save()
+    EngineRun.objects.filter(
+        job=run.job, status__in=[EngineRunStatus.Pending, EngineRunStatus.Queued]
+    ).update(status=EngineRunStatus.Error, error="Job failed")
+    if EngineRun.objects.filter(job=run.job, status=EngineRunStatus.Submitted).update(
+        status=EngineRunStatus.Error, error="Job failed"
+    ):
         try:
-            with job_data.input_structure.open("r") as f:
-                input_data = f.read().decode("utf-8")
-                input_data = input_data.replace(" ", job_data.strand_separator)
+            get_engine_client().cancel(str(run.job.uid))
+        except (requests.RequestException, CircuitOpenError) as e:
+            logger.error(f"Failed to cancel engine request: {e}")
+    fail_job(run.job)
 
-            with job_data.input_structure.open("w") as f:
-                f.write(input_data)
-        except Exception as e:
-            logger.error(f"Error replacing spaces in input structure: {e}")
+
+@shared_task(queue="grapharna", bind=True)
+def submit_engine_run(self: Any, run_id: int) -> str:
+    logger = get_task_logger(__name__)
+
+    run: EngineRun = EngineRun.objects.select_related("job").get(pk=run_id)
+    if run.status not in (EngineRunStatus.Pending, EngineRunStatus.Queued):
+        return "Already submitted"
+
+    extra: dict[str, Any] = {}
+    if settings.ENGINE_CALLBACK_URL:
+        extra = {
+            "callback_url": settings.ENGINE_CALLBACK_URL,
+            "callback_token": settings.ENGINE_CALLBACK_TOKEN,
+        }
+
+    try:
+        response = get_engine_client().run(str(run.job.uid), run.seed, **extra)
+        response.raise_for_status()
+    except CircuitOpenError as e:
+        if settings.ENGINE_BREAKER_OPEN_ACTION == "fail":
+            fail_engine_run(run, str(e))
+            return "Engine unavailable"
+        submit_engine_run.apply_async((run.pk,), countdown=max(e.retry_in, 1))
+        return "Held"
+    except requests.RequestException as e:
+        if self.request.retries >= settings.ENGINE_REQUEST_MAX_RETRIES:
+            fail_engine_run(run, f"Failed to contact engine: {e}")
             raise
-    if example_number is None:  # not an example job
-        job_data.expires_at = timezone.now() + timedelta(
-            weeks=settings.JOB_EXPIRATION_WEEKS
-        )
-    job_data.finished_at = timezone.now()
-    job_data.status = "C"
-    job_data.save()
+        logger.warning(f"Engine request failed for {run}, retrying. Error: {e}")
+        raise self.retry(exc=e, countdown=settings.ENGINE_REQUEST_RETRY_DELAY)
 
-    if example_number is not None:  # example job
-        ExampleStructures.objects.create(
-            id=example_number,
-            job=job_data,
+    run.status = EngineRunStatus.Submitted
+    run.submitted_at = timezone.now()
+    run.save()
+
+    check_engine_run.apply_async((run.pk,), countdown=next_check_delay(run))
+    return "Submitted"
+
+
+@shared_task(queue="grapharna")
+def check_engine_run(run_id: int, reschedule: bool = True) -> str:
+    """
+    Checks the engine status of a submitted run once, without sleeping, so the worker is busy
+    for one HTTP call instead of the whole engine run.
+    Finished runs are handed to process_engine_run; with reschedule the check re-enqueues itself
+    with a countdown while the engine is still computing (the callback triggers a single check with reschedule=False).
+    """
+    logger = get_task_logger(__name__)
+
+    run: EngineRun = EngineRun.objects.select_related("job").get(pk=run_id)
+    if run.status != EngineRunStatus.Submitted:
+        return "Not submitted"
+
+    client = get_engine_client()
+    uuid_str = str(run.job.uid)
+
+    if (
+        timezone.now() - run.submitted_at
+    ).total_seconds() > settings.ENGINE_TIMEOUT_SECONDS:
+        try:
+            client.cancel(uuid_str)
+        except (requests.RequestException, CircuitOpenError) as e:
+            logger.error(f"Failed to cancel engine request: {e}")
+        fail_engine_run(run, "Engine operation timed out")
+        return "Timed out"
+
+    hint: float | None = None
+    try:
+        status_resp = client.status(uuid_str, run.seed)
+    except requests.RequestException as e:
+        logger.warning(f"Failed to get status of {run} from engine: {e}")
+        status_resp = None
+    except CircuitOpenError as e:
+        status_resp = None
+        hint = e.retry_in  # check again once the engine health is probed
+
+    if status_resp is not None and status_resp.status_code == 200:
+        result: dict[str, Any] = status_resp.json()
+        claimed = EngineRun.objects.filter(
+            pk=run.pk, status=EngineRunStatus.Submitted
+        ).update(
+            status=EngineRunStatus.Finished,
+            finished_at=timezone.now(),
+            pdb_file_path=result.get("pdbFilePath"),
+            json_file_path=result.get("jsonFilePath"),
         )
+        if claimed:  # the callback and the fallback check may both see the result
+            process_engine_run.delay(run.pk)
+        return "Finished"
+
+    if status_resp is not None and status_resp.status_code != 202:
+        fail_engine_run(
+            run,
+            f"Engine reported error: {status_resp.status_code} {status_resp.text}",
+        )
+        return "Error"
 
-    if job_data.email:
-        url = f"{settings.RESULT_BASE_URL}?uidh={job_data.hashed_uid}"
-        send_email_task.delay(
-            receiver_email=job_data.email,
-            template_path=settings.TEMPLATE_PATH_JOB_FINISHED,
-            title=settings.TITLE_JOB_FINISHED,
-            url=url,
+    if reschedule:
+        if status_resp is not None:
+            hint = retry_after(status_resp)
+        delay = next_check_delay(run, hint)
+        EngineRun.objects.filter(pk=run.pk).update(polls=F("polls") + 1)
+        check_engine_run.apply_async((run.pk,), countdown=delay)
+    return "Running"
+
+
+@shared_task(queue="grapharna")
+def process_engine_run(run_id: int) -> str:
+    """Post-processes a finished run, then submits the next conformations or finalizes the job."""
+    run: EngineRun = EngineRun.objects.select_related("job").get(pk=run_id)
+    if run.status != EngineRunStatus.Finished:
+        return "Not finished"
+
+    job_data: Job = run.job
+    try:
+        process_engine_output(
+            job_data,
+            run.seed,
+            {"pdbFilePath": run.pdb_file_path, "jsonFilePath": run.json_file_path},
+            run.submitted_at,
         )
-    logger.info("GraphaRNA run completed successfully.")
+    except Exception as e:
+        fail_engine_run(run, f"Post-processing failed: {e}")
+        raise
+
+    run.status = EngineRunStatus.Completed
+    run.save()
 
+    if not submit_next_engine_runs(job_data):
+        finalize_job_task.delay(job_data.uid)
+    return "OK"
+
+
+@shared_task(queue="grapharna")
+def finalize_job_task(uuid_param: UUID) -> str:
+    """Last step of the non-blocking dispatch modes, run once every conformation of the job is completed."""
+    logger = get_task_logger(__name__)
+
+    job_data: Job = Job.objects.get(uid=uuid_param)
+    if job_data.status in ("C", "E"):
+        return "Job already finished"
+
+    runs = EngineRun.objects.filter(job=job_data)
+    if runs.exclude(status=EngineRunStatus.Completed).exists():
+        logger.warning(f"Job {uuid_param} has unfinished conformations.")
+        return "Not finished"
+
+    finalize_job(job_data, example_number_of(job_data))
     return "OK"
 
 
@@ -476,11 +1419,7 @@ def test_grapharna_run() -> str:
     with open(input_path, "w") as f:
         f.write(tekst)
 
-    engine_test_url = settings.ENGINE_TEST_URL
-
-    response = requests.post(
-        engine_test_url,
-    )
+    response = get_engine_client().test()
 
     assert response.status_code == 200, f"Error: {response.text}"
 
@@ -0,0 +1,81 @@
+import os
+import re
+import tempfile
+from xml.etree import ElementTree as ET
+from django.test import SimpleTestCase, override_settings
+from webapp.visualization_tools import generateRchieDiagram
+
+SVG = "{http://www.w3.org/2000/svg}"
+
+
+class ArcDiagramTests(SimpleTestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.target = os.path.join(directory.name, "target.dotseq")
+        self.model = os.path.join(directory.name, "model.dotseq")
+        self.output = os.path.join(directory.name, "arc.svg")
+        with open(self.target, "w") as f:
+            f.write(">a\nGGGAAACCCAGGAAACC\n(((...)))..(...).\n")
+        with open(self.model, "w") as f:
+            f.write(">a\nGGGAAACCCAGGAAACC\n((.....)).((...))\n")
+
+    def arcs(self, root: ET.Element, color: str) -> list[int]:
+        """Number of arcs in every path of the colour (attribute or class of the optimizer)."""
+        style = root.find(f"{SVG}style")
+        rules = (
+            dict(re.findall(r"\.(\w+)\{([^}]*)\}", style.text or ""))
+            if style is not None
+            else {}
+        )
+
+        def stroke(path: ET.Element) -> str | None:
+            declarations = rules.get(path.attrib.get("class", ""), "").split(";")
+            css = dict(d.split(":", 1) for d in declarations if d)
+            return path.attrib.get("stroke", css.get("stroke"))
+
+        return [
+            path.attrib["d"].count("A")
+            for path in root.iter(f"{SVG}path")
+            if stroke(path) == color and "A" in path.attrib["d"]
+        ]
+
+    def test_arcs_compare_input_and_output(self) -> None:
+        result = generateRchieDiagram(self.target, self.model, self.output)
+
+        self.assertEqual(result, "OK " + self.output)
+        root = ET.parse(self.output).getroot()
+        self.assertEqual(self.arcs(root, "red"), [1])  # (3, 7)
+        self.assertEqual(self.arcs(root, "green"), [3, 3])  # top and bottom
+        self.assertEqual(self.arcs(root, "blue"), [1])  # (11, 17)
+
+    def test_sequence_and_legend(self) -> None:
+        generateRchieDiagram(self.target, self.model, self.output)
+
+        texts = [
+            "".join(text.itertext())
+            for text in ET.parse(self.output).getroot().iter(f"{SVG}text")
+        ]
+        self.assertIn("GGGAAACCCAGGAAACC", texts)  # one text element
+        self.assertIn("10", texts[texts.index("GGGAAACCCAGGAAACC") + 1])
+        for label in (
+            "Input Structure",
+            "Output Structure",
+            "Missing (Input only)",
+            "Common (Match)",
+            "Added (Output only)",
+        ):
+            self.assertIn(label, texts)
+
+    @override_settings(ARC_DIAGRAM_RENDERER="matplotlib")
+    def test_matplotlib_renderer(self) -> None:
+        result = generateRchieDiagram(self.target, self.model, self.output)
+
+        self.assertEqual(result, "OK " + self.output)
+        ET.parse(self.output)
+
+    def test_unreadable_input(self) -> None:
+        result = generateRchieDiagram(self.target + ".missing", self.model, self.output)
+
+        self.assertTrue(result.startswith("ERROR"))
+        self.assertFalse(os.path.exists(self.output))
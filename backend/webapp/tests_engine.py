@@ -0,0 +1,1443 @@
+import heapq
+import itertools
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from time import monotonic, sleep
+from typing import Any
+from unittest.mock import AsyncMock, patch
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+import httpx
+import requests
+from benchmarks.fake_engine import FakeEngine
+from webapp import engine_client
+from webapp import metrics
+from webapp.circuit_breaker import CircuitOpenError
+from webapp.engine_client import (
+    AsyncEngineClient,
+    EngineClient,
+    PartialSubmissionError,
+    get_engine_breaker,
+    get_engine_client,
+    reset_engine_client,
+    retry_after,
+)
+from webapp.postprocessing import get_postprocessing_pool, reset_postprocessing_pool
+from webapp.poll_policies import (
+    ExponentialBackoffPolicy,
+    FixedIntervalPolicy,
+    PollPolicy,
+    get_poll_policy,
+)
+from webapp.engine_dispatcher import EngineCapacity, EngineDispatcher
+from webapp.models import (
+    CircuitState,
+    EngineRun,
+    EngineRunStatus,
+    Job,
+    JobResults,
+    Metric,
+)
+from webapp import tasks
+from webapp.tasks import execute_and_poll_engine, execute_and_poll_engine_runs
+
+
+class FakeWorker:
+    """
+    Replaces the broker for the given tasks: published tasks are kept in memory and run() executes them
+    one at a time in eta order, like a single worker process with concurrency=1.
+    """
+
+    def __init__(self, *celery_tasks: Any) -> None:
+        self.queue: list[tuple[float, int, Any, tuple, dict]] = []
+        self.counter = itertools.count()
+        self.executed: list[str] = []
+        self.durations: list[float] = []
+        self.patchers = [
+            patch.object(task, "apply_async", partial(self.publish, task))
+            for task in celery_tasks
+        ]
+
+    def __enter__(self) -> "FakeWorker":
+        for patcher in self.patchers:
+            patcher.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def publish(
+        self,
+        task: Any,
+        args: tuple | None = None,
+        kwargs: dict | None = None,
+        countdown: float | None = None,
+        **options: Any,
+    ) -> None:
+        eta = monotonic() + (countdown or 0)
+        heapq.heappush(
+            self.queue,
+            (eta, next(self.counter), task, tuple(args or ()), dict(kwargs or {})),
+        )
+
+    def run(self, max_tasks: int = 1000) -> None:
+        while self.queue and len(self.executed) < max_tasks:
+            eta, _, task, args, kwargs = heapq.heappop(self.queue)
+            if eta > monotonic():
+                sleep(eta - monotonic())
+            self.executed.append(task.name.rsplit(".", 1)[-1])
+            start = monotonic()
+            task(*args, **kwargs)
+            self.durations.append(monotonic() - start)
+
+
+def fake_process_engine_output(
+    job_data: Job, seed: int, result_data: dict[str, Any], processing_start: datetime
+) -> JobResults:
+    return JobResults.objects.create(
+        job=job_data,
+        seed=seed,
+        result_tertiary_structure=result_data["pdbFilePath"],
+        processing_time=timezone.now() - processing_start,
+    )
+
+
+class EngineClientTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.engine = FakeEngine().start()
+        self.addCleanup(self.engine.stop)
+        self.engine_client = EngineClient(
+            self.engine.url, pool_size=2, connect_timeout=1, read_timeout=1
+        )
+        self.addCleanup(self.engine_client.close)
+
+    def test_connection_is_reused(self) -> None:
+        self.assertEqual(self.engine_client.run("abc", 1).status_code, 202)
+        for _ in range(10):
+            self.assertEqual(self.engine_client.status("abc", 1).status_code, 200)
+        self.engine_client.cancel("abc")
+
+        self.assertEqual(self.engine.requests, {"run": 1, "status": 10, "cancel": 1})
+        self.assertEqual(self.engine.connections, 1)
+
+    def test_timeouts_from_settings(self) -> None:
+        with override_settings(
+            ENGINE_URL=self.engine.url,
+            ENGINE_POOL_SIZE=3,
+            ENGINE_CONNECT_TIMEOUT_SECONDS=2,
+            ENGINE_READ_TIMEOUT_SECONDS=7,
+        ):
+            client = EngineClient()
+        self.assertEqual(client.pool_size, 3)
+        self.assertEqual(client.timeout, (2, 7))
+
+
+class FakeEngineOutputTests(SimpleTestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        with open(os.path.join(self.directory, "abc.dotseq"), "w") as f:
+            f.write(">job\nGCGCU AGCGC\n((((. .))))")
+        self.engine = FakeEngine(
+            output_dir=self.directory, input_dir=self.directory
+        ).start()
+        self.addCleanup(self.engine.stop)
+        self.engine_client = EngineClient(
+            self.engine.url, pool_size=1, connect_timeout=1, read_timeout=1
+        )
+        self.addCleanup(self.engine_client.close)
+
+    def test_finished_run_writes_outputs(self) -> None:
+        self.engine_client.run("abc", 3)
+        result = self.engine_client.status("abc", 3).json()
+
+        self.assertEqual(
+            result["pdbFilePath"], os.path.join(self.directory, "abc_3.pdb")
+        )
+        with open(result["jsonFilePath"]) as f:
+            name, sequence, structure = json.load(f)["dotBracket"].split("\n")
+        self.assertEqual(sequence, "GCGCUAGCGC")
+        self.assertEqual(len(structure), len(sequence))
+        with open(result["pdbFilePath"]) as f:
+            atoms = [line for line in f if line.startswith("ATOM")]
+        self.assertEqual(len(atoms), 2 * len(sequence))
+        self.assertEqual(atoms[-1][21], "B")  # second strand, second chain
+
+    def test_failure_rate(self) -> None:
+        self.engine.failure_rate = 1.0
+        self.engine_client.run("abc", 3)
+        self.assertEqual(self.engine_client.status("abc", 3).status_code, 500)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "abc_3.pdb")))
+
+    def test_self_test(self) -> None:
+        with override_settings(ENGINE_TEST_URL=f"{self.engine.url}/test"):
+            response = self.engine_client.test()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(os.path.exists(response.json()["jsonFilePath"]))
+
+
+class GetEngineClientTests(SimpleTestCase):
+    def setUp(self) -> None:
+        reset_engine_client()
+        self.addCleanup(reset_engine_client)
+
+    def test_one_client_per_process(self) -> None:
+        self.assertIs(get_engine_client(), get_engine_client())
+
+    def test_new_client_after_fork(self) -> None:
+        parent_client = get_engine_client()
+        with patch.object(engine_client.os, "getpid", return_value=-1):
+            child_client = get_engine_client()
+        self.assertIsNot(parent_client, child_client)
+
+
+class IncompletePolicy(PollPolicy):
+    """A policy without next_delay, as a misconfigured ENGINE_POLL_POLICY could name."""
+
+
+class PollPolicyTests(SimpleTestCase):
+    def test_exponential_growth_is_capped(self) -> None:
+        policy = ExponentialBackoffPolicy(initial=0.5, factor=2, max_delay=3, jitter=0)
+        delays = [policy.next_delay(attempt) for attempt in range(5)]
+        self.assertEqual(delays, [0.5, 1, 2, 3, 3])
+
+    def test_long_runs_stay_at_the_cap(self) -> None:
+        for factor in (1.5, 2, 10):
+            policy = ExponentialBackoffPolicy(
+                initial=0.5, factor=factor, max_delay=30, jitter=0
+            )
+            self.assertEqual(policy.next_delay(100_000), 30)
+        policy = ExponentialBackoffPolicy(
+            initial=0.5, factor=0.5, max_delay=30, jitter=0
+        )
+        self.assertEqual(policy.next_delay(100_000), 0)
+
+    @override_settings(ENGINE_POLL_POLICY="webapp.tests_engine.IncompletePolicy")
+    def test_incomplete_policy_fails_when_instantiated(self) -> None:
+        with self.assertRaises(TypeError):
+            get_poll_policy()
+
+    def test_jitter_bounds(self) -> None:
+        policy = ExponentialBackoffPolicy(initial=1, factor=1, max_delay=10, jitter=0.2)
+        for _ in range(100):
+            self.assertTrue(0.8 <= policy.next_delay(0) <= 1.2)
+
+    def test_hint_replaces_backoff(self) -> None:
+        policy = ExponentialBackoffPolicy(initial=0.5, factor=2, max_delay=30, jitter=0)
+        self.assertEqual(policy.next_delay(0, hint=7), 7)
+        self.assertEqual(policy.next_delay(0, hint=100), 30)
+
+    def test_fixed_interval_ignores_hint(self) -> None:
+        self.assertEqual(FixedIntervalPolicy(60).next_delay(3, hint=1), 60)
+
+    def test_policy_from_settings(self) -> None:
+        with override_settings(
+            ENGINE_POLL_POLICY="webapp.poll_policies.FixedIntervalPolicy",
+            ENGINE_POLL_INTERVAL_SECONDS=15,
+        ):
+            policy = get_poll_policy()
+        self.assertIsInstance(policy, FixedIntervalPolicy)
+        self.assertEqual(policy.next_delay(0), 15)
+
+
+class RetryAfterTests(SimpleTestCase):
+    def make_response(
+        self, headers: dict[str, str], body: bytes = b""
+    ) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 202
+        response.headers.update(headers)
+        response._content = body
+        return response
+
+    def test_retry_after_seconds(self) -> None:
+        self.assertEqual(retry_after(self.make_response({"Retry-After": "4"})), 4)
+
+    def test_retry_after_http_date(self) -> None:
+        response = self.make_response({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+        self.assertEqual(retry_after(response), 0)
+
+    def test_eta_in_body(self) -> None:
+        response = self.make_response({}, b'{"status": "processing", "eta": 2.5}')
+        self.assertEqual(retry_after(response), 2.5)
+
+    def test_no_hint(self) -> None:
+        self.assertIsNone(retry_after(self.make_response({}, b"not json")))
+
+
+class ExecuteAndPollEngineTests(TestCase):
+    def setUp(self) -> None:
+        self.engine = FakeEngine(run_seconds=0.05).start()
+        self.addCleanup(self.engine.stop)
+        reset_engine_client()
+        self.addCleanup(reset_engine_client)
+
+    def test_polls_until_finished(self) -> None:
+        with override_settings(ENGINE_URL=self.engine.url):
+            result = execute_and_poll_engine("abc", 3, check_interval=0)
+
+        self.assertEqual(result, self.engine.result("abc", 3))
+        self.assertEqual(self.engine.requests["run"], 1)
+        self.assertEqual(self.engine.connections, 1)
+
+    def test_eta_hint_is_followed(self) -> None:
+        self.engine.send_eta = True
+        policy = ExponentialBackoffPolicy(initial=10, factor=1, max_delay=10, jitter=0)
+        with override_settings(ENGINE_URL=self.engine.url):
+            execute_and_poll_engine("abc", 3, poll_policy=policy)
+
+        # the first status call reports the eta, the second one gets the result
+        self.assertEqual(self.engine.requests["status"], 2)
+
+    def test_transport_errors_wait_the_retry_delay(self) -> None:
+        policy = ExponentialBackoffPolicy(initial=0, factor=1, max_delay=0, jitter=0)
+        with (
+            override_settings(
+                ENGINE_URL=self.engine.url,
+                ENGINE_REQUEST_MAX_RETRIES=3,
+                ENGINE_REQUEST_RETRY_DELAY=7,
+            ),
+            patch.object(
+                EngineClient, "status", side_effect=requests.ConnectionError("down")
+            ),
+            patch("webapp.tasks.sleep") as sleep_mock,
+        ):
+            with self.assertRaisesRegex(Exception, "Max retries"):
+                execute_and_poll_engine("abc", 3, poll_policy=policy)
+
+        self.assertEqual([c.args for c in sleep_mock.call_args_list], [(7,)] * 3)
+        self.assertEqual(self.engine.requests["run"], 1)
+
+
+@override_settings(
+    ENGINE_DISPATCH_MODE="callback",
+    ENGINE_CALLBACK_TOKEN="secret",
+    ENGINE_CALLBACK_FALLBACK_SECONDS=0.05,
+)
+class CallbackDispatchTests(TestCase):
+    def setUp(self) -> None:
+        self.engine = FakeEngine(run_seconds=0.1).start()
+        self.addCleanup(self.engine.stop)
+        reset_engine_client()
+        self.addCleanup(reset_engine_client)
+
+        settings_patcher = override_settings(ENGINE_URL=self.engine.url)
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+
+        output_patcher = patch(
+            "webapp.tasks.process_engine_output", fake_process_engine_output
+        )
+        output_patcher.start()
+        self.addCleanup(output_patcher.stop)
+
+        self.job = Job.objects.create(
+            input_structure="engine_inputs/test.dotseq",
+            strand_separator=" ",
+            seed=10,
+            job_name="callback-job",
+            status="Q",
+            alternative_conformations=2,
+        )
+        self.worker = FakeWorker(
+            tasks.submit_engine_run,
+            tasks.check_engine_run,
+            tasks.process_engine_run,
+            tasks.finalize_job_task,
+        )
+        self.worker.__enter__()
+        self.addCleanup(self.worker.__exit__)
+
+    def test_runs_conformations_without_blocking(self) -> None:
+        tasks.run_grapharna_task(self.job.uid)
+        self.worker.run()
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "C")
+        self.assertEqual(JobResults.objects.filter(job=self.job).count(), 2)
+        self.assertEqual(
+            list(EngineRun.objects.filter(job=self.job).values_list("seed", "status")),
+            [(10, EngineRunStatus.Completed), (11, EngineRunStatus.Completed)],
+        )
+        self.assertEqual(self.engine.requests["run"], 2)
+
+    def test_callback_schedules_status_check(self) -> None:
+        tasks.run_grapharna_task(self.job.uid)
+        self.worker.run(max_tasks=1)  # submit the first conformation
+        self.worker.queue.clear()  # drop the fallback check
+
+        response = APIClient().post(
+            reverse("engineCallback"),
+            {"uuid": str(self.job.uid), "seed": 10},
+            format="json",
+            HTTP_X_ENGINE_TOKEN="secret",
+        )
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(self.worker.queue), 1)
+        _, _, task, args, kwargs = self.worker.queue[0]
+        self.assertIs(task, tasks.check_engine_run)
+        self.assertEqual(kwargs, {"reschedule": False})
+
+    def test_callback_rejects_invalid_token(self) -> None:
+        response = APIClient().post(
+            reverse("engineCallback"),
+            {"uuid": str(self.job.uid), "seed": 10},
+            format="json",
+            HTTP_X_ENGINE_TOKEN="wrong",
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_callback_for_unknown_run(self) -> None:
+        response = APIClient().post(
+            reverse("engineCallback"),
+            {"uuid": str(self.job.uid), "seed": 99},
+            format="json",
+            HTTP_X_ENGINE_TOKEN="secret",
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(
+    ENGINE_DISPATCH_MODE="scheduled",
+    ENGINE_POLL_POLICY="webapp.poll_policies.ExponentialBackoffPolicy",
+    ENGINE_POLL_INITIAL_SECONDS=0.02,
+    ENGINE_POLL_BACKOFF_FACTOR=1.5,
+    ENGINE_POLL_MAX_SECONDS=0.1,
+    ENGINE_POLL_JITTER=0,
+)
+class ScheduledDispatchTests(TestCase):
+    run_seconds = 0.2
+
+    def setUp(self) -> None:
+        self.engine = FakeEngine(run_seconds=self.run_seconds).start()
+        self.addCleanup(self.engine.stop)
+        reset_engine_client()
+        self.addCleanup(reset_engine_client)
+
+        settings_patcher = override_settings(ENGINE_URL=self.engine.url)
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+
+        output_patcher = patch(
+            "webapp.tasks.process_engine_output", fake_process_engine_output
+        )
+        output_patcher.start()
+        self.addCleanup(output_patcher.stop)
+
+        self.worker = FakeWorker(
+            tasks.run_grapharna_task,
+            tasks.submit_engine_run,
+            tasks.check_engine_run,
+            tasks.process_engine_run,
+            tasks.finalize_job_task,
+        )
+        self.worker.__enter__()
+        self.addCleanup(self.worker.__exit__)
+
+    def create_job(self, n: int, conformations: int) -> Job:
+        return Job.objects.create(
+            input_structure=f"engine_inputs/test_{n}.dotseq",
+            strand_separator=" ",
+            seed=100 * n,
+            job_name=f"scheduled-job-{n}",
+            status="Q",
+            alternative_conformations=conformations,
+        )
+
+    def test_concurrent_jobs_progress_with_single_worker(self) -> None:
+        jobs_count, conformations = 5, 2
+        jobs = [self.create_job(n, conformations) for n in range(jobs_count)]
+        for job in jobs:
+            tasks.run_grapharna_task.delay(job.uid)
+
+        start = monotonic()
+        self.worker.run()
+        elapsed = monotonic() - start
+
+        for job in jobs:
+            job.refresh_from_db()
+            self.assertEqual(job.status, "C")
+            self.assertEqual(JobResults.objects.filter(job=job).count(), conformations)
+        self.assertEqual(self.engine.requests["run"], jobs_count * conformations)
+
+        # one worker kept every job in flight: the wall time is close to the engine time
+        # of a single job, not the sum over all jobs, and no task waited for the engine
+        sequential = jobs_count * conformations * self.run_seconds
+        self.assertLess(elapsed, sequential / 2)
+        self.assertLess(max(self.worker.durations), self.run_seconds)
+
+    def test_progress_is_persisted_per_conformation(self) -> None:
+        job = self.create_job(0, 3)
+        tasks.run_grapharna_task.delay(job.uid)
+        self.worker.run(max_tasks=3)  # run_grapharna_task, submit, first check
+
+        runs = EngineRun.objects.filter(job=job).order_by("seed")
+        self.assertEqual(
+            [run.status for run in runs],
+            [
+                EngineRunStatus.Submitted,
+                EngineRunStatus.Pending,
+                EngineRunStatus.Pending,
+            ],
+        )
+        self.assertEqual(runs[0].polls, 1)
+
+    def test_engine_error_fails_job(self) -> None:
+        job = self.create_job(0, 2)
+        tasks.run_grapharna_task.delay(job.uid)
+        self.worker.run(max_tasks=2)  # run_grapharna_task, submit
+        self.engine.cancelled.add(str(job.uid))  # status now reports an error
+        self.worker.run()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "E")
+        self.assertEqual(
+            list(EngineRun.objects.filter(job=job).values_list("status", flat=True)),
+            [EngineRunStatus.Error, EngineRunStatus.Error],
+        )
+
+
+@override_settings(
+    ENGINE_POLL_POLICY="webapp.poll_policies.FixedIntervalPolicy",
+    ENGINE_POLL_INTERVAL_SECONDS=0.02,
+)
+class ConformationFanoutTests(TestCase):
+    run_seconds = 0.2
+
+    def setUp(self) -> None:
+        self.engine = FakeEngine(run_seconds=self.run_seconds).start()
+        self.addCleanup(self.engine.stop)
+        reset_engine_client()
+        self.addCleanup(reset_engine_client)
+
+        settings_patcher = override_settings(ENGINE_URL=self.engine.url)
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+
+        output_patcher = patch(
+            "webapp.tasks.process_engine_output", fake_process_engine_output
+        )
+        output_patcher.start()
+        self.addCleanup(output_patcher.stop)
+
+        self.job = Job.objects.create(
+            input_structure="engine_inputs/test.dotseq",
+            strand_separator=" ",
+            seed=10,
+            job_name="fanout-job",
+            status="Q",
+            alternative_conformations=4,
+        )
+
+    def run_blocking(self, fanout: int) -> float:
+        start = monotonic()
+        with override_settings(ENGINE_CONFORMATION_FANOUT=fanout):
+            tasks.run_grapharna_task(self.job.uid)
+        return monotonic() - start
+
+    def test_conformations_run_together(self) -> None:
+        elapsed = self.run_blocking(fanout=4)
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "C")
+        self.assertEqual(
+            sorted(
+                JobResults.objects.filter(job=self.job).values_list("seed", flat=True)
+            ),
+            [10, 11, 12, 13],
+        )
+        self.assertEqual(self.engine.requests["run"], 4)
+        self.assertLess(elapsed, 2 * self.run_seconds)
+
+    def test_fanout_limit(self) -> None:
+        elapsed = self.run_blocking(fanout=2)
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "C")
+        # 4 conformations, 2 at a time: two rounds of engine runs
+        self.assertGreaterEqual(elapsed, 2 * self.run_seconds)
+        self.assertLess(elapsed, 3 * self.run_seconds)
+
+    def test_backoff_is_per_run(self) -> None:
+        attempts: dict[int, list[int]] = {}
+
+        class RecordingPolicy(PollPolicy):
+            def next_delay(self, attempt: int, hint: float | None = None) -> float:
+                attempts.setdefault(len(attempts_seen), []).append(attempt)
+                return 0.02
+
+        attempts_seen: list[int] = []
+        polled: list[list[int]] = []
+        for seed, _, _ in execute_and_poll_engine_runs(
+            "abc",
+            [1, 2],
+            fanout=1,
+            poll_policy=RecordingPolicy(),
+            on_poll=polled.append,
+        ):
+            attempts_seen.append(seed)
+
+        # the run submitted after the first one finished starts at attempt 0 again
+        self.assertEqual(attempts[0][0], 0)
+        self.assertEqual(attempts[1][0], 0)
+        self.assertEqual(attempts[1], list(range(len(attempts[1]))))
+        self.assertEqual({seed for seeds in polled for seed in seeds}, {1, 2})
+
+    def test_resumed_runs_keep_their_backoff(self) -> None:
+        attempts: list[int] = []
+
+        class RecordingPolicy(PollPolicy):
+            def next_delay(self, attempt: int, hint: float | None = None) -> float:
+                attempts.append(attempt)
+                return 0.02
+
+        self.engine.start_run("abc", 1)
+        list(
+            execute_and_poll_engine_runs(
+                "abc",
+                [1],
+                fanout=1,
+                poll_policy=RecordingPolicy(),
+                submitted=[1],
+                polls={1: 7},
+            )
+        )
+
+        self.assertEqual(attempts[0], 7)
+
+    def test_engine_error_fails_job(self) -> None:
+        with (
+            patch.object(self.engine, "run_status", return_value=(500, {})),
+            override_settings(
+                ENGINE_REQUEST_MAX_RETRIES=2, ENGINE_REQUEST_RETRY_DELAY=0
+            ),
+            self.assertRaises(Exception),
+        ):
+            self.run_blocking(fanout=2)
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "E")
+
+    @override_settings(ENGINE_DISPATCH_MODE="scheduled", ENGINE_CONFORMATION_FANOUT=2)
+    def test_scheduled_mode_keeps_fanout_runs_in_flight(self) -> None:
+        with FakeWorker(
+            tasks.submit_engine_run,
+            tasks.check_engine_run,
+            tasks.process_engine_run,
+            tasks.finalize_job_task,
+        ) as worker:
+            tasks.run_grapharna_task(self.job.uid)
+            worker.run(max_tasks=2)  # both submits
+
+            self.assertEqual(
+                list(
+                    EngineRun.objects.filter(job=self.job)
+                    .order_by("seed")
+                    .values_list("status", flat=True)
+                ),
+                [
+                    EngineRunStatus.Submitted,
+                    EngineRunStatus.Submitted,
+                    EngineRunStatus.Pending,
+                    EngineRunStatus.Pending,
+                ],
+            )
+
+            worker.run()
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "C")
+        self.assertEqual(JobResults.objects.filter(job=self.job).count(), 4)
+
+    def test_results_are_ordered_by_seed(self) -> None:
+        self.job.status = "C"
+        self.job.hashed_uid = "fanout"
+        self.job.save()
+        for seed in (12, 10, 13, 11):  # completion order of concurrent runs
+            JobResults.objects.create(job=self.job, seed=seed)
+
+        response = APIClient().get(reverse("getResults"), {"uidh": "fanout"})
+
+        self.assertEqual(
+            [result["seed"] for result in response.data["result_list"]],
+            [10, 11, 12, 13],
+        )
+
+
+@override_settings(
+    ENGINE_POLL_POLICY="webapp.poll_policies.FixedIntervalPolicy",
+    ENGINE_POLL_INTERVAL_SECONDS=0.02,
+)
+class PipelinedPostProcessingTests(TestCase):
+    def setUp(self) -> None:
+        self.engine = FakeEngine(run_seconds=0.2).start()
+        self.addCleanup(self.engine.stop)
+        reset_engine_client()
+        self.addCleanup(reset_engine_client)
+        settings_patcher = override_settings(ENGINE_URL=self.engine.url)
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+
+        pool = ThreadPoolExecutor(2)
+        self.addCleanup(pool.shutdown)
+        pool_patcher = patch("webapp.tasks.get_postprocessing_pool", return_value=pool)
+        pool_patcher.start()
+        self.addCleanup(pool_patcher.stop)
+
+        self.job = Job.objects.create(
+            input_structure="engine_inputs/test.dotseq",
+            strand_separator=" ",
+            seed=10,
+            job_name="pipelined-job",
+            status="Q",
+            alternative_conformations=3,
+        )
+        self.overlapped: dict[int, bool] = {}
+
+    def render(self, uuid_str: str, seed: int, pdb: str, *args: Any) -> dict:
+        """Waits until the engine got the next conformation, which never happens when run inline."""
+        deadline = monotonic() + 2
+        while (uuid_str, seed + 1) not in self.engine.runs and monotonic() < deadline:
+            sleep(0.01)
+        self.overlapped[seed] = (uuid_str, seed + 1) in self.engine.runs
+        return {"pdb": pdb}
+
+    def test_postprocessing_overlaps_next_engine_run(self) -> None:
+        with patch("webapp.tasks.render_conformation", self.render):
+            tasks.run_grapharna_task(self.job.uid)
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "C")
+        self.assertEqual(self.overlapped, {10: True, 11: True, 12: False})
+        self.assertEqual(
+            list(
+                JobResults.objects.filter(job=self.job)
+                .order_by("pk")
+                .values_list("seed", flat=True)
+            ),
+            [10, 11, 12],
+        )
+
+    def test_failed_conformation_is_recorded(self) -> None:
+        def render(uuid_str: str, seed: int, pdb: str, *args: Any) -> dict:
+            if seed == 11:
+                raise Exception("arc diagram failed")
+            return {"pdb": pdb}
+
+        Job.objects.filter(pk=self.job.pk).update(email="user@example.com")
+        with (
+            patch("webapp.tasks.render_conformation", render),
+            patch("webapp.tasks.send_email_task.delay") as send_email,
+        ):
+            tasks.run_grapharna_task(self.job.uid)
+
+        # the user is told that a conformation is missing
+        self.assertEqual(send_email.call_args.kwargs["failed_conformations"], 1)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "C")
+        self.assertEqual(
+            list(
+                JobResults.objects.filter(job=self.job)
+                .order_by("seed")
+                .values_list("seed", "error")
+            ),
+            [
+                (10, None),
+                (11, "Post-processing failed: arc diagram failed"),
+                (12, None),
+            ],
+        )
+        run = EngineRun.objects.get(job=self.job, seed=11)
+        self.assertEqual(run.status, EngineRunStatus.Error)
+        self.assertEqual(run.error, "Post-processing failed: arc diagram failed")
+
+        self.job.hashed_uid = "partial"
+        self.job.save()
+        response = APIClient().get(reverse("getResults"), {"uidh": "partial"})
+        self.assertEqual(
+            [result["seed"] for result in response.data["result_list"]], [10, 12]
+        )
+        self.assertEqual(
+            response.data["failed_conformations"],
+            [{"seed": 11, "error": "Post-processing failed: arc diagram failed"}],
+        )
+
+    def test_job_fails_when_every_conformation_failed(self) -> None:
+        def render(*args: Any) -> dict:
+            raise Exception("arc diagram failed")
+
+        with (
+            patch("webapp.tasks.render_conformation", render),
+            self.assertRaisesMessage(Exception, "every conformation"),
+        ):
+            tasks.run_grapharna_task(self.job.uid)
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "E")
+
+
+class WorkerKilled(BaseException):
+    """Ends the task like a killed worker: no except Exception handler of the task runs."""
+
+
+@override_settings(
+    ENGINE_POLL_POLICY="webapp.poll_policies.FixedIntervalPolicy",
+    ENGINE_POLL_INTERVAL_SECONDS=0.02,
+)
+class ResumeJobTests(TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.engine = FakeEngine(run_seconds=0.1, output_dir=directory.name).start()
+        self.addCleanup(self.engine.stop)
+        reset_engine_client()
+        self.addCleanup(reset_engine_client)
+        settings_patcher = override_settings(
+            ENGINE_URL=self.engine.url, MEDIA_ROOT=directory.name
+        )
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+
+        output_patcher = patch(
+            "webapp.tasks.process_engine_output", fake_process_engine_output
+        )
+        output_patcher.start()
+        self.addCleanup(output_patcher.stop)
+
+        self.job = Job.objects.create(
+            input_structure="engine_inputs/test.dotseq",
+            strand_separator=" ",
+            seed=10,
+            job_name="resumed-job",
+            status="Q",
+            alternative_conformations=4,
+        )
+
+    def kill_while_engine_computes(self, seed: int) -> None:
+        """Runs the task until the engine got the run of seed, then kills it while it waits for the result."""
+
+        def sleep_or_die(seconds: float) -> None:
+            if (str(self.job.uid), seed) in self.engine.runs:
+                raise WorkerKilled()
+            sleep(seconds)
+
+        with patch("webapp.tasks.sleep", sleep_or_die), self.assertRaises(WorkerKilled):
+            tasks.run_grapharna_task(self.job.uid)
+
+    def assert_completed_without_repeated_runs(self) -> None:
+        tasks.run_grapharna_task(self.job.uid)  # redelivered
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "C")
+        self.assertEqual(self.engine.requests["run"], 4)
+        self.assertEqual(
+            sorted(
+                JobResults.objects.filter(job=self.job).values_list("seed", flat=True)
+            ),
+            [10, 11, 12, 13],
+        )
+        self.assertFalse(
+            EngineRun.objects.filter(job=self.job)
+            .exclude(status=EngineRunStatus.Completed)
+            .exists()
+        )
+
+    def test_killed_while_engine_computes(self) -> None:
+        self.kill_while_engine_computes(seed=12)
+
+        self.assertEqual(
+            list(
+                EngineRun.objects.filter(job=self.job)
+                .order_by("seed")
+                .values_list("status", flat=True)
+            ),
+            [
+                EngineRunStatus.Completed,
+                EngineRunStatus.Completed,
+                EngineRunStatus.Submitted,
+                EngineRunStatus.Pending,
+            ],
+        )
+        self.assert_completed_without_repeated_runs()
+
+    @override_settings(ENGINE_CONFORMATION_FANOUT=2)
+    def test_killed_while_engine_computes_fanout(self) -> None:
+        self.kill_while_engine_computes(seed=12)
+
+        self.assert_completed_without_repeated_runs()
+
+    def test_killed_before_results_are_saved(self) -> None:
+        def process_or_die(job_data: Job, seed: int, *args: Any) -> JobResults:
+            if seed == 11:
+                raise WorkerKilled()
+            return fake_process_engine_output(job_data, seed, *args)
+
+        with (
+            patch("webapp.tasks.process_engine_output", process_or_die),
+            self.assertRaises(WorkerKilled),
+        ):
+            tasks.run_grapharna_task(self.job.uid)
+
+        # the outputs of seed 11 are on disk, they are post-processed again
+        self.assert_completed_without_repeated_runs()
+
+    def test_incomplete_results_are_replaced(self) -> None:
+        self.kill_while_engine_computes(seed=11)
+        JobResults.objects.filter(job=self.job, seed=10).update(
+            result_tertiary_structure="missing.pdb"
+        )
+        EngineRun.objects.filter(job=self.job, seed=10).update(
+            status=EngineRunStatus.Pending
+        )
+
+        tasks.run_grapharna_task(self.job.uid)
+
+        self.assertEqual(self.engine.requests["run"], 5)  # seed 10 is computed again
+        self.assertEqual(JobResults.objects.filter(job=self.job).count(), 4)
+
+
+class PostProcessingPoolTests(SimpleTestCase):
+    def setUp(self) -> None:
+        reset_postprocessing_pool()
+        self.addCleanup(reset_postprocessing_pool)
+
+    @override_settings(ENGINE_POSTPROCESSING_WORKERS=0)
+    def test_disabled(self) -> None:
+        self.assertIsNone(get_postprocessing_pool())
+
+    @override_settings(ENGINE_POSTPROCESSING_WORKERS=1)
+    def test_process_pool(self) -> None:
+        pool = get_postprocessing_pool()
+        assert pool is not None
+        self.assertNotEqual(pool.submit(os.getpid).result(), os.getpid())
+        self.assertIs(get_postprocessing_pool(), pool)
+
+    @override_settings(ENGINE_POSTPROCESSING_WORKERS=1)
+    def test_threads_in_daemonic_worker(self) -> None:
+        with patch("multiprocessing.current_process") as current_process:
+            current_process.return_value.daemon = True
+            self.assertIsInstance(get_postprocessing_pool(), ThreadPoolExecutor)
+
+
+class BatchSubmissionTests(TestCase):
+    run_seconds = 0.1
+
+    def setUp(self) -> None:
+        self.engine = FakeEngine(run_seconds=self.run_seconds, batch=True).start()
+        self.addCleanup(self.engine.stop)
+        self.engine_client = EngineClient(
+            self.engine.url, pool_size=1, connect_timeout=1, read_timeout=1
+        )
+        self.addCleanup(self.engine_client.close)
+        self.runs = [("abc", 1), ("abc", 2), ("def", 1)]
+
+    def test_runs_are_submitted_and_polled_together(self) -> None:
+        self.engine_client.submit_runs(self.runs)
+        statuses = self.engine_client.poll_runs(self.runs)
+        self.assertEqual([code for code, _, _ in statuses.values()], [202] * 3)
+
+        sleep(self.run_seconds)
+        statuses = self.engine_client.poll_runs(self.runs)
+
+        self.assertEqual(
+            statuses[("def", 1)][1]["pdbFilePath"],
+            "/shared/samples/engine_outputs/def_1.pdb",
+        )
+        self.assertEqual(
+            self.engine.requests, {"health": 1, "run_batch": 1, "status_batch": 2}
+        )
+
+    def test_fallback_without_batch_support(self) -> None:
+        self.engine.batch = False
+        self.engine_client.submit_runs(self.runs)
+        statuses = self.engine_client.poll_runs(self.runs)
+
+        self.assertEqual([code for code, _, _ in statuses.values()], [202] * 3)
+        self.assertEqual(self.engine.requests, {"health": 1, "run": 3, "status": 3})
+
+    def test_fallback_when_batch_endpoint_disappears(self) -> None:
+        self.assertTrue(self.engine_client.supports_batch())
+        self.engine.batch = False  # engine replaced by an older version
+
+        self.engine_client.submit_runs(self.runs)
+
+        self.assertEqual(self.engine.requests["run"], 3)
+        self.assertFalse(self.engine_client.batch_supported)
+
+    def fail_once(self, failing: tuple[str, int]) -> Any:
+        """EngineClient.run that can't reach the engine the first time the run failing is submitted."""
+        run = EngineClient.run
+        failed: list[tuple[str, int]] = []
+
+        def flaky_run(client: EngineClient, uuid: str, seed: int) -> Any:
+            if (uuid, seed) == failing and not failed:
+                failed.append(failing)
+                raise requests.ConnectionError("engine unreachable")
+            return run(client, uuid, seed)
+
+        return patch.object(EngineClient, "run", flaky_run)
+
+    def test_partial_submission_reports_accepted_runs(self) -> None:
+        self.engine.batch = False
+        with (
+            self.fail_once(("abc", 2)),
+            self.assertRaises(PartialSubmissionError) as raised,
+        ):
+            self.engine_client.submit_runs(self.runs)
+
+        self.assertEqual(raised.exception.accepted, [("abc", 1)])
+        self.assertEqual(self.engine.requests["run"], 1)
+
+    def test_only_rejected_runs_are_resubmitted(self) -> None:
+        self.engine.batch = False
+        reset_engine_client()
+        self.addCleanup(reset_engine_client)
+        with (
+            override_settings(ENGINE_URL=self.engine.url, ENGINE_REQUEST_RETRY_DELAY=0),
+            self.fail_once(("abc", 2)),
+        ):
+            finished = [
+                seed
+                for seed, _, _ in execute_and_poll_engine_runs(
+                    "abc",
+                    [1, 2, 3],
+                    fanout=3,
+                    poll_policy=FixedIntervalPolicy(0.02),
+                )
+            ]
+
+        self.assertEqual(sorted(finished), [1, 2, 3])
+        # seed 1 is accepted before the failure, only seeds 2 and 3 are resubmitted
+        self.assertEqual(self.engine.requests["run"], 3)
+
+    def test_missing_run_in_batch_status(self) -> None:
+        self.engine_client.submit_runs(self.runs[:2])
+        statuses = self.engine_client.poll_runs(self.runs)
+
+        self.assertEqual(statuses[("def", 1)][0], 404)
+
+    def test_job_conformations_use_batch_calls(self) -> None:
+        reset_engine_client()
+        self.addCleanup(reset_engine_client)
+        job = Job.objects.create(
+            input_structure="engine_inputs/test.dotseq",
+            strand_separator=" ",
+            seed=10,
+            job_name="batch-job",
+            status="Q",
+            alternative_conformations=3,
+        )
+
+        with (
+            override_settings(ENGINE_URL=self.engine.url, ENGINE_CONFORMATION_FANOUT=3),
+            patch("webapp.tasks.process_engine_output", fake_process_engine_output),
+        ):
+            tasks.run_grapharna_task(job.uid)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "C")
+        self.assertEqual(JobResults.objects.filter(job=job).count(), 3)
+        self.assertEqual(self.engine.requests["run_batch"], 1)
+        self.assertNotIn("run", self.engine.requests)
+        self.assertNotIn("status", self.engine.requests)
+
+
+@override_settings(ENGINE_DISPATCH_MODE="async")
+class EngineDispatcherTests(TestCase):
+    run_seconds = 0.2
+
+    def setUp(self) -> None:
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.engine = FakeEngine(run_seconds=self.run_seconds).start()
+        self.addCleanup(self.engine.stop)
+        reset_engine_client()
+        self.addCleanup(reset_engine_client)
+
+        output_patcher = patch(
+            "webapp.tasks.process_engine_output", fake_process_engine_output
+        )
+        output_patcher.start()
+        self.addCleanup(output_patcher.stop)
+
+        self.worker = FakeWorker(tasks.process_engine_run, tasks.finalize_job_task)
+        self.worker.__enter__()
+        self.addCleanup(self.worker.__exit__)
+
+    def create_job(self, n: int, conformations: int = 1) -> Job:
+        return Job.objects.create(
+            input_structure=f"engine_inputs/test_{n}.dotseq",
+            strand_separator=" ",
+            seed=100 * n,
+            job_name=f"async-job-{n}",
+            status="Q",
+            alternative_conformations=conformations,
+        )
+
+    def dispatch(self, timeout: float | None = None) -> EngineDispatcher:
+        """Runs the dispatcher and the post-processing tasks until every job is finished."""
+        dispatcher = EngineDispatcher(
+            client=AsyncEngineClient(self.engine.url),
+            concurrency=50,
+            timeout=timeout,
+            poll_policy=FixedIntervalPolicy(0.02),
+            claim_interval=0.02,
+        )
+
+        async def serve() -> None:
+            try:
+                while True:
+                    await dispatcher.serve(drain=True)
+                    if not self.worker.queue:
+                        break
+                    await sync_to_async(self.worker.run)()
+            finally:
+                await dispatcher.close()
+
+        async_to_sync(serve)()
+        return dispatcher
+
+    def test_runs_of_many_jobs_are_multiplexed(self) -> None:
+        jobs = [self.create_job(n) for n in range(20)]
+        for job in jobs:
+            tasks.run_grapharna_task(job.uid)
+        self.assertEqual(self.engine.requests.get("run", 0), 0)  # only queued
+
+        start = monotonic()
+        dispatcher = self.dispatch()
+        elapsed = monotonic() - start
+
+        for job in jobs:
+            job.refresh_from_db()
+            self.assertEqual(job.status, "C")
+        self.assertEqual(dispatcher.finished, 20)
+        self.assertEqual(self.engine.requests["run"], 20)
+        self.assertLess(elapsed, 20 * self.run_seconds / 4)
+
+    @override_settings(ENGINE_CONFORMATION_FANOUT=2)
+    def test_conformations_follow_fanout(self) -> None:
+        job = self.create_job(0, conformations=3)
+        tasks.run_grapharna_task(job.uid)
+        self.assertEqual(
+            EngineRun.objects.filter(job=job, status=EngineRunStatus.Queued).count(),
+            2,
+        )
+
+        self.dispatch()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "C")
+        self.assertEqual(
+            sorted(JobResults.objects.filter(job=job).values_list("seed", flat=True)),
+            [0, 1, 2],
+        )
+
+    def test_timeout_cancels_run(self) -> None:
+        job = self.create_job(0)
+        tasks.run_grapharna_task(job.uid)
+
+        dispatcher = self.dispatch(timeout=self.run_seconds / 4)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "E")
+        self.assertEqual(dispatcher.failed, 1)
+        self.assertEqual(self.engine.requests["cancel"], 1)
+
+    def test_unexpected_errors_fail_the_run(self) -> None:
+        job = self.create_job(0)
+        tasks.run_grapharna_task(job.uid)
+
+        with patch.object(
+            AsyncEngineClient,
+            "status",
+            AsyncMock(return_value=httpx.Response(200, content=b"<html>")),
+        ):
+            dispatcher = self.dispatch()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "E")
+        self.assertEqual(dispatcher.failed, 1)
+        run = EngineRun.objects.get(job=job)
+        self.assertEqual(run.status, EngineRunStatus.Error)
+        self.assertIn("Engine run failed", run.error)
+
+    def test_submitted_runs_are_resumed(self) -> None:
+        job = self.create_job(0)
+        EngineRun.objects.create(
+            job=job,
+            seed=0,
+            status=EngineRunStatus.Submitted,
+            submitted_at=timezone.now(),
+        )
+        self.engine.start_run(str(job.uid), 0)  # submitted by a previous dispatcher
+
+        self.dispatch()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "C")
+        self.assertNotIn("run", self.engine.requests)
+
+    def queue_jobs(self, count: int) -> list[Job]:
+        jobs = [self.create_job(n) for n in range(count)]
+        for job in jobs:
+            tasks.run_grapharna_task(job.uid)
+        return jobs
+
+    def test_advertised_capacity_is_kept_busy(self) -> None:
+        self.engine.capacity = 3
+        jobs = self.queue_jobs(9)
+
+        dispatcher = self.dispatch()
+
+        self.assertEqual(dispatcher.finished, 9)
+        self.assertEqual(self.engine.peak_running, 3)
+        self.assertNotIn("rejected", self.engine.requests)
+        self.assertEqual(metrics.get_value("engine_capacity"), 3)
+        self.assertEqual(metrics.get_value("engine_runs_in_flight"), 0)
+        # claimed in created_at order
+        self.assertEqual(
+            list(
+                EngineRun.objects.order_by("submitted_at", "pk").values_list(
+                    "job", flat=True
+                )
+            ),
+            [job.pk for job in jobs],
+        )
+
+    def test_capacity_is_learned_from_rejections(self) -> None:
+        self.engine.capacity = 3
+        self.engine.advertise_capacity = False
+        self.queue_jobs(9)
+
+        dispatcher = self.dispatch()
+
+        self.assertEqual(dispatcher.finished, 9)
+        self.assertEqual(dispatcher.capacity.limit, 3)
+        # only the first burst of submissions is rejected
+        self.assertEqual(self.engine.requests["rejected"], 6)
+        self.assertEqual(metrics.get_value("engine_run_rejections_total"), 6)
+
+    def test_capacity_limit(self) -> None:
+        capacity = EngineCapacity(maximum=10, refresh_interval=60)
+        capacity.advertise(4)
+        self.assertEqual(capacity.limit, 4)
+
+        capacity.rejected(running=2)
+        capacity.accepted(running=3)  # answer to an earlier submission
+        self.assertEqual(capacity.limit, 3)
+        capacity.advertise(4)  # no probing right after a rejection
+        self.assertEqual(capacity.limit, 3)
+
+        capacity.rejected_at = monotonic() - 60
+        capacity.accepted(running=3)
+        self.assertEqual(capacity.limit, 4)
+        capacity.advertise(None)
+        self.assertEqual(capacity.limit, 10)
+
+
+@override_settings(
+    ENGINE_BREAKER_FAILURE_THRESHOLD=3,
+    ENGINE_BREAKER_PROBE_INTERVAL_SECONDS=0.1,
+    ENGINE_BREAKER_CACHE_SECONDS=0,
+    ENGINE_POLL_POLICY="webapp.poll_policies.FixedIntervalPolicy",
+    ENGINE_POLL_INTERVAL_SECONDS=0.01,
+    ENGINE_REQUEST_RETRY_DELAY=0,
+)
+class CircuitBreakerTests(TestCase):
+    def setUp(self) -> None:
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.engine = FakeEngine(run_seconds=0.05).start()
+        self.addCleanup(self.engine.stop)
+
+        settings_patcher = override_settings(ENGINE_URL=self.engine.url)
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+        reset_engine_client()
+        self.addCleanup(reset_engine_client)
+
+        output_patcher = patch(
+            "webapp.tasks.process_engine_output", fake_process_engine_output
+        )
+        output_patcher.start()
+        self.addCleanup(output_patcher.stop)
+
+        self.job = Job.objects.create(
+            input_structure="engine_inputs/test.dotseq",
+            strand_separator=" ",
+            seed=10,
+            job_name="breaker-job",
+            status="Q",
+            alternative_conformations=2,
+        )
+
+    def open_circuit(self) -> None:
+        self.engine.down = True
+        for _ in range(3):
+            with self.assertRaises(requests.ConnectionError):
+                get_engine_client().status("abc", 0)
+        self.assertEqual(get_engine_breaker().state, CircuitState.Open)
+
+    def test_opens_after_consecutive_failures(self) -> None:
+        self.open_circuit()
+
+        with self.assertRaises(CircuitOpenError):
+            get_engine_client().status("abc", 0)
+        self.assertEqual(self.engine.requests["dropped"], 3)  # failed fast
+        self.assertEqual(
+            metrics.get_value(
+                "engine_circuit_transitions_total", source="Closed", target="Open"
+            ),
+            1,
+        )
+        self.assertEqual(metrics.get_value("engine_circuit_open"), 1)
+
+    def test_health_is_probed_at_controlled_rate(self) -> None:
+        self.open_circuit()
+
+        deadline = monotonic() + 0.35
+        while monotonic() < deadline:
+            with self.assertRaises(CircuitOpenError):
+                get_engine_client().status("abc", 0)
+            sleep(0.005)
+        probes = metrics.get_value("engine_health_probes_total", result="failed")
+        self.assertGreaterEqual(probes, 2)
+        self.assertLessEqual(probes, 4)
+
+        self.engine.down = False
+        sleep(0.1)
+        self.assertEqual(get_engine_client().health().status_code, 200)
+        self.assertEqual(get_engine_breaker().state, CircuitState.Closed)
+        self.assertEqual(metrics.get_value("engine_circuit_open"), 0)
+        self.assertEqual(
+            metrics.get_value(
+                "engine_circuit_transitions_total", source="Half-open", target="Closed"
+            ),
+            1,
+        )
+
+    def test_job_is_held_while_open(self) -> None:
+        self.open_circuit()
+
+        with FakeWorker(tasks.run_grapharna_task) as worker:
+            tasks.run_grapharna_task.delay(self.job.uid)
+            worker.run(max_tasks=1)
+
+            self.job.refresh_from_db()
+            self.assertEqual(self.job.status, "Q")
+            self.assertEqual(len(worker.queue), 1)  # re-enqueued for the next probe
+            self.assertNotIn("run", self.engine.requests)
+
+            self.engine.down = False
+            worker.run()
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "C")
+        self.assertEqual(JobResults.objects.filter(job=self.job).count(), 2)
+
+    @override_settings(ENGINE_BREAKER_OPEN_ACTION="fail")
+    def test_job_fails_fast_while_open(self) -> None:
+        self.open_circuit()
+
+        start = monotonic()
+        tasks.run_grapharna_task(self.job.uid)
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "E")
+        self.assertLess(monotonic() - start, 0.1)
+        self.assertNotIn("run", self.engine.requests)
+
+    def test_flapping_engine(self) -> None:
+        stop = threading.Event()
+
+        def flap() -> None:
+            for _ in range(6):
+                self.engine.down = not self.engine.down
+                if stop.wait(0.07):
+                    break
+            self.engine.down = False
+
+        flapper = threading.Thread(target=flap)
+        with FakeWorker(tasks.run_grapharna_task) as worker:
+            tasks.run_grapharna_task.delay(self.job.uid)
+            flapper.start()
+            worker.run()
+        stop.set()
+        flapper.join()
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "C")
+        self.assertEqual(JobResults.objects.filter(job=self.job).count(), 2)
+        self.assertEqual(get_engine_breaker().state, CircuitState.Closed)
+
+    @override_settings(METRICS_TOKEN="metrics-secret")
+    def test_metrics_endpoint(self) -> None:
+        self.open_circuit()
+
+        response = APIClient().get(
+            reverse("metrics"), HTTP_AUTHORIZATION="Bearer metrics-secret"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"# TYPE engine_circuit_open gauge", response.content)
+        self.assertIn(b"engine_circuit_open 1.0", response.content)
+        self.assertIn(
+            b'engine_circuit_transitions_total{source="Closed",target="Open"} 1.0',
+            response.content,
+        )
+
+
+@override_settings(METRICS_FLUSH_SECONDS=60, METRICS_TOKEN="metrics-secret")
+class MetricsTests(TestCase):
+    def setUp(self) -> None:
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        metrics.flush()
+
+    def test_updates_are_written_in_one_batch(self) -> None:
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                metrics.increment("lookups_total", result="hit")
+            metrics.set_gauge("hit_rate", 0.5)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(metrics.get_value("lookups_total", result="hit"), 5)
+        self.assertFalse(Metric.objects.exists())
+
+        metrics.flush()
+
+        self.assertEqual(Metric.objects.get(name="lookups_total").value, 5)
+        self.assertEqual(Metric.objects.get(name="hit_rate").value, 0.5)
+        metrics.increment("lookups_total", result="hit")
+        self.assertEqual(metrics.get_value("lookups_total", result="hit"), 6)
+
+    def test_endpoint_writes_the_buffered_updates(self) -> None:
+        metrics.increment("lookups_total", result="hit")
+
+        response = APIClient().get(
+            reverse("metrics"), HTTP_AUTHORIZATION="Bearer metrics-secret"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'lookups_total{result="hit"} 1.0', response.content)
+
+    def test_endpoint_needs_the_token(self) -> None:
+        client = APIClient()
+
+        self.assertEqual(client.get(reverse("metrics")).status_code, 403)
+        response = client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(response.status_code, 403)
+        with override_settings(METRICS_TOKEN=None):
+            self.assertEqual(client.get(reverse("metrics")).status_code, 403)
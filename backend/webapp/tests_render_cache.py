@@ -0,0 +1,137 @@
+import os
+import sys
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from webapp import metrics, tasks
+from webapp.models import Job, JobResults, RenderedDiagram
+from webapp.render_cache import cached_diagram_path, prune_render_cache
+from webapp.tests_varna import FAKE_SERVER
+from webapp.varna_server import VarnaRenderServer
+
+
+@override_settings(RENDER_CACHE=True)
+class RenderCacheTests(TestCase):
+    def setUp(self) -> None:
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        media_patcher = override_settings(MEDIA_ROOT=self.directory)
+        media_patcher.enable()
+        self.addCleanup(media_patcher.disable)
+
+        self.server = VarnaRenderServer(command=[sys.executable, "-c", FAKE_SERVER])
+        self.addCleanup(self.server.stop)
+        server_patcher = patch(
+            "webapp.visualization_tools.get_varna_server", return_value=self.server
+        )
+        server_patcher.start()
+        self.addCleanup(server_patcher.stop)
+
+        self.write("input.dotseq", ">job\nGGGAAACCC\n(((...)))\n")
+
+    def write(self, name: str, content: str) -> str:
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def create_job(self, name: str, structures: list[str]) -> Job:
+        job = Job.objects.create(
+            input_structure="input.dotseq",
+            strand_separator=" ",
+            seed=10,
+            job_name=name,
+            status="R",
+            alternative_conformations=len(structures),
+            sum_processing_time=timedelta(seconds=3),
+        )
+        for seed, structure in enumerate(structures):
+            self.write(f"{name}_{seed}.dotseq", f">{name}\nGGGAAACCC\n{structure}\n")
+            JobResults.objects.create(
+                job=job,
+                seed=seed,
+                result_secondary_structure_dotseq=f"{name}_{seed}.dotseq",
+                result_secondary_structure_svg=f"{name}_{seed}.svg",
+            )
+        return job
+
+    def svg_names(self, job: Job) -> list[str]:
+        return [
+            result.result_secondary_structure_svg.name
+            for result in JobResults.objects.filter(job=job).order_by("seed")
+        ]
+
+    def test_identical_structures_are_drawn_once(self) -> None:
+        job = self.create_job("first", ["((.....))", "((.....))", "(((...)))"])
+        tasks.finalize_job(job)
+        other = self.create_job("second", ["((.....))"])
+        tasks.finalize_job(other)
+
+        self.assertEqual(self.server.renders, 2)
+        names = self.svg_names(job) + self.svg_names(other)
+        self.assertEqual(len(set(names)), 2)
+        self.assertTrue(all(RenderedDiagram.is_cached(name) for name in names))
+        self.assertEqual(RenderedDiagram.objects.get(name=names[0]).references, 3)
+        self.assertEqual(
+            metrics.get_value("render_cache_lookups_total", kind="varna", result="hit"),
+            2,
+        )
+        self.assertEqual(metrics.get_value("render_cache_hit_rate", kind="varna"), 0.5)
+
+    def test_key_ignores_strand_breaks_and_follows_render_settings(self) -> None:
+        spaced = self.write("spaced.dotseq", ">a\nggg aaaccc\n((( ...)))\n")
+        path = cached_diagram_path("varna", [spaced])
+
+        self.assertEqual(
+            path,
+            cached_diagram_path(
+                "varna", [os.path.join(self.directory, "input.dotseq")]
+            ),
+        )
+        self.assertNotEqual(path, cached_diagram_path("arc", [spaced, spaced]))
+        with override_settings(SVG_COORDINATE_PRECISION=3):
+            self.assertNotEqual(path, cached_diagram_path("varna", [spaced]))
+
+    def test_save_conformation_references_cached_arc_diagram(self) -> None:
+        job = self.create_job("arc", [])
+        arc = cached_diagram_path("arc", [job.input_structure.path] * 2)
+        for seed, cached in ((0, False), (1, True)):
+            outputs = {"pdb": os.path.join(self.directory, f"{seed}.pdb")}
+            outputs.update(arc=arc, arc_cached=cached)
+            tasks.save_conformation(job, seed, outputs, timezone.now())
+
+        name = os.path.relpath(arc, self.directory)
+        self.assertEqual(RenderedDiagram.objects.get(name=name).references, 2)
+        self.assertEqual(metrics.get_value("render_cache_hit_rate", kind="arc"), 0.5)
+
+    def test_expired_jobs_only_remove_unreferenced_diagrams(self) -> None:
+        jobs = [self.create_job(name, ["((.....))"]) for name in ("old", "new")]
+        for job in jobs:
+            tasks.finalize_job(job)
+        name = self.svg_names(jobs[0])[0]
+        path = os.path.join(self.directory, name)
+        orphan = self.write("render_cache/varna-orphan.svg", "<svg/>")
+        Job.objects.filter(pk=jobs[0].pk).update(
+            expires_at=timezone.now() - timedelta(days=1)
+        )
+
+        tasks.delete_expired_jobs()
+        self.assertTrue(os.path.exists(path))  # still shown by the other job
+        self.assertTrue(os.path.exists(orphan))  # may be about to be referenced
+        self.assertEqual(RenderedDiagram.objects.get(name=name).references, 1)
+
+        JobResults.objects.get(job=jobs[1]).delete()
+        self.assertTrue(os.path.exists(path))
+        two_days_ago = timezone.now() - timedelta(days=2)
+        RenderedDiagram.objects.update(used_at=two_days_ago)
+        os.utime(orphan, (two_days_ago.timestamp(), two_days_ago.timestamp()))
+
+        self.assertEqual(prune_render_cache(), 2)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(orphan))
+        self.assertFalse(RenderedDiagram.objects.exists())
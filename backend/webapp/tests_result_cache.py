@@ -0,0 +1,180 @@
+import os
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from benchmarks.fake_engine import FakeEngine
+from webapp import metrics, tasks
+from webapp.engine_client import reset_engine_client
+from webapp.models import Job, JobResults
+from webapp.result_cache import result_key
+from webapp.tests_engine import fake_process_engine_output
+
+
+@override_settings(
+    RESULT_CACHE=True,
+    ENGINE_POLL_POLICY="webapp.poll_policies.FixedIntervalPolicy",
+    ENGINE_POLL_INTERVAL_SECONDS=0.02,
+)
+class ResultCacheTests(TestCase):
+    def setUp(self) -> None:
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        os.makedirs(os.path.join(self.directory, "engine_outputs"))
+        self.engine = FakeEngine(
+            run_seconds=0.05, output_dir=os.path.join(self.directory, "engine_outputs")
+        ).start()
+        self.addCleanup(self.engine.stop)
+        reset_engine_client()
+        self.addCleanup(reset_engine_client)
+        settings_patcher = override_settings(
+            ENGINE_URL=self.engine.url, MEDIA_ROOT=self.directory
+        )
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+
+        output_patcher = patch(
+            "webapp.tasks.process_engine_output", fake_process_engine_output
+        )
+        output_patcher.start()
+        self.addCleanup(output_patcher.stop)
+        drawing_patcher = patch(
+            "webapp.tasks.draw_secondary_structures", return_value=timedelta()
+        )
+        drawing_patcher.start()
+        self.addCleanup(drawing_patcher.stop)
+
+        self.source = self.create_job("source", status="C")
+        for seed in (10, 11):
+            self.write(f"engine_outputs/{self.source.uid}_{seed}.pdb", f"model {seed}")
+            self.write(f"engine_outputs/{self.source.uid}_{seed}.dotseq", ">A\n")
+            self.write(f"engine_outputs/{self.source.uid}_{seed}_arc.svg", "<svg/>")
+            JobResults.objects.create(
+                job=self.source,
+                seed=seed,
+                result_tertiary_structure=f"engine_outputs/{self.source.uid}_{seed}.pdb",
+                result_secondary_structure_dotseq=f"engine_outputs/{self.source.uid}_{seed}.dotseq",
+                result_arc_diagram=f"engine_outputs/{self.source.uid}_{seed}_arc.svg",
+                f1=0.5,
+                cache_key=result_key(self.source, seed),
+            )
+
+    def write(self, name: str, content: str) -> str:
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def create_job(
+        self, name: str, status: str = "Q", conformations: int = 2, **fields: object
+    ) -> Job:
+        # the header (job name) and the strand separator written by finalize_job don't change the key
+        self.write(f"{name}.dotseq", f">{name}\nGGGAAA-CCC\n(((...-)))\n")
+        return Job.objects.create(
+            input_structure=f"{name}.dotseq",
+            strand_separator="-",
+            seed=10,
+            job_name=name,
+            status=status,
+            alternative_conformations=conformations,
+            **fields,
+        )
+
+    def seeds(self, job: Job) -> list[int]:
+        return list(
+            JobResults.objects.filter(job=job)
+            .order_by("seed")
+            .values_list("seed", flat=True)
+        )
+
+    def test_same_structure_and_seed_skip_the_engine(self) -> None:
+        job = self.create_job("resubmitted")
+
+        tasks.run_grapharna_task(job.uid)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "C")
+        self.assertNotIn("run", self.engine.requests)
+        self.assertEqual(self.seeds(job), [10, 11])
+        clone = JobResults.objects.get(job=job, seed=10)
+        self.assertEqual(clone.f1, 0.5)
+        self.assertEqual(
+            clone.result_tertiary_structure.name, f"engine_outputs/{job.uid}_10.pdb"
+        )
+        source = JobResults.objects.get(job=self.source, seed=10)
+        self.assertTrue(
+            os.path.samefile(
+                clone.result_tertiary_structure.path,
+                source.result_tertiary_structure.path,
+            )
+        )
+        self.assertEqual(
+            metrics.get_value("result_cache_lookups_total", result="hit"), 2
+        )
+
+        self.source.delete()  # the clone keeps its files
+        self.assertTrue(os.path.exists(clone.result_arc_diagram.path))
+
+    def test_missing_conformations_run_on_the_engine(self) -> None:
+        job = self.create_job("more-conformations", conformations=3)
+
+        tasks.run_grapharna_task(job.uid)
+
+        self.assertEqual(self.seeds(job), [10, 11, 12])
+        self.assertEqual(self.engine.requests["run"], 1)
+        self.assertEqual(metrics.get_value("result_cache_hit_rate"), 2 / 3)
+
+    def test_other_model_misses(self) -> None:
+        job = self.create_job("new-model")
+
+        with override_settings(MODEL_NAME="model_900.h5"):
+            tasks.run_grapharna_task(job.uid)
+
+        self.assertEqual(self.engine.requests["run"], 2)
+        self.assertEqual(
+            metrics.get_value("result_cache_lookups_total", result="miss"), 2
+        )
+
+    def test_bypass(self) -> None:
+        job = self.create_job("bypass", use_result_cache=False)
+
+        tasks.run_grapharna_task(job.uid)
+
+        self.assertEqual(self.engine.requests["run"], 2)
+        self.assertEqual(
+            metrics.get_value("result_cache_lookups_total", result="hit"), 0
+        )
+
+    def test_saved_conformations_are_keyed(self) -> None:
+        job = self.create_job("keyed")
+        pdb = self.write("engine_outputs/keyed.pdb", "model")
+
+        result = tasks.save_conformation(job, 10, {"pdb": pdb}, timezone.now())
+
+        self.assertEqual(result.cache_key, result_key(self.source, 10))
+
+    def test_bypass_per_request(self) -> None:
+        with (
+            patch("webapp.tasks.run_grapharna_task.delay"),
+            patch("api.misc_tools.os.makedirs"),
+            patch("api.misc_tools.os.path.relpath", return_value="bypass.dotseq"),
+            patch("builtins.open"),
+        ):
+            response = APIClient().post(
+                reverse("postRequestData"),
+                {
+                    "fasta_raw": "GGGAAACCC\n(((...)))",
+                    "job_name": "no-cache",
+                    "use_result_cache": "false",
+                },
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Job.objects.get(job_name="no-cache").use_result_cache)
@@ -0,0 +1,92 @@
+import glob
+import os
+import tempfile
+from xml.etree import ElementTree as ET
+from django.test import SimpleTestCase
+from webapp.svg_optimizer import optimize_svg
+
+SVG = "{http://www.w3.org/2000/svg}"
+TEST_FILES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_files"
+)
+
+# shaped like VARNA output: flat lines, circles and texts with long coordinates
+VARNA_SVG = """<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<!-- Generated by VARNA -->
+<svg width="800" height="600" version="1.1" xmlns="http://www.w3.org/2000/svg"
+     xmlns:xlink="http://www.w3.org/1999/xlink" xmlns:sodipodi="http://sodipodi.sourceforge.net">
+  <metadata><title>structure</title></metadata>
+  <sodipodi:namedview pagecolor="#ffffff"/>
+  <line x1="100.123456" y1="50.987654" x2="130.5" y2="80.25" stroke="rgb(0%, 0%, 0%)" stroke-width="1.0"/>
+  <circle cx="100.123456" cy="50.987654" r="10.333333" stroke="rgb(0%, 0%, 0%)" stroke-width="1.0" fill="white"/>
+  <circle cx="130.5" cy="80.25" r="10.333333" stroke="rgb(0%, 0%, 0%)" stroke-width="1.0" fill="white"/>
+  <text x="100.123456" y="55.5" text-anchor="middle" font-family="Verdana" font-size="12.0">G </text>
+  <text x="300.0" y="200.0" sodipodi:role="line" xml:space="preserve">C<tspan fill="red"> 2</tspan> </text>
+  <use xlink:href="#glyph" x="0.5"/>
+</svg>
+"""
+
+
+class OptimizeSvgTests(SimpleTestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "varna.svg")
+        with open(self.path, "w") as f:
+            f.write(VARNA_SVG)
+
+    def optimized(self, **options: object) -> str:
+        optimize_svg(self.path, **options)  # type: ignore[arg-type]
+        with open(self.path) as f:
+            return f.read()
+
+    def test_crop_to_bounding_box(self) -> None:
+        root = ET.fromstring(self.optimized(crop_padding=15))
+
+        # circles reach from x=89.79 to 140.83, y=40.65 to 90.58, texts up to (300, 200)
+        self.assertEqual(root.attrib["viewBox"], "74.79 25.65 240.21 189.35")
+        self.assertEqual(root.attrib["width"], "240.21")
+        self.assertEqual(root.attrib["height"], "189.35")
+
+    def test_coordinates_are_rounded(self) -> None:
+        circle = ET.fromstring(self.optimized(precision=1)).find(f"{SVG}circle")
+
+        assert circle is not None
+        self.assertEqual(
+            (circle.attrib["cx"], circle.attrib["cy"], circle.attrib["r"]),
+            ("100.1", "51", "10.3"),
+        )
+
+    def test_metadata_and_whitespace_are_removed(self) -> None:
+        svg = self.optimized()
+
+        for removed in ("VARNA", "metadata", "sodipodi", "\n  <"):
+            self.assertNotIn(removed, svg)
+        root = ET.fromstring(svg)
+        texts = ["".join(text.itertext()) for text in root.iter(f"{SVG}text")]
+        self.assertEqual(texts, ["G ", "C 2 "])  # text content is kept as it is
+        self.assertIsNotNone(
+            root.find(f"{SVG}use[@{{http://www.w3.org/1999/xlink}}href='#glyph']")
+        )
+
+    def test_repeated_styles_become_a_class(self) -> None:
+        root = ET.fromstring(self.optimized())
+
+        style = root.find(f"{SVG}style")
+        assert style is not None
+        circles = root.findall(f"{SVG}circle")
+        self.assertEqual({circle.attrib.get("class") for circle in circles}, {"s0"})
+        self.assertNotIn("fill", circles[0].attrib)
+        self.assertIn(
+            ".s0{fill:white;stroke:rgb(0%, 0%, 0%);stroke-width:1.0px}", style.text
+        )
+        line = root.find(f"{SVG}line")
+        assert line is not None
+        self.assertEqual(line.attrib["stroke-width"], "1.0")  # used once, stays inline
+
+    def test_fixtures(self) -> None:
+        for fixture in glob.glob(os.path.join(TEST_FILES, "*.svg")):
+            output = self.path + ".out"
+            optimize_svg(fixture, output)
+            self.assertLess(os.path.getsize(output), os.path.getsize(fixture))
+            self.assertEqual(ET.parse(output).getroot().tag, f"{SVG}svg")
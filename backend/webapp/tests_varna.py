@@ -0,0 +1,464 @@
+import io
+import os
+import sys
+import tempfile
+from datetime import timedelta
+from functools import partial
+from unittest.mock import MagicMock, patch
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from GraphaRNA import celery
+from webapp import metrics, tasks, varna_server, visualization_tools
+from webapp.models import Job, JobResults
+from webapp.warm_up import warm_up_renderers
+from webapp.varna_server import (
+    VarnaRenderError,
+    VarnaRenderServer,
+    VarnaRenderTimeout,
+    get_varna_server,
+    reset_varna_server,
+)
+
+# speaks the VarnaRenderServer.java protocol, writes a tiny SVG to the -o path
+FAKE_SERVER = r"""
+import os, sys, time
+print("READY", flush=True)
+for line in sys.stdin:
+    args = line.rstrip("\n").split("\t")
+    if "-crash-once" in args:
+        marker = args[args.index("-crash-once") + 1]
+        if not os.path.exists(marker):
+            open(marker, "w").close()
+            sys.exit(1)
+    if "-hang" in args:
+        time.sleep(60)
+    if "-bad" in args:
+        print("ERROR ExitCode: bad option", flush=True)
+        continue
+    with open(args[args.index("-o") + 1], "w") as f:
+        f.write('<svg xmlns="http://www.w3.org/2000/svg"><circle cx="20" cy="20" r="5"/></svg>')
+    print("OK", flush=True)
+"""
+
+
+class VarnaRenderServerTests(SimpleTestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.server = VarnaRenderServer(
+            command=[sys.executable, "-c", FAKE_SERVER], timeout=5
+        )
+        self.addCleanup(self.server.stop)
+
+    def output(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @override_settings(VARNA_SERVER_CLASSES="/opt/classes")
+    def test_runs_the_compiled_server(self) -> None:
+        command = VarnaRenderServer().command
+
+        self.assertEqual(command[-1], "VarnaRenderServer")
+        self.assertEqual(
+            command[-2], os.pathsep.join([varna_server.VARNA_JAR, "/opt/classes"])
+        )
+
+    def test_one_process_renders_many_diagrams(self) -> None:
+        for n in range(3):
+            self.server.render(
+                ["-sequenceDBN", "GGAAACC", "-o", self.output(f"{n}.svg")]
+            )
+            if n == 0:
+                assert self.server.process is not None
+                pid = self.server.process.pid
+
+        self.assertEqual(self.server.renders, 3)
+        assert self.server.process is not None
+        self.assertEqual(self.server.process.pid, pid)
+        self.assertTrue(os.path.exists(self.output("2.svg")))
+
+    def test_crashed_server_is_restarted(self) -> None:
+        self.server.render(["-o", self.output("a.svg")])
+        assert self.server.process is not None
+        self.server.process.kill()
+        self.server.process.wait()
+
+        self.server.render(["-o", self.output("b.svg")])  # dead before the request
+        self.server.render(
+            ["-crash-once", self.output("marker"), "-o", self.output("c.svg")]
+        )  # dies while rendering
+
+        self.assertEqual(self.server.restarts, 1)
+        self.assertTrue(os.path.exists(self.output("c.svg")))
+
+    def test_error_reply(self) -> None:
+        with self.assertRaisesMessage(VarnaRenderError, "bad option"):
+            self.server.render(["-bad", "-o", self.output("a.svg")])
+        self.server.render(["-o", self.output("b.svg")])  # still serving
+        self.assertEqual(self.server.restarts, 0)
+
+    def test_hanging_server_is_killed(self) -> None:
+        self.server.timeout = 0.5
+        with self.assertRaises(VarnaRenderTimeout):
+            self.server.render(["-hang", "-o", self.output("a.svg")])
+        self.assertIsNone(self.server.process)
+
+    def test_failed_start_backs_off(self) -> None:
+        server = VarnaRenderServer(command=["/nonexistent/java"], timeout=1)
+        with self.assertRaises(VarnaRenderError):
+            server.render(["-o", self.output("a.svg")])
+        self.assertFalse(server.available)
+
+
+class DrawVarnaGraphTests(SimpleTestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dotseq = os.path.join(directory.name, "in.dotseq")
+        self.svg = os.path.join(directory.name, "out.svg")
+        with open(self.dotseq, "w") as f:
+            f.write(">job\nGGGAAACCC\n(((...)))\n")
+        reset_varna_server()
+        self.addCleanup(reset_varna_server)
+
+    def test_uses_render_server(self) -> None:
+        server = VarnaRenderServer(command=[sys.executable, "-c", FAKE_SERVER])
+        self.addCleanup(server.stop)
+        with patch("webapp.visualization_tools.get_varna_server", return_value=server):
+            result = visualization_tools.drawVARNAgraph(self.dotseq, self.svg)
+
+        self.assertTrue(result.startswith("OK"))
+        self.assertEqual(server.renders, 1)
+        with open(self.svg) as f:
+            self.assertIn("viewBox", f.read())  # cropped like a VARNA diagram
+
+    def test_server_gets_the_arguments_of_savefig(self) -> None:
+        server = MagicMock(available=True)
+        structure = visualization_tools.readVARNAstructure(self.dotseq)
+
+        self.assertTrue(
+            visualization_tools.renderWithServer(structure, self.svg, server)
+        )
+
+        args = ["-sequenceDBN", "GGGAAACCC", "-structureDBN", "(((...)))"]
+        server.render.assert_called_once_with([*args, "-o", self.svg])
+        # the VARNA process of the fallback gets the same ones after "java -cp <jar> <class>"
+        with patch("subprocess.run") as run:
+            structure.savefig(self.svg)
+        self.assertEqual(run.call_args.args[0][4:], server.render.call_args.args[0])
+
+    @override_settings(VARNA_RENDER_SERVER=True)
+    def test_falls_back_to_varna_process(self) -> None:
+        without_java = partial(VarnaRenderServer, command=["/nonexistent/java"])
+        with (
+            patch.object(varna_server, "VarnaRenderServer", without_java),
+            patch("varnaapi.Structure.savefig", side_effect=self.write_svg) as savefig,
+        ):
+            visualization_tools.drawVARNAgraph(self.dotseq, self.svg)
+            self.assertIsNone(get_varna_server())  # not tried again for a while
+            visualization_tools.drawVARNAgraph(self.dotseq, self.svg)
+
+        self.assertEqual(savefig.call_count, 2)
+
+    @override_settings(VARNA_RENDER_SERVER=False)
+    def test_disabled(self) -> None:
+        self.assertIsNone(get_varna_server())
+
+    @staticmethod
+    def write_svg(output: str) -> None:
+        with open(output, "w") as f:
+            f.write(
+                '<svg xmlns="http://www.w3.org/2000/svg"><circle cx="20" cy="20" r="5"/></svg>'
+            )
+
+
+class DrawVarnaGraphsTests(SimpleTestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.paths = []
+        for n in range(3):
+            dotseq = os.path.join(self.directory, f"{n}.dotseq")
+            with open(dotseq, "w") as f:
+                f.write(">job\nGGGAAACCC\n(((...)))\n")
+            self.paths.append((dotseq, os.path.join(self.directory, f"{n}.svg")))
+        reset_varna_server()
+        self.addCleanup(reset_varna_server)
+
+    def test_job_is_drawn_by_one_server(self) -> None:
+        server = VarnaRenderServer(command=[sys.executable, "-c", FAKE_SERVER])
+        self.addCleanup(server.stop)
+        missing = (os.path.join(self.directory, "missing.dotseq"), "missing.svg")
+        with patch("webapp.visualization_tools.get_varna_server", return_value=server):
+            results = visualization_tools.drawVARNAgraphs(
+                [self.paths[0], missing, *self.paths[1:]]
+            )
+
+        self.assertEqual(results[1], "ERROR: Input file does not exist")
+        self.assertTrue(all(r.startswith("OK") for r in results[:1] + results[2:]))
+        self.assertEqual(server.renders, 3)
+        self.assertEqual(server.restarts, 0)
+        for _, svg in self.paths:
+            self.assertTrue(os.path.exists(svg))
+
+    @override_settings(VARNA_RENDER_SERVER=False)
+    def test_batch_server_without_render_server(self) -> None:
+        servers: list[VarnaRenderServer] = []
+
+        def batch_server() -> VarnaRenderServer:
+            servers.append(
+                VarnaRenderServer(command=[sys.executable, "-c", FAKE_SERVER])
+            )
+            return servers[-1]
+
+        with patch("webapp.visualization_tools.VarnaRenderServer", batch_server):
+            visualization_tools.drawVARNAgraphs(self.paths)
+
+        self.assertEqual(len(servers), 1)
+        self.assertEqual(servers[0].renders, 3)
+        self.assertIsNone(servers[0].process)  # stopped after the batch
+
+    @override_settings(VARNA_RENDER_SERVER=False)
+    def test_batch_falls_back_to_varna_processes(self) -> None:
+        without_java = partial(VarnaRenderServer, command=["/nonexistent/java"])
+        with (
+            patch("webapp.visualization_tools.VarnaRenderServer", without_java),
+            patch(
+                "varnaapi.Structure.savefig", side_effect=DrawVarnaGraphTests.write_svg
+            ) as savefig,
+        ):
+            results = visualization_tools.drawVARNAgraphs(self.paths)
+
+        self.assertTrue(all(r.startswith("OK") for r in results))
+        self.assertEqual(savefig.call_count, 3)
+
+
+@override_settings(RENDER_CACHE=False)  # one diagram per result, see tests_render_cache
+class DrawSecondaryStructuresTests(TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        media_patcher = override_settings(MEDIA_ROOT=self.directory)
+        media_patcher.enable()
+        self.addCleanup(media_patcher.disable)
+
+        self.server = VarnaRenderServer(command=[sys.executable, "-c", FAKE_SERVER])
+        self.addCleanup(self.server.stop)
+        server_patcher = patch(
+            "webapp.visualization_tools.get_varna_server", return_value=self.server
+        )
+        server_patcher.start()
+        self.addCleanup(server_patcher.stop)
+
+        with open(os.path.join(self.directory, "input.dotseq"), "w") as f:
+            f.write(">job\nGGGAAACCC\n(((...)))\n")
+        self.job = Job.objects.create(
+            input_structure="input.dotseq",
+            strand_separator=" ",
+            seed=10,
+            job_name="varna-job",
+            status="R",
+            alternative_conformations=3,
+            sum_processing_time=timedelta(seconds=3),
+        )
+        for seed in range(10, 13):
+            with open(os.path.join(self.directory, f"{seed}.dotseq"), "w") as f:
+                f.write(">job\nGGGAAACCC\n((.....))\n")
+            JobResults.objects.create(
+                job=self.job,
+                seed=seed,
+                result_secondary_structure_dotseq=f"{seed}.dotseq",
+                result_secondary_structure_svg=f"{seed}.svg",
+            )
+
+    def test_conformations_are_drawn_when_job_is_finalized(self) -> None:
+        tasks.finalize_job(self.job)
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "C")
+        self.assertGreater(self.job.sum_processing_time, timedelta(seconds=3))
+        self.assertEqual(self.server.renders, 3)
+        for seed in range(10, 13):
+            self.assertTrue(os.path.exists(os.path.join(self.directory, f"{seed}.svg")))
+
+    def test_maintenance_command_draws_missing_graphs(self) -> None:
+        tasks.finalize_job(self.job)
+        os.remove(os.path.join(self.directory, "11.svg"))
+
+        call_command("draw_secondary_structures", stdout=io.StringIO())
+        self.assertEqual(self.server.renders, 4)
+
+        call_command("draw_secondary_structures", "--redraw", stdout=io.StringIO())
+        self.assertEqual(self.server.renders, 7)
+
+
+@override_settings(DIAGRAM_RENDERING="lazy", RENDER_CACHE=True)
+class LazyRenderingTests(TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        media_patcher = override_settings(MEDIA_ROOT=self.directory)
+        media_patcher.enable()
+        self.addCleanup(media_patcher.disable)
+
+        self.server = VarnaRenderServer(command=[sys.executable, "-c", FAKE_SERVER])
+        self.addCleanup(self.server.stop)
+        server_patcher = patch(
+            "webapp.visualization_tools.get_varna_server", return_value=self.server
+        )
+        server_patcher.start()
+        self.addCleanup(server_patcher.stop)
+
+        with open(os.path.join(self.directory, "input.dotseq"), "w") as f:
+            f.write(">job\nGGGGAAAACCCC\n((((....))))\n")
+        self.job = Job.objects.create(
+            input_structure="input.dotseq",
+            strand_separator=" ",
+            seed=10,
+            job_name="lazy-job",
+            hashed_uid="lazy",
+            status="R",
+            alternative_conformations=2,
+        )
+        for seed, structure in ((10, "(((......)))"), (11, "((((....))))")):
+            for name, content in (
+                (f"{seed}.dotseq", f">job\nGGGGAAAACCCC\n{structure}\n"),
+                (f"{seed}.pdb", "ATOM"),
+            ):
+                with open(os.path.join(self.directory, name), "w") as f:
+                    f.write(content)
+            JobResults.objects.create(
+                job=self.job,
+                seed=seed,
+                result_tertiary_structure=f"{seed}.pdb",
+                result_secondary_structure_dotseq=f"{seed}.dotseq",
+                result_secondary_structure_svg=f"{seed}.svg",
+                result_arc_diagram=f"{seed}_arc.svg",
+            )
+
+    def get_results(self) -> dict:
+        response = APIClient().get(reverse("getResults"), {"uidh": "lazy"})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_diagrams_are_queued_at_first_view(self) -> None:
+        tasks.finalize_job(self.job)
+        self.assertEqual(self.server.renders, 0)  # not on the path of the job
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "10_arc.svg")))
+
+        with patch.object(tasks.draw_diagrams_task, "delay") as delay:
+            data = self.get_results()
+        # the view doesn't draw, it queues the drawing on the grapharna worker
+        self.assertEqual(self.server.renders, 0)
+        delay.assert_called_once_with(str(self.job.pk))
+        self.assertTrue(data["diagrams_pending"])
+        for result in data["result_list"]:
+            self.assertEqual(result["result_secondary_structure_svg"], "")
+            self.assertEqual(result["result_arc_diagram"], "")
+
+        tasks.draw_diagrams_task(str(self.job.pk))
+        with patch.object(tasks.draw_diagrams_task, "delay") as delay:
+            for _ in range(2):
+                data = self.get_results()
+                self.assertFalse(data["diagrams_pending"])
+                for result in data["result_list"]:
+                    self.assertIn("<svg", result["result_secondary_structure_svg"])
+                    self.assertIn("<svg", result["result_arc_diagram"])
+        delay.assert_not_called()
+        self.assertEqual(self.server.renders, 2)  # drawn once
+
+    def test_download_waits_for_diagrams(self) -> None:
+        tasks.finalize_job(self.job)
+
+        with patch.object(tasks.draw_diagrams_task, "delay") as delay:
+            response = APIClient().get(reverse("downloadZip"), {"uidh": "lazy"})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response["Retry-After"], "5")
+        delay.assert_called_once_with(str(self.job.pk))
+
+        tasks.draw_diagrams_task(str(self.job.pk))
+        response = APIClient().get(reverse("downloadZip"), {"uidh": "lazy"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.renders, 2)
+
+    def test_drawing_is_queued_once_per_job(self) -> None:
+        tasks.finalize_job(self.job)
+
+        with patch.object(tasks.draw_diagrams_task, "delay") as delay:
+            for _ in range(3):
+                self.assertTrue(self.get_results()["diagrams_pending"])
+                response = APIClient().get(reverse("downloadZip"), {"uidh": "lazy"})
+                self.assertEqual(response.status_code, 409)
+        delay.assert_called_once_with(str(self.job.pk))
+
+        # the queued task was lost
+        Job.objects.filter(pk=self.job.pk).update(
+            diagrams_requested_at=timezone.now() - timedelta(minutes=10)
+        )
+        with patch.object(tasks.draw_diagrams_task, "delay") as delay:
+            self.get_results()
+        delay.assert_called_once_with(str(self.job.pk))
+
+        tasks.draw_diagrams_task(str(self.job.pk))
+        self.job.refresh_from_db()
+        self.assertIsNone(self.job.diagrams_requested_at)
+
+    def test_diagrams_drawn_by_another_viewer_are_not_drawn_again(self) -> None:
+        stale = list(JobResults.objects.filter(job=self.job))
+        tasks.draw_missing_diagrams(list(JobResults.objects.filter(job=self.job)))
+
+        # the rows were pointed at the render cache meanwhile, they are read again under the lock
+        results = tasks.draw_missing_diagrams(stale)
+
+        self.assertEqual(self.server.renders, 2)
+        self.assertTrue(
+            all(os.path.exists(r.result_secondary_structure_svg.path) for r in results)
+        )
+
+
+class WarmUpTests(TestCase):
+    def setUp(self) -> None:
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.server = VarnaRenderServer(command=[sys.executable, "-c", FAKE_SERVER])
+        self.addCleanup(self.server.stop)
+        server_patcher = patch(
+            "webapp.visualization_tools.get_varna_server", return_value=self.server
+        )
+        server_patcher.start()
+        self.addCleanup(server_patcher.stop)
+
+    def test_renderers_are_exercised_once(self) -> None:
+        warm_up_renderers()
+
+        self.assertEqual(self.server.renders, 1)
+        self.assertIsNotNone(self.server.process)  # kept for the jobs
+        self.assertEqual(
+            metrics.get_value("worker_warm_up_seconds_count", result="ok"), 1
+        )
+
+    def test_failure_does_not_stop_the_worker(self) -> None:
+        with patch(
+            "webapp.visualization_tools.generateRchieDiagram",
+            side_effect=ValueError("broken"),
+        ):
+            warm_up_renderers()
+
+        self.assertEqual(
+            metrics.get_value("worker_warm_up_seconds_count", result="error"), 1
+        )
+
+    def test_only_rendering_workers_are_warmed_up(self) -> None:
+        for queues, calls in (({"email"}, 0), ({"maintenance"}, 0), ({"grapharna"}, 1)):
+            with (
+                patch.object(celery, "worker_queues", queues),
+                patch("webapp.warm_up.warm_up_renderers") as warm_up,
+            ):
+                celery.warm_up_worker_process()
+            self.assertEqual(warm_up.call_count, calls, queues)
@@ -0,0 +1,179 @@
+import logging
+import os
+import select
+import subprocess
+import threading
+from time import monotonic
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+VARNA_JAR = os.path.join(CURRENT_DIR, "VARNAv3-93.jar")
+
+# after a failed start the server isn't tried again for this long, diagrams use one JVM each meanwhile
+RESTART_BACKOFF_SECONDS = 60
+
+
+class VarnaRenderError(Exception):
+    """Exception raised when the render server can't draw a diagram."""
+
+
+class VarnaRenderTimeout(VarnaRenderError):
+    """Exception raised when the render server doesn't answer within the timeout."""
+
+
+class VarnaRenderServer:
+    """
+    One long-lived VARNA JVM (VarnaRenderServer.java) drawing diagrams on request, so the JVM startup
+    is paid once per worker process instead of once per diagram.
+
+    Requests are VARNAcmd command line arguments (varnaRenderArgs), one request per line on the server's
+    stdin. The server class is compiled when the image is built, into VARNA_SERVER_CLASSES. A server that crashed or stopped answering is killed and started again on
+    the next request.
+    """
+
+    def __init__(
+        self,
+        command: list[str] | None = None,
+        timeout: float | None = None,
+    ) -> None:
+        self.command: list[str] = command or [
+            "java",
+            "-Djava.awt.headless=true",
+            "-cp",
+            os.pathsep.join([VARNA_JAR, settings.VARNA_SERVER_CLASSES]),
+            "VarnaRenderServer",
+        ]
+        self.timeout: float = (
+            timeout if timeout is not None else settings.VARNA_RENDER_TIMEOUT_SECONDS
+        )
+        self.process: subprocess.Popen[str] | None = None
+        self.lock = threading.Lock()  # one request at a time per JVM
+        self.failed_at: float | None = None
+        self.renders: int = 0
+        self.restarts: int = 0
+
+    @property
+    def available(self) -> bool:
+        return (
+            self.failed_at is None
+            or monotonic() - self.failed_at >= RESTART_BACKOFF_SECONDS
+        )
+
+    def start(self) -> None:
+        try:
+            self.process = subprocess.Popen(
+                self.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                bufsize=1,
+            )
+            reply = self.read_reply()
+        except (OSError, VarnaRenderError) as e:
+            self.stop()
+            self.failed_at = monotonic()
+            raise VarnaRenderError(f"VARNA render server failed to start: {e}")
+        if reply != "READY":
+            self.stop()
+            self.failed_at = monotonic()
+            raise VarnaRenderError(f"VARNA render server failed to start: {reply}")
+        self.failed_at = None
+
+    def read_reply(self) -> str:
+        assert self.process is not None and self.process.stdout is not None
+        ready, _, _ = select.select([self.process.stdout], [], [], self.timeout)
+        if not ready:
+            raise VarnaRenderTimeout(f"No answer within {self.timeout}s")
+        line = self.process.stdout.readline()
+        if not line:
+            raise VarnaRenderError(
+                f"Render server exited with code {self.process.wait()}"
+            )
+        return line.rstrip("\n")
+
+    def render(self, args: list[str]) -> None:
+        """Runs VARNAcmd with the given arguments (e.g. -sequenceDBN ... -o out.svg)."""
+        if any("\t" in arg or "\n" in arg for arg in args):
+            raise VarnaRenderError("VARNA arguments can't contain tabs or newlines")
+        line = "\t".join(args)
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                self.start()
+            try:
+                reply = self.request(line)
+            except VarnaRenderTimeout:
+                raise  # a diagram that hangs the server would hang it again
+            except (OSError, VarnaRenderError) as e:
+                logger.warning(f"VARNA render server crashed ({e}), restarting it")
+                self.restarts += 1
+                self.start()
+                try:
+                    reply = self.request(line)
+                except OSError as e:
+                    raise VarnaRenderError(f"Render server crashed: {e}")
+        if reply != "OK":
+            raise VarnaRenderError(reply.removeprefix("ERROR "))
+        self.renders += 1
+
+    def request(self, line: str) -> str:
+        assert self.process is not None and self.process.stdin is not None
+        try:
+            self.process.stdin.write(line + "\n")
+            self.process.stdin.flush()
+            return self.read_reply()
+        except (OSError, VarnaRenderError):
+            self.stop()  # stuck or dead, don't leave it behind
+            raise
+
+    def stop(self) -> None:
+        if self.process is None:
+            return
+        try:
+            self.process.kill()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        for stream in (self.process.stdin, self.process.stdout):
+            if stream is not None:
+                try:
+                    stream.close()
+                except OSError:
+                    pass
+        self.process = None
+
+
+_server: VarnaRenderServer | None = None
+_server_pid: int | None = None
+_server_lock = threading.Lock()
+
+
+def get_varna_server() -> VarnaRenderServer | None:
+    """
+    Render server of the current process (created on first use and after a fork, like the engine client),
+    or None when it is disabled (VARNA_RENDER_SERVER) or failed to start recently.
+    """
+    global _server, _server_pid
+
+    if not settings.VARNA_RENDER_SERVER:
+        return None
+    pid = os.getpid()
+    with _server_lock:
+        if _server is None or _server_pid != pid:
+            _server = VarnaRenderServer()
+            _server_pid = pid
+        server = _server
+    return server if server.available else None
+
+
+def reset_varna_server() -> None:
+    """Stops and forgets the render server of the current process."""
+    global _server, _server_pid
+
+    with _server_lock:
+        if _server is not None and _server_pid == os.getpid():
+            _server.stop()
+        _server = None
+        _server_pid = None
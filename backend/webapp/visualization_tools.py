@@ -1,7 +1,11 @@
 import os
+import logging
 import varnaapi
-from api.validation_tools import RnaValidator
-from xml.etree import ElementTree as ET
+from api.pair_extraction import extractPairs
+from django.conf import settings
+from webapp.arc_diagram import write_arc_diagram_svg
+from webapp.svg_optimizer import optimize_svg
+from webapp.varna_server import VarnaRenderError, VarnaRenderServer, get_varna_server
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 varna_path = os.path.join(CURRENT_DIR, "VARNAv3-93.jar")
 
@@ -17,6 +21,8 @@ if not os.path.exists(varna_path):
 
 varnaapi.set_VARNA(varna_path)
 
+logger = logging.getLogger(__name__)
+
 
 def getDotBracket(path: str) -> str:
     with open(path, "r") as f:
@@ -27,47 +33,6 @@ def getNucleotites(path: str) -> str:
     with open(path, "r") as f:
         return f.readlines()[1]
 
-def crop_svg(input_svg: str, output_svg: str, padding: int = 10) -> None:
-    tree = ET.parse(input_svg)
-    root = tree.getroot()
-
-    min_x, min_y = 999999999.0,999999999.0
-    max_x, max_y = 0.0,0.0
-
-    for elem in root:
-        tag = elem.tag.split('}')[-1]
-        if tag == 'line':
-            x_vals = [float(elem.attrib['x1']), float(elem.attrib['x2'])]
-            y_vals = [float(elem.attrib['y1']), float(elem.attrib['y2'])]
-        elif tag == 'circle':
-            cx = float(elem.attrib['cx'])
-            cy = float(elem.attrib['cy'])
-            r = float(elem.attrib.get('r', 0))
-            x_vals = [cx - r, cx + r]
-            y_vals = [cy - r, cy + r]
-        elif tag == 'text':
-            x_vals = [float(elem.attrib['x'])]
-            y_vals = [float(elem.attrib['y'])]
-        else:
-            continue
-
-        min_x = min(min_x, *x_vals)
-        max_x = max(max_x, *x_vals)
-        min_y = min(min_y, *y_vals)
-        max_y = max(max_y, *y_vals)
-
-    min_x -= padding
-    min_y -= padding
-    max_x += padding
-    max_y += padding
-
-    width = max_x - min_x
-    height = max_y - min_y
-    root.set('viewBox', f"{min_x} {min_y} {width} {height}")
-    root.set('width', str(width))
-    root.set('height', str(height))
-
-    tree.write(output_svg)
 def drawVARNAgraph(input_filepath: str, output_path: str) -> str:
     """
     Input:
@@ -76,7 +41,48 @@ def drawVARNAgraph(input_filepath: str, output_path: str) -> str:
     This funciton uses VARNA in order to generate a 2D graph of a given structure and saves it in output_path.
     Output file should have a .svg extension
     """
+    return drawVARNAgraphs([(input_filepath, output_path)])[0]
 
+
+def drawVARNAgraphs(paths: list[tuple[str, str]]) -> list[str]:
+    """
+    Input: list of (.dotseq file, output .svg path) pairs, e.g. all conformations of a job
+    Draws all of the structures with a single VARNA JVM: the render server of this worker or, when it is
+    disabled (VARNA_RENDER_SERVER=False), a server started for this batch only.
+
+    Output: result of drawVARNAgraph for every pair, in the same order
+    """
+    results: list[str] = []
+    structures: list[tuple[varnaapi.Structure, str]] = []
+    for input_filepath, output_path in paths:
+        structure = readVARNAstructure(input_filepath)
+        if isinstance(structure, str):
+            results.append(structure)
+            continue
+        structures.append((structure, output_path))
+        results.append(f"OK: File at: {output_path}")
+
+    server = get_varna_server()
+    batch_server = None
+    if server is None and not settings.VARNA_RENDER_SERVER and len(structures) > 1:
+        server = batch_server = VarnaRenderServer()
+    try:
+        for structure, output_path in structures:
+            if not renderWithServer(structure, output_path, server):
+                structure.savefig(f"{output_path}")
+            optimize_svg(
+                output_path,
+                precision=settings.SVG_COORDINATE_PRECISION,
+                crop_padding=15,
+            )
+    finally:
+        if batch_server is not None:
+            batch_server.stop()
+    return results
+
+
+def readVARNAstructure(input_filepath: str) -> varnaapi.Structure | str:
+    """Reads a .dotseq file into a VARNA structure, returns an "ERROR: ..." string for invalid files."""
     if not os.path.exists(input_filepath):
         return "ERROR: Input file does not exist"
 
@@ -90,11 +96,42 @@ def drawVARNAgraph(input_filepath: str, output_path: str) -> str:
     if not dotbracket:
         return "ERROR: Could not find structure in file"
 
-    
-    v = varnaapi.Structure(sequence=seq, structure=dotbracket)
-    v.savefig(f"{output_path}")
-    crop_svg(f"{output_path}", f"{output_path}", padding=15)
-    return f"OK: File at: {output_path}"
+    return varnaapi.Structure(sequence=seq, structure=dotbracket)
+
+
+def renderWithServer(
+    structure: varnaapi.Structure, output_path: str, server: VarnaRenderServer | None
+) -> bool:
+    """
+    Draws the structure with a VARNA render server (no JVM startup per diagram).
+    Returns False when there is no server or it fails, the caller then runs VARNA the usual way.
+    """
+    if server is None or not server.available:
+        return False
+    try:
+        server.render(varnaRenderArgs(structure, output_path))
+    except VarnaRenderError as e:
+        logger.warning(
+            f"VARNA render server failed, falling back to a VARNA process: {e}"
+        )
+        return False
+    return True
+
+
+def varnaRenderArgs(structure: varnaapi.Structure, output_path: str) -> list[str]:
+    """
+    VARNAcmd arguments drawing the structure into output_path with the default style, what savefig passes
+    for the structures of readVARNAstructure (no drawing parameters are set on them).
+    """
+    return [
+        "-sequenceDBN",
+        structure.sequence,
+        "-structureDBN",
+        structure.structure,
+        "-o",
+        output_path,
+    ]
+
 
 def generateRchieDiagram(
     fasta_input: str,
@@ -109,12 +146,10 @@ def generateRchieDiagram(
     3. Filepath of the output file (preferably .svg)
     4. OPTIONAL: Step of the grey scale markings
 
+    The diagram is written by webapp.arc_diagram, or drawn with matplotlib when ARC_DIAGRAM_RENDERER="matplotlib".
+
     Output: String of "OK " + output_img_path or "ERROR*" if any have occured.
     """
-    import numpy as np
-    import matplotlib.pyplot as plt
-    from matplotlib.lines import Line2D
-
     try:
         with open(fasta_input, "r") as f_in, open(fasta_output, "r") as f_out:
             fasta_content_input = f_in.read()
@@ -127,14 +162,10 @@ def generateRchieDiagram(
 
         nucleotites_input = input_lines[1].strip()
 
-        validator_input = RnaValidator(fasta_content_input)
-        result_input = validator_input.ValidateRna()
-        input_pairs_0_indexed = set(result_input.get("allPairs", set()))
+        input_pairs_0_indexed = extractPairs(fasta_content_input).pairSet()
         input_pairs = {(i + 1, j + 1) for i, j in input_pairs_0_indexed}
 
-        validator_output = RnaValidator(fasta_content_output)
-        result_output = validator_output.ValidateRna()
-        output_pairs_0_indexed = set(result_output.get("allPairs", set()))
+        output_pairs_0_indexed = extractPairs(fasta_content_output).pairSet()
         output_pairs = {(i + 1, j + 1) for i, j in output_pairs_0_indexed}
 
     except Exception as e:
@@ -154,6 +185,23 @@ def generateRchieDiagram(
     if n == 0:
         return "ERROR: Input sequences or structures are empty."
 
+    if settings.ARC_DIAGRAM_RENDERER == "svg":
+        write_arc_diagram_svg(
+            nucleotites_input,
+            n,
+            missing_pairs,
+            common_pairs,
+            added_pairs,
+            output_img_path,
+            grid_step,
+        )
+        optimizeSvgOutput(output_img_path)
+        return "OK " + output_img_path
+
+    import numpy as np
+    import matplotlib.pyplot as plt
+    from matplotlib.lines import Line2D
+
     all_pairs = input_pairs | output_pairs
     max_span = max((j - i) for (i, j) in all_pairs) if all_pairs else 1
     max_r = max_span / 2.0 + 1
@@ -268,6 +316,13 @@ def generateRchieDiagram(
     plt.tight_layout()
     fig.savefig(output_img_path, dpi=150, bbox_inches="tight", pad_inches=0.1)
     plt.close(fig)
+    optimizeSvgOutput(output_img_path)
     return "OK " + output_img_path
 
 
+def optimizeSvgOutput(output_img_path: str) -> None:
+    """Minifies the diagram when it is an SVG (see webapp.svg_optimizer), other formats are left as they are."""
+    if output_img_path.lower().endswith(".svg"):
+        optimize_svg(output_img_path, precision=settings.SVG_COORDINATE_PRECISION)
+
+
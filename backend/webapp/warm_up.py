@@ -0,0 +1,44 @@
+import logging
+import os
+import tempfile
+from time import perf_counter
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# queues whose workers draw diagrams, only their processes are warmed up
+RENDERING_QUEUES = {"grapharna"}
+HAIRPIN = ">warm-up\nGGGGAAAACCCC\n((((....))))\n"
+
+
+def warm_up_renderers() -> float:
+    """
+    Draws a tiny hairpin with the renderers of a job (VARNA and the arc diagram of ARC_DIAGRAM_RENDERER),
+    so the first job of a new worker process doesn't pay for the imports, the matplotlib font cache and
+    the start of the VARNA render server, which is kept by the process. Returns the time it took, also
+    recorded as the worker_warm_up_seconds metric.
+    """
+    start = perf_counter()
+    result = "ok"
+    try:
+        from .visualization_tools import drawVARNAgraphs, generateRchieDiagram
+
+        with tempfile.TemporaryDirectory(prefix="warm-up-") as directory:
+            dotseq = os.path.join(directory, "hairpin.dotseq")
+            with open(dotseq, "w") as f:
+                f.write(HAIRPIN)
+            outcome = drawVARNAgraphs([(dotseq, os.path.join(directory, "varna.svg"))])
+            if not outcome[0].startswith("OK"):
+                raise RuntimeError(outcome[0])
+            generateRchieDiagram(dotseq, dotseq, os.path.join(directory, "arc.svg"))
+    except Exception as e:
+        # the jobs will report it if it is persistent
+        logger.warning(f"Warm-up of the renderers failed: {e}")
+        result = "error"
+    duration = perf_counter() - start
+    try:
+        metrics.observe("worker_warm_up_seconds", duration, result=result)
+    except Exception as e:  # the database may not be reachable yet
+        logger.warning(f"Failed to record the warm-up time: {e}")
+    logger.info(f"Warmed up the renderers in {duration:.2f} s ({result})")
+    return duration